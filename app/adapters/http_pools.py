@@ -0,0 +1,212 @@
+import asyncio
+import importlib.util
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+if TYPE_CHECKING:
+    from telegram.request import HTTPXRequest
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+
+def http2_available() -> bool:
+    """HTTP/2 en httpx requiere el paquete h2 (httpx[http2])."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _resolve_http2(name: str, wanted: bool) -> bool:
+    if wanted and not http2_available():
+        logger.warning("HTTP/2 pedido para %s pero falta el paquete h2; se usa HTTP/1.1", name)
+        return False
+    return wanted
+
+
+def pool_limits(pool_size: int, keepalive_connections: int, keepalive_expiry_s: float) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max(1, int(pool_size)),
+        max_keepalive_connections=max(1, min(int(keepalive_connections), int(pool_size))),
+        keepalive_expiry=float(keepalive_expiry_s),
+    )
+
+
+# ---------------------------
+# Reuso de conexiones (por request)
+# ---------------------------
+class PoolStats:
+    """
+    Cuenta requests y conexiones nuevas de un pool. httpcore emite eventos de trace
+    (connection.connect_tcp.*) solo cuando abre una conexión: si no aparecen, se reusó.
+    """
+
+    def __init__(self, name: str, log_requests: bool = True):
+        self.name = name
+        self.log_requests = log_requests
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+        self.last_request_ts: Optional[float] = None
+
+    def _start(self, request: httpx.Request) -> Dict[str, Any]:
+        state = {"new_conn": False, "t0": time.perf_counter()}
+        request.extensions["domiflash_pool"] = state
+        return state
+
+    def _finish(self, response: httpx.Response) -> None:
+        state = response.request.extensions.get("domiflash_pool")
+        if state is None:
+            return
+        self.requests += 1
+        self.last_request_ts = time.time()
+        if state["new_conn"]:
+            self.new_connections += 1
+        if response.status_code >= 500:
+            self.errors += 1
+        if self.log_requests:
+            logger.info(
+                "HTTP %s %s %s -> %s reused=%s %s ttfb=%.0fms",
+                self.name, response.request.method, response.request.url.path, response.status_code,
+                not state["new_conn"], response.http_version, (time.perf_counter() - state["t0"]) * 1000,
+            )
+
+    def async_hooks(self) -> Dict[str, List[Callable[..., Awaitable[None]]]]:
+        async def on_request(request: httpx.Request) -> None:
+            state = self._start(request)
+
+            async def trace(event: str, info: Dict[str, Any]) -> None:
+                if event.startswith("connection.connect_tcp."):
+                    state["new_conn"] = True
+
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response) -> None:
+            self._finish(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def sync_hooks(self) -> Dict[str, List[Callable[..., None]]]:
+        def on_request(request: httpx.Request) -> None:
+            state = self._start(request)
+
+            def trace(event: str, info: Dict[str, Any]) -> None:
+                if event.startswith("connection.connect_tcp."):
+                    state["new_conn"] = True
+
+            request.extensions["trace"] = trace
+
+        return {"request": [on_request], "response": [self._finish]}
+
+    def stats(self) -> Dict[str, Any]:
+        reused = self.requests - self.new_connections
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+            "errors_5xx": self.errors,
+            "idle_s": round(time.time() - self.last_request_ts, 1) if self.last_request_ts else None,
+        }
+
+
+# ---------------------------
+# Clientes
+# ---------------------------
+def build_openai_clients(
+    stats: PoolStats,
+    pool_size: int = 20,
+    keepalive_connections: int = 10,
+    keepalive_expiry_s: float = 120.0,
+    http2: bool = True,
+    timeout_s: float = 60.0,
+) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Pool compartido para ChatOpenAI (sync + async; el agente usa el async)."""
+    limits = pool_limits(pool_size, keepalive_connections, keepalive_expiry_s)
+    use_http2 = _resolve_http2("openai", http2)
+    timeout = httpx.Timeout(timeout_s, connect=10.0)
+    sync_client = httpx.Client(limits=limits, http2=use_http2, timeout=timeout, event_hooks=stats.sync_hooks())
+    async_client = httpx.AsyncClient(limits=limits, http2=use_http2, timeout=timeout, event_hooks=stats.async_hooks())
+    return sync_client, async_client
+
+
+def build_telegram_request(
+    stats: PoolStats,
+    pool_size: int = 64,
+    keepalive_connections: int = 16,
+    keepalive_expiry_s: float = 120.0,
+    http2: bool = False,
+) -> "HTTPXRequest":
+    """HTTPXRequest de PTB con límites de keepalive explícitos y los hooks de reuso."""
+    from telegram.request import HTTPXRequest
+
+    return HTTPXRequest(
+        connection_pool_size=max(1, int(pool_size)),
+        http_version="2" if _resolve_http2("telegram", http2) else "1.1",
+        httpx_kwargs={
+            "limits": pool_limits(pool_size, keepalive_connections, keepalive_expiry_s),
+            "event_hooks": stats.async_hooks(),
+        },
+    )
+
+
+async def warm_openai(client: httpx.AsyncClient, api_key: Optional[str], base_url: Optional[str] = None) -> bool:
+    """Abre (DNS + TCP + TLS) una conexión del pool con un GET barato a /models."""
+    url = f"{(base_url or OPENAI_BASE_URL).rstrip('/')}/models"
+    try:
+        r = await client.get(url, headers={"Authorization": f"Bearer {api_key or ''}"}, timeout=10.0)
+        return r.status_code < 500
+    except Exception as e:
+        logger.warning("Warmup OpenAI falló: %s", e)
+        return False
+
+
+# ---------------------------
+# Keepalive periódico
+# ---------------------------
+class PoolKeepAlive:
+    """
+    Ping periódico a cada pool para que su conexión no caduque (keepalive_expiry del
+    cliente ni timeout del servidor). Un pool que tuvo tráfico reciente no se pinguea.
+    En Cloud Run requiere CPU siempre asignada; si no, el ping corre solo durante requests.
+    """
+
+    def __init__(self, interval_s: float = 45.0):
+        self.interval_s = float(interval_s)
+        self._pings: List[Tuple[PoolStats, Callable[[], Awaitable[Any]]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.pings = 0
+        self.failures = 0
+
+    def add(self, stats: PoolStats, ping: Callable[[], Awaitable[Any]]) -> None:
+        self._pings.append((stats, ping))
+
+    async def start(self) -> None:
+        if self._task is None and self.interval_s > 0 and self._pings:
+            self._task = asyncio.create_task(self._run(), name="http-keepalive")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            now = time.time()
+            for stats, ping in self._pings:
+                if stats.last_request_ts is not None and now - stats.last_request_ts < self.interval_s:
+                    continue
+                try:
+                    await ping()
+                    self.pings += 1
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning("Keepalive %s falló: %s", stats.name, e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"interval_s": self.interval_s, "pings": self.pings, "failures": self.failures}
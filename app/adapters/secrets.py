@@ -1,8 +1,166 @@
+import asyncio
+import json
+import logging
 import os
-from google.cloud import secretmanager
+import threading
+import time
+from typing import Dict, Optional
 
-def load_secret_as_env(secret_name: str, env_var: str, project_id: str):
-    client = secretmanager.SecretManagerServiceClient()
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+_client = None
+_client_lock = threading.Lock()
+
+# una entrada vencida de la caché solo sirve de respaldo hasta STALE_TTL_FACTOR * cache_ttl_s
+STALE_TTL_FACTOR = 4
+
+
+def _get_client():
+    """Un solo SecretManagerServiceClient por proceso (crear el canal gRPC cuesta)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google.cloud import secretmanager
+
+                _client = secretmanager.SecretManagerServiceClient()
+    return _client
+
+
+def fetch_secret(secret_name: str, project_id: str) -> str:
     secret_path = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
-    response = client.access_secret_version(name=secret_path)
-    os.environ[env_var] = response.payload.data.decode("utf-8")
+    response = _get_client().access_secret_version(name=secret_path)
+    return response.payload.data.decode("utf-8")
+
+
+def load_secret_as_env(secret_name: str, env_var: str, project_id: str):
+    os.environ[env_var] = fetch_secret(secret_name, project_id)
+
+
+class SecretLoader:
+    """
+    Carga de secretos en startup, en este orden por secreto:
+    1) variable de entorno ya definida (local / Cloud Run --set-secrets)
+    2) archivo {local_dir}/{secret_name} (volumen montado o carpeta de desarrollo)
+    3) caché en disco con TTL corto (cache_ttl_s > 0): reinicios locales evitan el round-trip
+    4) Secret Manager, todos en paralelo fuera del loop con el cliente compartido
+    Si Secret Manager falla y hay una entrada vencida en caché de menos de stale_max_s
+    (por defecto STALE_TTL_FACTOR * cache_ttl_s), se usa como último recurso; más vieja no se
+    usa, para no seguir sirviendo una llave rotada o revocada.
+    La caché guarda los secretos en texto plano (archivo 0600): es solo para desarrollo local,
+    no para producción ni para un volumen compartido entre instancias.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        local_dir: Optional[str] = None,
+        cache_path: Optional[str] = None,
+        cache_ttl_s: float = 0.0,
+        stale_max_s: Optional[float] = None,
+    ):
+        self.project_id = project_id
+        self.local_dir = local_dir or None
+        self.cache_path = cache_path or None
+        self.cache_ttl_s = float(cache_ttl_s)
+        self.stale_max_s = float(stale_max_s) if stale_max_s is not None else STALE_TTL_FACTOR * self.cache_ttl_s
+
+    # ---------------------------
+    # API
+    # ---------------------------
+    async def load_as_env(self, secrets: Dict[str, str]) -> Dict[str, str]:
+        """
+        secrets: {env_var: secret_name}. Define las variables de entorno y retorna
+        {env_var: origen} ("env" | "file" | "cache" | "remote" | "stale-cache" | "missing").
+        """
+        t0 = time.perf_counter()
+        sources: Dict[str, str] = {}
+        pending: Dict[str, str] = {}
+        cache = self._read_cache()
+        now = time.time()
+
+        for env_var, secret_name in secrets.items():
+            if os.getenv(env_var):
+                sources[env_var] = "env"
+                continue
+            value = self._read_local(secret_name)
+            if value is not None:
+                os.environ[env_var] = value
+                sources[env_var] = "file"
+                continue
+            entry = cache.get(secret_name)
+            if entry and self.cache_ttl_s > 0 and now - float(entry.get("ts", 0)) < self.cache_ttl_s:
+                os.environ[env_var] = entry["value"]
+                sources[env_var] = "cache"
+                continue
+            pending[env_var] = secret_name
+
+        if pending:
+            results = await asyncio.gather(
+                *[asyncio.to_thread(fetch_secret, name, self.project_id) for name in pending.values()],
+                return_exceptions=True,
+            )
+            fetched: Dict[str, str] = {}
+            for (env_var, secret_name), result in zip(pending.items(), results):
+                if isinstance(result, Exception):
+                    entry = cache.get(secret_name)
+                    if entry and now - float(entry.get("ts", 0)) < self.stale_max_s:
+                        logger.warning("Secret Manager falló para %s (%s); uso caché vencida", secret_name, result)
+                        os.environ[env_var] = entry["value"]
+                        sources[env_var] = "stale-cache"
+                    else:
+                        logger.error("No pude cargar el secreto %s: %s", secret_name, result)
+                        sources[env_var] = "missing"
+                    continue
+                os.environ[env_var] = result
+                fetched[secret_name] = result
+                sources[env_var] = "remote"
+            if fetched and self.cache_ttl_s > 0:
+                await asyncio.to_thread(self._write_cache, cache, fetched)
+
+        logger.info("Secretos cargados en %.0fms: %s", (time.perf_counter() - t0) * 1000, sources)
+        return sources
+
+    # ---------------------------
+    # Fuentes locales
+    # ---------------------------
+    def _read_local(self, secret_name: str) -> Optional[str]:
+        if not self.local_dir:
+            return None
+        path = os.path.join(self.local_dir, secret_name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read().strip()
+            return value or None
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception("No pude leer el secreto local %s", path)
+            return None
+
+    def _read_cache(self) -> Dict[str, Dict[str, object]]:
+        if not self.cache_path or self.cache_ttl_s <= 0 or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            logger.exception("No pude leer la caché de secretos %s", self.cache_path)
+            return {}
+
+    def _write_cache(self, cache: Dict[str, Dict[str, object]], fetched: Dict[str, str]) -> None:
+        now = time.time()
+        # las entradas más viejas que stale_max_s ya no sirven ni de respaldo: no se reescriben
+        data = {name: e for name, e in cache.items() if now - float(e.get("ts", 0)) < self.stale_max_s}
+        data.update({name: {"value": value, "ts": now} for name, value in fetched.items()})
+        tmp = f"{self.cache_path}.tmp"
+        try:
+            # solo lectura/escritura para el usuario del proceso
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_path)
+        except Exception:
+            logger.exception("No pude guardar la caché de secretos %s", self.cache_path)
@@ -0,0 +1,311 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+# menor = sale primero
+PRIORITY_OFFER = 0       # ofertas a domiciliarios (el reloj del timeout ya corre)
+PRIORITY_DRIVER = 1      # respuestas / avisos a domiciliarios
+PRIORITY_CUSTOMER = 2    # conversación con el cliente
+
+PRIORITY_NAMES = {PRIORITY_OFFER: "offer", PRIORITY_DRIVER: "driver", PRIORITY_CUSTOMER: "customer"}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.ts:
+            self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+
+    def wait_time(self, now: float) -> float:
+        """Segundos hasta tener un token (0 si ya hay)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+@dataclass(order=True)
+class _Item:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    fn: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    not_before: float = field(default=0.0, compare=False)
+    attempts: int = field(default=0, compare=False)
+    idempotent: bool = field(default=False, compare=False)
+
+
+def _request_not_sent(exc: Exception) -> bool:
+    """
+    True si el error de red ocurrió antes de que el request saliera (sin conexión / pool lleno).
+    Un TimedOut de lectura u otro error a mitad de camino puede haber entregado ya el mensaje.
+    """
+    import httpx
+
+    return isinstance(exc.__cause__, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+class SendQueue:
+    """
+    Cola de salida hacia Telegram:
+    - prioridades (ofertas > domiciliarios > clientes), FIFO dentro de cada prioridad
+    - token bucket global (límite del bot) y por chat; un envío en vuelo por chat (orden por chat)
+    - RetryAfter pausa toda la cola el tiempo que pide Telegram y reintenta el mismo mensaje
+    - errores de red: reintento con backoff exponencial; BadRequest / Forbidden fallan de una vez
+    - sendMessage no es idempotente: solo se reintenta si el request no alcanzó a salir (un
+      TimedOut suele llegar después de entregado y reintentarlo duplica ofertas / respuestas);
+      los envíos marcados idempotent (editMessageText) se reintentan ante cualquier error de red
+    submit() espera el resultado real del envío, así los llamadores siguen viendo las excepciones.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 25.0,
+        global_burst: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 5,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 30.0,
+        concurrency: int = 8,
+        scan_limit: int = 256,
+    ):
+        self.chat_rate = float(chat_rate)
+        self.chat_burst = float(chat_burst)
+        self.max_retries = int(max_retries)
+        self.backoff_base_s = float(backoff_base_s)
+        self.backoff_max_s = float(backoff_max_s)
+        self.concurrency = max(1, int(concurrency))
+        self.scan_limit = max(1, int(scan_limit))
+
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._heap: List[_Item] = []
+        self._inflight: Set[int] = set()
+        self._seq = 0
+        self._paused_until = 0.0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._sending: Set[asyncio.Task] = set()
+
+        # métricas
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.retry_after_hits = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+
+    # ---------------------------
+    # Ciclo de vida
+    # ---------------------------
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="tg-send-queue")
+        logger.info(
+            "SendQueue iniciada global=%.1f/s chat=%.1f/s concurrency=%s",
+            self._global.rate, self.chat_rate, self.concurrency,
+        )
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        if self._task is None:
+            return
+        deadline = time.monotonic() + drain_timeout
+        while (self._heap or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        await asyncio.gather(self._task, *self._sending, return_exceptions=True)
+        self._task = None
+        for item in self._heap:
+            if not item.future.done():
+                item.future.set_exception(RuntimeError("SendQueue detenida"))
+        self._heap = []
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    # ---------------------------
+    # Productor
+    # ---------------------------
+    async def submit(
+        self,
+        chat_id: int,
+        fn: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_CUSTOMER,
+        idempotent: bool = False,
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        self._seq += 1
+        item = _Item(
+            priority=int(priority), seq=self._seq, chat_id=int(chat_id), fn=fn,
+            future=loop.create_future(), enqueued_at=time.monotonic(), idempotent=bool(idempotent),
+        )
+        heapq.heappush(self._heap, item)
+        self._wake.set()
+        return await item.future
+
+    # ---------------------------
+    # Despacho
+    # ---------------------------
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        b = self._chats.get(chat_id)
+        if b is None:
+            if len(self._chats) > 10_000:
+                now = time.monotonic()
+                self._chats = {k: v for k, v in self._chats.items() if not v.full(now) or k in self._inflight}
+            b = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return b
+
+    def _pick(self, now: float) -> Tuple[Optional[_Item], float]:
+        """Primer item (en orden de prioridad) que puede salir ya; si no hay, cuánto esperar."""
+        skipped: List[_Item] = []
+        picked = None
+        wait = float("inf")
+        seen_chats: Set[int] = set()
+        while self._heap and len(skipped) < self.scan_limit:
+            item = heapq.heappop(self._heap)
+            if item.future.done():
+                continue  # el llamador se canceló
+            if item.chat_id in seen_chats or item.chat_id in self._inflight:
+                # mantiene el orden por chat: solo el primero de cada chat es candidato
+                skipped.append(item)
+                continue
+            seen_chats.add(item.chat_id)
+            if item.not_before > now:
+                wait = min(wait, item.not_before - now)
+                skipped.append(item)
+                continue
+            chat_wait = self._chat_bucket(item.chat_id).wait_time(now)
+            if chat_wait > 0:
+                wait = min(wait, chat_wait)
+                skipped.append(item)
+                continue
+            picked = item
+            break
+        for item in skipped:
+            heapq.heappush(self._heap, item)
+        return picked, wait
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            timeout: Optional[float] = None
+
+            if self._heap and len(self._sending) < self.concurrency:
+                if now < self._paused_until:
+                    timeout = self._paused_until - now
+                else:
+                    global_wait = self._global.wait_time(now)
+                    if global_wait > 0:
+                        timeout = global_wait
+                    else:
+                        item, wait = self._pick(now)
+                        if item is not None:
+                            self._global.take(now)
+                            self._chat_bucket(item.chat_id).take(now)
+                            self._inflight.add(item.chat_id)
+                            task = asyncio.create_task(self._send(item))
+                            self._sending.add(task)
+                            task.add_done_callback(self._sending.discard)
+                            continue
+                        timeout = wait if wait != float("inf") else None
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, item: _Item) -> None:
+        from telegram.error import BadRequest, NetworkError, RetryAfter
+
+        try:
+            result = await item.fn()
+        except RetryAfter as e:
+            ra = e.retry_after
+            secs = ra.total_seconds() if hasattr(ra, "total_seconds") else float(ra)
+            self.retry_after_hits += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + secs)
+            logger.warning("SendQueue RetryAfter=%.1fs chat_id=%s (cola pausada)", secs, item.chat_id)
+            self._retry(item, e, delay=0.0)
+        except BadRequest as e:
+            self._fail(item, e)
+        except NetworkError as e:
+            # incluye TimedOut: sin idempotencia solo se reintenta si el request no salió
+            if not item.idempotent and not _request_not_sent(e):
+                self._fail(item, e)
+                return
+            delay = min(self.backoff_max_s, self.backoff_base_s * (2 ** item.attempts))
+            self._retry(item, e, delay=delay)
+        except Exception as e:
+            self._fail(item, e)
+        else:
+            self.sent += 1
+            self._latencies.append(time.monotonic() - item.enqueued_at)
+            if not item.future.done():
+                item.future.set_result(result)
+        finally:
+            self._inflight.discard(item.chat_id)
+            self._wake.set()
+
+    def _retry(self, item: _Item, exc: Exception, delay: float) -> None:
+        item.attempts += 1
+        if item.attempts > self.max_retries:
+            self._fail(item, exc)
+            return
+        self.retries += 1
+        item.not_before = time.monotonic() + delay
+        heapq.heappush(self._heap, item)  # conserva priority/seq: sigue primero en su chat
+
+    def _fail(self, item: _Item, exc: Exception) -> None:
+        self.failed += 1
+        logger.warning("SendQueue fallo definitivo chat_id=%s intentos=%s: %s", item.chat_id, item.attempts + 1, exc)
+        if not item.future.done():
+            item.future.set_exception(exc)
+
+    # ---------------------------
+    # Métricas
+    # ---------------------------
+    def stats(self) -> Dict[str, Any]:
+        depth: Dict[str, int] = {name: 0 for name in PRIORITY_NAMES.values()}
+        for item in self._heap:
+            name = PRIORITY_NAMES.get(item.priority, str(item.priority))
+            depth[name] = depth.get(name, 0) + 1
+        lat = sorted(self._latencies)
+        paused = self._paused_until - time.monotonic()
+        return {
+            "depth": len(self._heap),
+            "depth_by_priority": depth,
+            "inflight": len(self._sending),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "retry_after_hits": self.retry_after_hits,
+            "paused_s": round(paused, 2) if paused > 0 else 0.0,
+            "latency_ms_p50": round(lat[len(lat) // 2] * 1000, 2) if lat else 0.0,
+            "latency_ms_p95": round(lat[int(len(lat) * 0.95) - 1] * 1000, 2) if lat else 0.0,
+            "latency_ms_max": round(lat[-1] * 1000, 2) if lat else 0.0,
+        }
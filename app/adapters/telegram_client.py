@@ -1,8 +1,12 @@
 from typing import Optional
 
+from app.adapters.send_queue import PRIORITY_CUSTOMER, SendQueue
+
 class TelegramClient:
-    def __init__(self):
+    def __init__(self, queue: Optional[SendQueue] = None):
         self._bot = None
+        # si hay cola, los envíos pasan por ella (rate limit + reintentos + prioridad)
+        self.queue = queue
 
     def set_bot(self, bot):
         self._bot = bot
@@ -11,7 +15,48 @@ class TelegramClient:
     def ready(self) -> bool:
         return self._bot is not None
 
-    async def send_text(self, chat_id: int, text: str, parse_mode: Optional[str] = None):
+    async def send_text(
+        self,
+        chat_id: int,
+        text: str,
+        parse_mode: Optional[str] = None,
+        priority: int = PRIORITY_CUSTOMER,
+    ):
+        if not self._bot:
+            raise RuntimeError("Telegram bot no inicializado")
+        bot = self._bot
+
+        async def _send():
+            return await bot.send_message(chat_id=int(chat_id), text=text, parse_mode=parse_mode)
+
+        if self.queue is not None and self.queue.running:
+            return await self.queue.submit(int(chat_id), _send, priority=priority)
+        return await _send()
+
+    async def edit_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        parse_mode: Optional[str] = None,
+        priority: int = PRIORITY_CUSTOMER,
+    ):
+        if not self._bot:
+            raise RuntimeError("Telegram bot no inicializado")
+        bot = self._bot
+
+        async def _edit():
+            return await bot.edit_message_text(
+                chat_id=int(chat_id), message_id=int(message_id), text=text, parse_mode=parse_mode
+            )
+
+        if self.queue is not None and self.queue.running:
+            # editar con el mismo texto es idempotente: se puede reintentar tras un TimedOut
+            return await self.queue.submit(int(chat_id), _edit, priority=priority, idempotent=True)
+        return await _edit()
+
+    async def send_chat_action(self, chat_id: int, action: str = "typing"):
+        # directo, sin cola: es efímero y no debe esperar detrás de mensajes
         if not self._bot:
             raise RuntimeError("Telegram bot no inicializado")
-        await self._bot.send_message(chat_id=int(chat_id), text=text, parse_mode=parse_mode)
+        await self._bot.send_chat_action(chat_id=int(chat_id), action=action)
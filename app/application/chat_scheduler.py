@@ -0,0 +1,55 @@
+# app/application/chat_scheduler.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Lane:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class ChatScheduler:
+    """
+    Scheduler por llave (chat_id):
+    - Dentro de un mismo chat las tareas corren en estricto orden de llegada (asyncio.Lock es FIFO)
+    - Chats distintos corren en paralelo
+    - El carril de un chat se elimina apenas queda sin tareas pendientes, así la memoria
+      depende de los chats activos y no del total de chats vistos
+    """
+
+    def __init__(self):
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self.max_lanes = 0
+        self.lanes_evicted = 0
+
+    async def run(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = _Lane()
+            self._lanes[key] = lane
+            if len(self._lanes) > self.max_lanes:
+                self.max_lanes = len(self._lanes)
+
+        lane.pending += 1
+        try:
+            async with lane.lock:
+                return await fn(*args, **kwargs)
+        finally:
+            lane.pending -= 1
+            if lane.pending == 0 and self._lanes.get(key) is lane:
+                del self._lanes[key]
+                self.lanes_evicted += 1
+
+    def pending(self, key: Hashable) -> int:
+        lane = self._lanes.get(key)
+        return lane.pending if lane else 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_lanes": len(self._lanes),
+            "max_lanes": self.max_lanes,
+            "lanes_evicted": self.lanes_evicted,
+        }
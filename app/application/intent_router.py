@@ -0,0 +1,192 @@
+# app/application/intent_router.py
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.repositories.menu_repo import MenuRepository
+from app.services.pricing_service import PricingService
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+
+def normalize_text(text: str) -> str:
+    """minúsculas, sin tildes ni signos de puntuación, espacios colapsados."""
+    t = unicodedata.normalize("NFKD", (text or "").lower())
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    t = re.sub(r"[^\w\s.]", " ", t)
+    t = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", t)
+    return " ".join(t.split())
+
+
+# Patrones anclados (texto completo) para no capturar mensajes con más intención
+_RESTAURANTS_RE = re.compile(
+    r"^(?:hola )?(?:(?:que|cuales) )?(?:restaurantes|negocios)(?: (?:hay|tienen|tienes|manejan|disponibles))?$"
+)
+_MENU_RE = re.compile(
+    r"^(?:hola )?(?:(?:ver|mostrar|muestrame|quiero ver|me (?:das|muestras|pasas|envias)) )?(?:el |la )?"
+    r"(?:menu|carta)(?: (?:de|del|de la) (?P<rest>.+))?$"
+)
+_PRICE_RE = re.compile(
+    r"^(?:precio|valor|cuanto (?:vale|cuesta|es|sale))(?: (?:de|del|la|el|una|un))* (?P<item>.+?)"
+    r"(?: (?:en|de|del) (?P<rest>.+))?$"
+)
+
+_NAME_STOPWORDS = {"de", "del", "la", "el", "los", "las", "y"}
+
+
+def match_restaurant(names: Iterable[str], text: Optional[str]) -> Optional[str]:
+    """Restaurante cuyo nombre comparte palabras con el texto; None si no hay uno único."""
+    if not text:
+        return None
+    words = set(normalize_text(text).split()) - _NAME_STOPWORDS
+    best: List[Tuple[int, str]] = []
+    for name in names:
+        name_words = set(normalize_text(name).split()) - _NAME_STOPWORDS
+        score = len(words & name_words)
+        if score:
+            best.append((score, name))
+    if not best:
+        return None
+    best.sort(reverse=True)
+    if len(best) > 1 and best[0][0] == best[1][0]:
+        return None
+    return best[0][1]
+
+
+class IntentRouter:
+    """
+    Fast path sin LLM para intenciones frecuentes del cliente:
+    - "qué restaurantes hay"      -> lista de restaurantes
+    - "menú [de <restaurante>]"   -> menú desde MenuRepository.get_menu
+    - "precio <item> [en <rest>]" -> precio desde PricingService.price
+    Si el mensaje es ambiguo retorna None y el router usa el agente.
+    """
+
+    def __init__(self, menu_repo: MenuRepository, pricing_service: PricingService):
+        self.menu_repo = menu_repo
+        self.pricing_service = pricing_service
+
+        self.total = 0
+        self.hits: Dict[str, int] = {"restaurants": 0, "menu": 0, "price": 0}
+
+    # ---------------------------
+    # Entrada principal
+    # ---------------------------
+    def match(self, text: str) -> Optional[str]:
+        t = normalize_text(text)
+        answer: Optional[str] = None
+        intent = None
+
+        if _RESTAURANTS_RE.match(t):
+            intent, answer = "restaurants", self._restaurants_answer()
+        elif m := _MENU_RE.match(t):
+            intent, answer = "menu", self._menu_answer(m.group("rest"))
+        elif m := _PRICE_RE.match(t):
+            intent, answer = "price", self._price_answer(m.group("item"), m.group("rest"))
+
+        self.total += 1
+        if answer is not None and intent:
+            self.hits[intent] += 1
+        hits = sum(self.hits.values())
+        logger.info(
+            "FASTPATH %s intent=%s hit_rate=%.1f%% (%s/%s)",
+            "hit" if answer is not None else "miss", intent, 100.0 * hits / self.total, hits, self.total,
+        )
+        return answer
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(self.hits.values())
+        return {
+            "total": self.total,
+            "hits": dict(self.hits),
+            "hit_rate": round(hits / self.total, 4) if self.total else 0.0,
+        }
+
+    # ---------------------------
+    # Resolución de nombres
+    # ---------------------------
+    def _resolve_restaurant(self, text: Optional[str]) -> Optional[str]:
+        return match_restaurant(self.menu_repo.raw().keys(), text)
+
+    def _resolve_item(self, item: str, restaurant: Optional[str]) -> Optional[Tuple[str, str]]:
+        """(restaurante, item) con nombre exacto (normalizado); None si no existe o es ambiguo."""
+        wanted = normalize_text(item)
+        found: List[Tuple[str, str]] = []
+        for rest, cfg in self.menu_repo.raw().items():
+            if restaurant and rest != restaurant:
+                continue
+            for name in cfg.get("items", {}).keys():
+                if normalize_text(name) == wanted:
+                    found.append((rest, name))
+        return found[0] if len(found) == 1 else None
+
+    # ---------------------------
+    # Plantillas
+    # ---------------------------
+    def _restaurants_answer(self) -> str:
+        names = list(self.menu_repo.raw().keys())
+        lines = "\n".join(f"- {n}" for n in names)
+        return f"Estos son los restaurantes disponibles:\n{lines}\n\n¿De cuál quieres ver el menú?"
+
+    def _menu_answer(self, rest_text: Optional[str]) -> Optional[str]:
+        names = list(self.menu_repo.raw().keys())
+        if rest_text:
+            restaurant = self._resolve_restaurant(rest_text)
+            if restaurant is None:
+                return None
+        elif len(names) == 1:
+            restaurant = names[0]
+        else:
+            return self._restaurants_answer()
+
+        menu = self.menu_repo.get_menu(restaurant)
+        if not menu.get("ok"):
+            return None
+
+        currency = menu.get("currency", "COP")
+        lines = [f"Menú de {restaurant}:"]
+        for name, price in menu["items"].items():
+            lines.append(f"- {name}: {int(price):,} {currency}")
+            extras = self._options_text(menu["options"].get(name) or {}, currency)
+            if extras:
+                lines.append(f"  {extras}")
+        lines.append(f"Domicilio: {int(menu['delivery_fee']):,} {currency}")
+        lines.append("\n¿Qué te gustaría pedir?")
+        return "\n".join(lines)
+
+    def _price_answer(self, item_text: str, rest_text: Optional[str]) -> Optional[str]:
+        restaurant = None
+        if rest_text:
+            restaurant = self._resolve_restaurant(rest_text)
+            if restaurant is None:
+                return None
+        resolved = self._resolve_item(item_text, restaurant)
+        if resolved is None:
+            return None
+
+        rest, item = resolved
+        priced = self.pricing_service.price({"restaurante": rest, "items": [{"nombre": item, "cantidad": 1}]})
+        if not priced.get("ok") or priced.get("warnings") or not priced.get("detalle_lineas"):
+            return None
+
+        currency = priced.get("currency", "COP")
+        base = priced["detalle_lineas"][0]["base"]
+        options = (self.menu_repo.raw()[rest].get("options") or {}).get(item) or {}
+        extras = self._options_text(options, currency)
+        txt = f"{item} en {rest}: {int(base):,} {currency}."
+        if extras:
+            txt += f"\n{extras}"
+        txt += f"\nDomicilio: {int(priced['delivery_fee']):,} {currency}."
+        return txt
+
+    @staticmethod
+    def _options_text(options: Dict[str, Any], currency: str) -> str:
+        parts = []
+        for group, label in (("bordes", "Bordes"), ("adiciones", "Adiciones")):
+            values = options.get(group) or {}
+            if values:
+                vals = ", ".join(f"{k} +{int(v):,}" if v else k for k, v in values.items())
+                parts.append(f"{label}: {vals}")
+        return " | ".join(parts)
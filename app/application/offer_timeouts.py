@@ -0,0 +1,231 @@
+# app/application/offer_timeouts.py
+import asyncio
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+OnExpire = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class OfferTimeouts:
+    """
+    Timeouts de ofertas enviadas a domiciliarios (status "sent" sin ACEPTO / NO PUEDO):
+    - arm()/cancel() en O(log n) sobre un heap de deadlines (borrado perezoso)
+    - una sola tarea asyncio duerme hasta el deadline más próximo y llama on_expire(offer)
+    - las ofertas pendientes (con snapshot del dispatch) se guardan en un JSON para
+      sobrevivir reinicios; al arrancar, las vencidas se disparan de inmediato
+    """
+
+    def __init__(self, path: Optional[str] = None, flush_interval_s: float = 1.0):
+        self.path = path or None
+        self.flush_interval_s = float(flush_interval_s)
+
+        # dispatch_id -> (deadline, seq, offer)
+        self._offers: Dict[str, Tuple[float, int, Dict[str, Any]]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._dirty = False
+        # escrituras serializadas; una escritura vieja nunca pisa una más nueva (gen)
+        self._write_lock = threading.Lock()
+        self._snap_gen = 0
+        self._written_gen = 0
+
+        self._on_expire: Optional[OnExpire] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._firing: Set[asyncio.Task] = set()
+
+        # métricas
+        self.armed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.failed = 0
+        self._lag_max = 0.0
+
+    # ---------------------------
+    # Ciclo de vida
+    # ---------------------------
+    async def start(self, on_expire: OnExpire) -> None:
+        if self._task is not None:
+            return
+        self._on_expire = on_expire
+        self._wake = asyncio.Event()
+        restored = self._load()
+        self._task = asyncio.create_task(self._run(), name="offer-timeouts")
+        logger.info("OfferTimeouts iniciado pendientes=%s restauradas=%s path=%s", len(self._offers), restored, self.path)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._firing:
+            await asyncio.gather(*self._firing, return_exceptions=True)
+        self._save()
+
+    # ---------------------------
+    # API
+    # ---------------------------
+    def arm(self, dispatch_id: str, timeout_s: float, offer: Dict[str, Any]) -> None:
+        """Programa (o reprograma) el vencimiento de la oferta dispatch_id."""
+        deadline = time.time() + max(0.0, float(timeout_s))
+        self._push(str(dispatch_id), deadline, {**offer, "dispatch_id": str(dispatch_id)})
+        self.armed += 1
+
+    def cancel(self, dispatch_id: str) -> bool:
+        """True si había una oferta pendiente (la entrada del heap se descarta al salir)."""
+        if self._offers.pop(str(dispatch_id), None) is None:
+            return False
+        self.cancelled += 1
+        self._dirty = True
+        self._compact()
+        return True
+
+    def pending(self) -> int:
+        return len(self._offers)
+
+    def stats(self) -> Dict[str, Any]:
+        next_in = self._heap[0][0] - time.time() if self._offers and self._heap else None
+        return {
+            "pending": len(self._offers),
+            "heap": len(self._heap),
+            "armed": self.armed,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "failed": self.failed,
+            "next_deadline_in_s": round(next_in, 2) if next_in is not None else None,
+            "fire_lag_ms_max": round(self._lag_max * 1000, 2),
+            "persisted": self.path is not None,
+        }
+
+    # ---------------------------
+    # Heap
+    # ---------------------------
+    def _push(self, dispatch_id: str, deadline: float, offer: Dict[str, Any]) -> None:
+        self._seq += 1
+        self._offers[dispatch_id] = (deadline, self._seq, offer)
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (deadline, self._seq, dispatch_id))
+        self._dirty = True
+        if earliest is None or deadline < earliest:
+            self._wake.set()
+
+    def _compact(self) -> None:
+        # muchas cancelaciones (el caso normal: el domiciliario responde) dejan basura en el heap
+        if len(self._heap) > 2 * len(self._offers) + 64:
+            self._heap = [(d, s, k) for k, (d, s, _) in self._offers.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_expired(self, now: float) -> List[Tuple[float, Dict[str, Any]]]:
+        out = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, seq, dispatch_id = heapq.heappop(heap)
+            current = self._offers.get(dispatch_id)
+            if current is None or current[1] != seq:
+                continue  # cancelada o reprogramada
+            del self._offers[dispatch_id]
+            self._dirty = True
+            out.append((deadline, current[2]))
+        return out
+
+    # ---------------------------
+    # Loop
+    # ---------------------------
+    async def _run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            self._wake.clear()
+            now = time.time()
+            for deadline, offer in self._pop_expired(now):
+                lag = now - deadline
+                if lag > self._lag_max:
+                    self._lag_max = lag
+                task = asyncio.create_task(self._fire(offer))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+
+            if self._dirty and time.monotonic() - last_flush >= self.flush_interval_s:
+                # snapshot en el loop; serializar y escribir en un thread
+                data = self._snapshot()
+                self._dirty = False
+                if not await asyncio.to_thread(self._write, data):
+                    self._dirty = True
+                last_flush = time.monotonic()
+
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if self._dirty:
+                timeout = self.flush_interval_s if timeout is None else min(timeout, self.flush_interval_s)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, timeout) if timeout is not None else None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, offer: Dict[str, Any]) -> None:
+        try:
+            await self._on_expire(offer)
+            self.expired += 1
+        except Exception:
+            self.failed += 1
+            logger.exception("OfferTimeouts: fallo procesando vencimiento dispatch_id=%s", offer.get("dispatch_id"))
+
+    # ---------------------------
+    # Persistencia
+    # ---------------------------
+    def _snapshot(self) -> Dict[str, Any]:
+        # las ofertas no se mutan después de arm(): basta copiar la lista
+        self._snap_gen += 1
+        return {
+            "gen": self._snap_gen,
+            "offers": [
+                {"dispatch_id": k, "deadline": d, "offer": offer}
+                for k, (d, _, offer) in self._offers.items()
+            ]
+        }
+
+    def _write(self, data: Dict[str, Any]) -> bool:
+        if not self.path:
+            return True
+        tmp = f"{self.path}.tmp"
+        with self._write_lock:
+            if data["gen"] <= self._written_gen:
+                return True
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+                self._written_gen = data["gen"]
+                return True
+            except Exception:
+                logger.exception("OfferTimeouts: no pude guardar %s", self.path)
+                return False
+
+    def _save(self) -> None:
+        if self._write(self._snapshot()):
+            self._dirty = False
+
+    def _load(self) -> int:
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            logger.exception("OfferTimeouts: no pude leer %s", self.path)
+            return 0
+        n = 0
+        for row in data.get("offers", []):
+            try:
+                self._push(str(row["dispatch_id"]), float(row["deadline"]), dict(row["offer"]))
+                n += 1
+            except Exception:
+                continue
+        return n
@@ -0,0 +1,152 @@
+# app/application/reply_streamer.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from app.adapters.send_queue import PRIORITY_CUSTOMER
+from app.adapters.telegram_client import TelegramClient
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+TELEGRAM_MAX_LEN = 4096
+
+
+def split_text(text: str, limit: int = TELEGRAM_MAX_LEN) -> List[str]:
+    """Parte un texto largo en mensajes <= limit, cortando en saltos de línea si se puede."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+@asynccontextmanager
+async def keep_typing(tg_client: TelegramClient, chat_id: int, every_s: float = 4.0) -> AsyncIterator[None]:
+    """Reenvía "typing" cada every_s mientras dure el bloque (Telegram lo borra a los ~5 s)."""
+
+    async def loop():
+        while True:
+            try:
+                await tg_client.send_chat_action(chat_id=chat_id, action="typing")
+            except Exception as e:
+                logger.warning("No pude enviar chat_action typing chat_id=%s: %s", chat_id, e)
+            await asyncio.sleep(every_s)
+
+    task = asyncio.create_task(loop())
+    try:
+        yield
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+class ReplyStreamer:
+    """
+    Respuesta progresiva en Telegram mientras el agente genera tokens:
+    - el primer mensaje sale apenas hay min_chars (tiempo percibido = primer token)
+    - luego edit_message_text con el texto acumulado, como máximo cada edit_interval_s
+      (las ediciones cuentan para el límite por chat)
+    - finish(texto_final) deja el mensaje con la respuesta definitiva
+    update() es barato (se llama por token); los envíos ocurren en una tarea aparte.
+    """
+
+    def __init__(
+        self,
+        tg_client: TelegramClient,
+        chat_id: int,
+        edit_interval_s: float = 1.0,
+        min_chars: int = 20,
+    ):
+        self.tg_client = tg_client
+        self.chat_id = int(chat_id)
+        self.edit_interval_s = float(edit_interval_s)
+        self.min_chars = int(min_chars)
+
+        self.message_id: Optional[int] = None
+        self.shown = ""
+        self.edits = 0
+        self.first_sent_at: Optional[float] = None
+        self._text = ""
+        self._last_edit = 0.0
+        self._wake = asyncio.Event()
+        self._io = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def update(self, text: str) -> None:
+        self._text = text
+        self._wake.set()
+
+    async def finish(self, final_text: str) -> None:
+        parts = split_text(final_text or "")
+        # con _io tomado _run no está a mitad de un envío: cancelarlo antes podía perder el
+        # message_id del primer mensaje (ya entregado por la cola) y duplicar la respuesta
+        async with self._io:
+            if self._task is not None:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+                self._task = None
+
+            if self.message_id is None:
+                for part in parts:
+                    await self.tg_client.send_text(chat_id=self.chat_id, text=part, priority=PRIORITY_CUSTOMER)
+                return
+            if parts[0] != self.shown and not await self._edit(parts[0]):
+                # sin edición posible (mensaje borrado, etc.): la respuesta va como mensaje nuevo
+                await self.tg_client.send_text(chat_id=self.chat_id, text=parts[0], priority=PRIORITY_CUSTOMER)
+            for part in parts[1:]:
+                await self.tg_client.send_text(chat_id=self.chat_id, text=part, priority=PRIORITY_CUSTOMER)
+
+    # ---------------------------
+    # Envíos
+    # ---------------------------
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            text = self._text[:TELEGRAM_MAX_LEN].rstrip()
+
+            if self.message_id is None:
+                if len(text) < self.min_chars:
+                    continue
+                async with self._io:
+                    msg = await self.tg_client.send_text(chat_id=self.chat_id, text=text, priority=PRIORITY_CUSTOMER)
+                    self.message_id = msg.message_id
+                    self.shown = text
+                    self.first_sent_at = time.monotonic()
+                    self._last_edit = self.first_sent_at
+                continue
+
+            wait = self._last_edit + self.edit_interval_s - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                text = self._text[:TELEGRAM_MAX_LEN].rstrip()
+            if text and text != self.shown:
+                async with self._io:
+                    await self._edit(text)
+
+    async def _edit(self, text: str) -> bool:
+        try:
+            await self.tg_client.edit_text(
+                chat_id=self.chat_id, message_id=self.message_id, text=text, priority=PRIORITY_CUSTOMER
+            )
+        except Exception as e:
+            if "not modified" in str(e).lower():
+                self.shown = text
+                return True
+            logger.warning("No pude editar la respuesta en curso chat_id=%s: %s", self.chat_id, e)
+            return False
+        self.shown = text
+        self.edits += 1
+        self._last_edit = time.monotonic()
+        return True
@@ -0,0 +1,157 @@
+# app/application/response_cache.py
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from app.application.intent_router import match_restaurant, normalize_text
+from app.repositories.menu_repo import MenuRepository
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+# Saludos / cortesía que no cambian la pregunta (se quitan de la llave)
+_GREETING_RE = re.compile(r"^(?:(?:hola|buenas tardes|buenas noches|buenos dias|buen dia|buenas) )+")
+_COURTESY_RE = re.compile(r"(?: (?:por favor|porfa|porfavor|gracias))+$")
+# Preguntas informativas: empiezan como pregunta y no traen nada que cambie el pedido
+_QUESTION_RE = re.compile(
+    r"^(?:que|cual|cuales|cuanto|cuanta|cuantos|cuantas|como|donde|tienen|tienes|hay|manejan|venden|hacen|"
+    r"a que hora|hasta que hora|precio|valor)\b"
+)
+# Palabras que indican pedido en curso, datos del cliente o estado del despacho: nunca se cachean
+_STATEFUL_WORDS = frozenset({
+    "quiero", "quisiera", "agrega", "agregale", "agregar", "anade", "anadele", "pon", "ponme", "ponle",
+    "pide", "pido", "pedir", "confirmo", "confirmar", "confirma", "cambia", "cambiale", "cambiar",
+    "quita", "quitale", "quitar", "cancela", "cancelar", "cancelo", "borra", "dame", "deme", "mandame",
+    "envia", "enviame", "mi", "mis", "me", "si", "listo", "dale", "ok",
+    "pedido", "orden", "total", "llevo", "van", "domiciliario", "repartidor", "llega", "demora",
+    "tarda", "falta", "estado", "direccion", "telefono", "pago",
+})
+_MAX_WORDS = 15
+
+# Tools que puede usar un turno cacheable (solo lectura del menú)
+CACHEABLE_TOOLS = frozenset({"get_menu", "healthcheck"})
+
+
+class ResponseCache:
+    """
+    Caché de respuestas del agente para preguntas informativas repetidas ("qué pizzas tienen",
+    "cuánto es el domicilio"):
+    - llave = (texto normalizado, restaurante del contexto, versión del menú)
+    - LRU de max_entries y TTL de ttl_s; si cambia menu_repo.version se vacía
+    - key() es None si el mensaje puede tocar el pedido (quiero, agrega, confirmo, mi dirección...)
+    - el router solo guarda la respuesta si el turno no usó tools fuera de CACHEABLE_TOOLS y el
+      thread no tenía mensajes previos: la llave es compartida entre chats y una respuesta
+      generada con historial puede traer el nombre, la dirección o el pedido de ese cliente
+    El restaurante del contexto es el que nombra el mensaje o, si no, el último que usó el chat.
+    """
+
+    def __init__(
+        self,
+        menu_repo: MenuRepository,
+        max_entries: int = 512,
+        ttl_s: float = 900.0,
+        max_chats: int = 5000,
+    ):
+        self.menu_repo = menu_repo
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self.max_chats = max(1, int(max_chats))
+
+        # llave -> (expira_en monotonic, respuesta); orden LRU
+        self._entries: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()
+        self._version: Optional[int] = None
+        # chat_id -> último restaurante usado en el agente (LRU acotado)
+        self._chat_restaurant: "OrderedDict[int, str]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stored = 0
+        self.not_stored_context = 0
+        self.invalidated = 0
+
+    # ---------------------------
+    # Llave
+    # ---------------------------
+    def key(self, text: str, chat_id: int) -> Optional[Hashable]:
+        """Llave del mensaje, o None si no es una pregunta informativa sin estado."""
+        t = _COURTESY_RE.sub("", _GREETING_RE.sub("", normalize_text(text)))
+        words = t.split()
+        if not words or len(words) > _MAX_WORDS or not _QUESTION_RE.match(t) or _STATEFUL_WORDS.intersection(words):
+            self.skipped += 1
+            return None
+        restaurant = match_restaurant(self.menu_repo.raw().keys(), t) or self._chat_restaurant.get(int(chat_id))
+        return (t, restaurant, self.menu_repo.version)
+
+    def note_restaurant(self, chat_id: int, restaurant: Optional[str]) -> None:
+        if not restaurant:
+            return
+        chat_id = int(chat_id)
+        self._chat_restaurant[chat_id] = restaurant
+        self._chat_restaurant.move_to_end(chat_id)
+        while len(self._chat_restaurant) > self.max_chats:
+            self._chat_restaurant.popitem(last=False)
+
+    # ---------------------------
+    # Lectura / escritura
+    # ---------------------------
+    def _check_version(self) -> None:
+        version = self.menu_repo.version
+        if version != self._version:
+            if self._entries:
+                logger.info("RESPONSE_CACHE menú cambió (v%s -> v%s): %s respuestas invalidadas",
+                            self._version, version, len(self._entries))
+                self.invalidated += len(self._entries)
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable) -> Optional[str]:
+        self._check_version()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(
+        self, key: Hashable, answer: str, tools_used: Iterable[str] = (), had_context: bool = True
+    ) -> bool:
+        """
+        Guarda la respuesta si el turno fue solo de lectura y sin historial previo del cliente
+        (had_context=False); retorna si se guardó.
+        """
+        if not answer or not set(tools_used) <= CACHEABLE_TOOLS:
+            return False
+        if had_context:
+            self.not_stored_context += 1
+            return False
+        self._check_version()
+        if key[2] != self._version:
+            # el menú cambió mientras corría el agente
+            return False
+        self._entries[key] = (time.monotonic() + self.ttl_s, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.stored += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_cacheable": self.skipped,
+            "stored": self.stored,
+            "not_stored_context": self.not_stored_context,
+            "invalidated": self.invalidated,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,76 @@
+# app/application/startup_profile.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+T = TypeVar("T")
+
+
+def process_age_s() -> Optional[float]:
+    """Segundos desde que arrancó el proceso (Linux: /proc); None si no se puede saber."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except Exception:
+        return None
+
+
+class StartupProfile:
+    """
+    Tiempos del arranque por fase (imports, secretos, agente, webhook...). Las fases pueden
+    solaparse (gather / threads): cada una guarda su inicio relativo y su duración.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        # antes de t0: intérprete + uvicorn + imports hasta aquí
+        self.before_t0_s = process_age_s()
+        self._phases: List[Tuple[str, float, float]] = []
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    def record(self, name: str, started: float, seconds: float) -> None:
+        with self._lock:
+            self._phases.append((name, (started - self.t0) * 1000, seconds * 1000))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started, time.perf_counter() - started)
+
+    async def timed(self, name: str, aw: Awaitable[T]) -> T:
+        with self.phase(name):
+            return await aw
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p[1])
+        return {
+            "process_before_app_ms": round(self.before_t0_s * 1000, 1) if self.before_t0_s is not None else None,
+            "phases": [
+                {"name": name, "start_ms": round(start, 1), "ms": round(ms, 1)} for name, start, ms in phases
+            ],
+        }
+
+    def log(self, title: str = "Startup profile") -> None:
+        data = self.report()
+        lines = [f"{title} (total {self.elapsed_ms():.0f}ms desde el import de app.main)"]
+        if data["process_before_app_ms"] is not None:
+            lines.append(f"  {'proceso -> import app.main':<34} {data['process_before_app_ms']:>8.0f}ms")
+        for p in data["phases"]:
+            lines.append(f"  {p['name']:<34} {p['ms']:>8.0f}ms  (+{p['start_ms']:.0f}ms)")
+        logger.info("\n".join(lines))
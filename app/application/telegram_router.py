@@ -1,17 +1,30 @@
 # app/application/telegram_router.py
+from __future__ import annotations
+
+import asyncio
 import json
 import logging
 import time
-from typing import Any, Dict, Optional
-
-from telegram import Update
-from telegram.ext import ContextTypes
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional, Set, Tuple
 
+from app.adapters.send_queue import PRIORITY_CUSTOMER, PRIORITY_DRIVER, PRIORITY_OFFER
 from app.adapters.telegram_client import TelegramClient
+from app.application.chat_scheduler import ChatScheduler
+from app.application.intent_router import IntentRouter
+from app.application.offer_timeouts import OfferTimeouts
+from app.application.reply_streamer import ReplyStreamer, keep_typing
+from app.application.response_cache import ResponseCache
+from app.domain.models import Dispatch
 from app.repositories.driver_repo import DriverRepository
 from app.repositories.dispatch_repo import DispatchRepository
 from app.services.dispatch_service import DispatchService
 
+if TYPE_CHECKING:
+    # solo anotaciones: telegram / langchain se importan en startup (fuera del import de app.main)
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
 
 logger = logging.getLogger("tg-langgraph-agent")
 
@@ -20,7 +33,11 @@ class TelegramRouter:
     """
     Router de mensajes:
     - Si escribe un domiciliario -> handle_driver_message (ACEPTO / NO PUEDO / COMPLETADO)
-    - Si escribe un cliente -> run_agent + reply
+    - Si escribe un cliente -> fast path sin LLM (IntentRouter), respuesta cacheada (ResponseCache)
+      o run_agent + reply
+    Los mensajes de un mismo chat se procesan en orden (ChatScheduler); chats distintos en paralelo.
+    Las ofertas sin respuesta vencen (OfferTimeouts) y se reasignan por el mismo camino que un NO PUEDO.
+    Con OFFER_BROADCAST_K > 1 la oferta va a varios domiciliarios y el primer ACEPTO gana (claim atómico).
     """
 
     def __init__(
@@ -30,12 +47,42 @@ class TelegramRouter:
         dispatches: DispatchRepository,
         dispatch_service: DispatchService,
         agent: Any,  # LangGraph agent
+        scheduler: Optional[ChatScheduler] = None,
+        intents: Optional[IntentRouter] = None,
+        offer_timeouts: Optional[OfferTimeouts] = None,
+        agent_task: Optional[asyncio.Task] = None,
+        stream_replies: bool = False,
+        stream_edit_interval_s: float = 1.0,
+        stream_min_chars: int = 20,
+        typing_refresh_s: float = 4.0,
+        response_cache: Optional[ResponseCache] = None,
+        max_threads: int = 5000,
     ):
         self.tg_client = tg_client
         self.drivers = drivers
         self.dispatches = dispatches
         self.dispatch_service = dispatch_service
         self.agent = agent
+        self.scheduler = scheduler or ChatScheduler()
+        self.intents = intents
+        self.offer_timeouts = offer_timeouts
+        # el agente puede estar construyéndose en background (cold start): se espera al usarlo
+        self.agent_task = agent_task
+        # respuestas del fast path dadas antes de que el agente existiera: se guardan al usarlo
+        self._pending_history: Dict[int, List[Tuple[str, str]]] = {}
+        # respuestas del LLM en streaming (edición progresiva) o de una sola vez
+        self.stream_replies = stream_replies
+        self.stream_edit_interval_s = stream_edit_interval_s
+        self.stream_min_chars = stream_min_chars
+        self.typing_refresh_s = typing_refresh_s
+        # respuestas del agente a preguntas informativas repetidas (sin estado del pedido)
+        self.response_cache = response_cache
+        # por thread: (cantidad de mensajes, id del último) ya procesados -> cada turno solo mira
+        # los mensajes nuevos; y ledger de ofertas ya enviadas por dispatch_id (no reenviar)
+        self.max_threads = max(1, int(max_threads))
+        self._cursors: "OrderedDict[int, Tuple[int, Optional[str]]]" = OrderedDict()
+        self._offers_sent: "OrderedDict[str, None]" = OrderedDict()
+        self.offers_deduped = 0
 
     # ---------------------------
     # Commands
@@ -50,79 +97,288 @@ class TelegramRouter:
     # ---------------------------
     # Agent runner (cliente)
     # ---------------------------
-    async def run_agent(self, user_text: str, chat_id: int) -> str:
+    async def get_agent(self) -> Any:
+        if self.agent is None and self.agent_task is not None:
+            try:
+                self.agent = await asyncio.shield(self.agent_task)
+            except Exception:
+                logger.exception("No se pudo construir el agente")
+                self.agent_task = None
+        return self.agent
+
+    async def _prepare_turn(self, user_text: str, chat_id: int) -> Optional[Tuple[Any, Dict[str, Any], Dict[str, Any]]]:
+        agent = await self.get_agent()
+        if agent is None:
+            return None
+        pending = self._pending_history.pop(chat_id, None)
+        if pending:
+            await self._record_history(agent, chat_id, pending)
+
+        # el chat del cliente va en la config del run (las tools lo leen de ahí): no se guarda en
+        # el historial y el prompt no cambia por cliente
+        config = {"configurable": {"thread_id": str(chat_id), "customer_chat_id": int(chat_id)}}
+        inputs: Dict[str, Any] = {"messages": [("user", user_text)]}
+        return agent, inputs, config
+
+    async def run_agent(self, user_text: str, chat_id: int, cache_key: Optional[Hashable] = None) -> str:
         """
         Ejecuta el agente LangGraph y, si en la traza aparece una ToolMessage con payload
         {"ok": true, "driver_chat_id": ..., "message": "..."} entonces envía ese mensaje
         al domiciliario desde este contexto async (estable en Cloud Run).
+        Con cache_key (ResponseCache.key) la respuesta se guarda si el turno fue solo de lectura.
         """
-        if self.agent is None:
+        turn = await self._prepare_turn(user_text, chat_id)
+        if turn is None:
             return "El agente no está inicializado (revisa logs / secretos)."
-
-        config = {"configurable": {"thread_id": str(chat_id)}}
-        inputs: Dict[str, Any] = {
-            "messages": [
-                ("system", f"customer_chat_id={chat_id} (usa este valor exacto cuando llames herramientas)."),
-                ("user", user_text),
-            ]
-        }
+        agent, inputs, config = turn
 
         try:
-            result = await self.agent.ainvoke(inputs, config=config)
+            result = await agent.ainvoke(inputs, config=config)
         except Exception:
             logger.exception("AGENT.ainvoke falló chat_id=%s", chat_id)
             return "Se presentó un error procesando el pedido."
 
-        # 1) Si alguna tool devolvió payload con message para el domiciliario, enviarlo aquí
-        try:
-            for m in result.get("messages", []):
-                if getattr(m, "type", None) == "tool":
-                    content = getattr(m, "content", None)
-                    if not isinstance(content, str) or not content:
+        return await self._finish_turn(result, chat_id, cache_key)
+
+    async def stream_agent(self, user_text: str, chat_id: int, cache_key: Optional[Hashable] = None) -> None:
+        """
+        Como run_agent, pero con astream: la respuesta se envía con los primeros tokens y se
+        edita a medida que llega el resto (ReplyStreamer); "typing" se refresca mientras tanto.
+        """
+        turn = await self._prepare_turn(user_text, chat_id)
+        if turn is None:
+            await self.tg_client.send_text(chat_id=chat_id, text="El agente no está inicializado (revisa logs / secretos).")
+            return
+        agent, inputs, config = turn
+        from langchain_core.messages import AIMessageChunk
+
+        streamer = ReplyStreamer(
+            self.tg_client, chat_id, edit_interval_s=self.stream_edit_interval_s, min_chars=self.stream_min_chars
+        )
+        result: Dict[str, Any] = {}
+        async with keep_typing(self.tg_client, chat_id, every_s=self.typing_refresh_s):
+            streamer.start()
+            try:
+                current_id, text = None, ""
+                async for mode, chunk in agent.astream(inputs, config=config, stream_mode=["messages", "values"]):
+                    if mode == "values":
+                        result = chunk
                         continue
-                    try:
-                        payload = json.loads(content)
-                    except Exception:
+                    msg, meta = chunk
+                    if meta.get("langgraph_node") != "agent" or not isinstance(msg, AIMessageChunk):
                         continue
+                    if msg.id != current_id:
+                        # nueva llamada al LLM (p. ej. después de una tool): el texto vuelve a empezar
+                        current_id, text = msg.id, ""
+                    if isinstance(msg.content, str) and msg.content:
+                        text += msg.content
+                        streamer.update(text)
+            except Exception:
+                logger.exception("AGENT.astream falló chat_id=%s", chat_id)
+                await streamer.finish("Se presentó un error procesando el pedido.")
+                return
+
+            answer = await self._finish_turn(result, chat_id, cache_key)
+            await streamer.finish(answer)
 
-                    if (
-                        isinstance(payload, dict)
-                        and payload.get("ok") is True
-                        and payload.get("driver_chat_id") is not None
-                        and payload.get("message")
-                    ):
-                        await self.tg_client.send_text(
-                            chat_id=int(payload["driver_chat_id"]),
-                            text=str(payload["message"]),
-                            parse_mode="Markdown",
-                        )
+    async def _finish_turn(self, result: Dict[str, Any], chat_id: int, cache_key: Optional[Hashable] = None) -> str:
+        messages = result.get("messages", [])
+        turn = self._new_messages(chat_id, messages)
+
+        # 1) Si alguna tool del turno devolvió payload con message para el domiciliario, enviarlo aquí
+        try:
+            for m in turn:
+                if getattr(m, "type", None) != "tool":
+                    continue
+                content = getattr(m, "content", None)
+                if not isinstance(content, str) or '"message"' not in content:
+                    continue
+                try:
+                    payload = json.loads(content)
+                except Exception:
+                    continue
+
+                if (
+                    isinstance(payload, dict)
+                    and payload.get("ok") is True
+                    and payload.get("driver_chat_id") is not None
+                    and payload.get("message")
+                ):
+                    await self.send_offer(
+                        dispatch_id=str(payload.get("dispatch_id") or ""),
+                        driver_chat_id=int(payload["driver_chat_id"]),
+                        message=str(payload["message"]),
+                    )
         except Exception:
             logger.exception("Fallo enviando mensaje al domiciliario desde run_agent chat_id=%s", chat_id)
 
         # 2) Respuesta final del agente al usuario
+        answer = None
         try:
-            messages = result.get("messages", [])
             for m in reversed(messages):
                 if getattr(m, "type", None) == "ai":
-                    return (m.content or "").strip()
+                    answer = (m.content or "").strip()
+                    break
         except Exception:
             logger.exception("Fallo extrayendo respuesta AI chat_id=%s", chat_id)
+        if answer is None:
+            return "No pude generar una respuesta. Intenta de nuevo."
+
+        self._log_usage(turn, chat_id)
+
+        # 3) Caché de respuestas: restaurante en contexto del chat + guardar si fue solo lectura
+        if self.response_cache is not None:
+            try:
+                self._update_response_cache(messages, turn, chat_id, cache_key, answer)
+            except Exception:
+                logger.exception("Fallo actualizando la caché de respuestas chat_id=%s", chat_id)
+        return answer
+
+    def _new_messages(self, chat_id: int, messages: List[Any]) -> List[Any]:
+        """
+        Mensajes del thread que no se han procesado: desde el cursor del turno anterior si el
+        historial sigue siendo el mismo (mismo id en esa posición); si no (thread nuevo, evictado
+        o reescrito), desde el último mensaje del cliente.
+        """
+        key = int(chat_id)
+        cursor = self._cursors.pop(key, None)
+        start = None
+        if cursor is not None:
+            index, last_id = cursor
+            if 0 < index <= len(messages) and getattr(messages[index - 1], "id", None) == last_id:
+                start = index
+        if start is None:
+            start = len(messages)
+            while start > 0 and getattr(messages[start - 1], "type", None) != "human":
+                start -= 1
+        if messages:
+            self._cursors[key] = (len(messages), getattr(messages[-1], "id", None))
+            while len(self._cursors) > self.max_threads:
+                self._cursors.popitem(last=False)
+        return messages[start:]
+
+    @staticmethod
+    def _log_usage(turn: List[Any], chat_id: int) -> None:
+        # tokens de prompt del turno y cuántos vinieron del prompt caching del proveedor
+        calls = prompt = cached = 0
+        for m in turn:
+            usage = getattr(m, "usage_metadata", None)
+            if usage:
+                calls += 1
+                prompt += usage.get("input_tokens", 0)
+                cached += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        if calls:
+            logger.info(
+                "LLM_USAGE chat_id=%s llamadas=%s prompt_tokens=%s cached_tokens=%s (%.0f%%)",
+                chat_id, calls, prompt, cached, 100.0 * cached / prompt if prompt else 0.0,
+            )
 
-        return "No pude generar una respuesta. Intenta de nuevo."
+    def _update_response_cache(
+        self, messages: List[Any], turn: List[Any], chat_id: int, cache_key: Optional[Hashable], answer: str
+    ) -> None:
+        tools_used = []
+        for m in turn:
+            for tc in getattr(m, "tool_calls", None) or []:
+                tools_used.append(tc.get("name"))
+                args = tc.get("args") or {}
+                restaurant = args.get("restaurant")
+                if restaurant is None and args.get("order_json"):
+                    order = self.dispatch_service.normalize_order(args["order_json"])
+                    restaurant = order.get("restaurante") if isinstance(order, dict) else None
+                if isinstance(restaurant, str):
+                    self.response_cache.note_restaurant(chat_id, restaurant.strip())
+        if cache_key is None:
+            return
+        # la respuesta solo es compartible si el agente no vio nada del cliente antes de este mensaje
+        last_human = len(messages) - 1
+        while last_human >= 0 and getattr(messages[last_human], "type", None) != "human":
+            last_human -= 1
+        if self.response_cache.put(cache_key, answer, tools_used, had_context=last_human != 0):
+            logger.info("RESPONSE_CACHE guardada chat_id=%s tools=%s", chat_id, tools_used)
+
+    # ---------------------------
+    # Fast path (sin LLM)
+    # ---------------------------
+    async def answer_fast_path(self, user_text: str, chat_id: int) -> Optional[str]:
+        """
+        Responde intenciones frecuentes desde plantillas. Si responde, guarda el intercambio
+        en el thread del agente para que el siguiente turno tenga el contexto.
+        """
+        if self.intents is None:
+            return None
+        try:
+            answer = self.intents.match(user_text)
+        except Exception:
+            logger.exception("IntentRouter falló chat_id=%s", chat_id)
+            return None
+        if answer is None:
+            return None
+        await self._remember_exchange(chat_id, user_text, answer)
+        return answer
+
+    async def answer_from_cache(self, user_text: str, chat_id: int) -> Tuple[Optional[str], Optional[Hashable]]:
+        """
+        (respuesta cacheada, llave). La llave es None si el mensaje no es cacheable; si hay
+        respuesta se guarda el intercambio en el historial como en el fast path.
+        """
+        if self.response_cache is None:
+            return None, None
+        try:
+            key = self.response_cache.key(user_text, chat_id)
+            answer = self.response_cache.get(key) if key is not None else None
+        except Exception:
+            logger.exception("ResponseCache falló chat_id=%s", chat_id)
+            return None, None
+        if answer is not None:
+            logger.info("RESPONSE_CACHE hit chat_id=%s", chat_id)
+            await self._remember_exchange(chat_id, user_text, answer)
+        return answer, key
+
+    async def _remember_exchange(self, chat_id: int, user_text: str, answer: str) -> None:
+        """Guarda en el thread del agente un intercambio respondido sin LLM."""
+        if self.agent is None and self.agent_task is not None and not self.agent_task.done():
+            # cold start: el agente aún se construye; no hacer esperar la respuesta
+            self._pending_history.setdefault(chat_id, []).append((user_text, answer))
+            return
+        agent = await self.get_agent()
+        if agent is not None:
+            exchanges = self._pending_history.pop(chat_id, []) + [(user_text, answer)]
+            await self._record_history(agent, chat_id, exchanges)
+
+    async def _record_history(self, agent: Any, chat_id: int, exchanges: List[Tuple[str, str]]) -> None:
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        messages = []
+        for user_text, answer in exchanges:
+            messages += [HumanMessage(content=user_text), AIMessage(content=answer)]
+        try:
+            await agent.aupdate_state(
+                {"configurable": {"thread_id": str(chat_id)}},
+                {"messages": messages},
+                as_node="agent",
+            )
+        except Exception:
+            logger.exception("No pude registrar el fast path en el historial chat_id=%s", chat_id)
 
     # ---------------------------
     # Reassign (cuando rechazan)
     # ---------------------------
-    async def reassign_and_send(self, dispatch: Dict[str, Any], exclude_driver_chat_id: int) -> Dict[str, Any]:
+    async def reassign_and_send(
+        self,
+        dispatch: Dict[str, Any],
+        exclude_driver_chat_id: int,
+        exclude_chat_ids: Optional[Set[int]] = None,
+    ) -> Dict[str, Any]:
         """
         Reasigna el pedido a otro driver disponible (excluyendo al que rechazó),
         actualiza repos y envía el mensaje al nuevo driver.
         """
         order = dispatch.get("order") or {}
         customer_chat_id = dispatch.get("customer_chat_id")
+        exclude = {int(exclude_driver_chat_id)} | set(exclude_chat_ids or ())
 
         # 1) asignar nuevo driver
-        res = self.dispatch_service.assign_driver(order=order, exclude={int(exclude_driver_chat_id)})
+        res = self.dispatch_service.assign_driver(order=order, exclude=exclude)
         if not res.get("ok"):
             return {"ok": False, "error": res.get("error", "No disponible")}
 
@@ -139,22 +395,17 @@ class TelegramRouter:
             reassigned_from=dispatch.get("dispatch_id"),
         )
 
-        # 3) enviar pedido al nuevo driver
+        # 3) enviar pedido al nuevo driver (y a K-1 más en modo broadcast)
         msg = self.dispatch_service.format_order_message(order)
         try:
-            await self.tg_client.send_text(
-                chat_id=new_driver_chat_id,
-                text=msg,
-                parse_mode="Markdown",
-            )
+            await self.send_offer(new_dispatch_id, new_driver_chat_id, msg, exclude=exclude)
         except Exception as e:
             logger.exception("Fallo enviando a nuevo driver chat_id=%s", new_driver_chat_id)
 
             # liberar driver para no dejarlo ocupado
             self.drivers.set_available(new_driver_chat_id, True)
-            self.dispatches.clear_active_for_driver(new_driver_chat_id)
-
-            # (Opcional) podrías marcar el dispatch como send_failed si lo persistes
+            self.dispatches.clear_active_for_driver(new_driver_chat_id, new_dispatch_id)
+            self.dispatches.transition(new_dispatch_id, "rejected", rejected_ts=int(time.time()))
             return {"ok": False, "error": "No pude enviar al nuevo domiciliario", "detail": str(e)}
 
         # 4) notificar cliente (opcional recomendado)
@@ -169,6 +420,170 @@ class TelegramRouter:
 
         return {"ok": True, "dispatch_id": new_dispatch_id, "driver_chat_id": new_driver_chat_id}
 
+    # ---------------------------
+    # Ofertas (uno o varios domiciliarios)
+    # ---------------------------
+    async def send_offer(
+        self,
+        dispatch_id: str,
+        driver_chat_id: int,
+        message: str,
+        exclude: Optional[Set[int]] = None,
+    ) -> None:
+        """
+        Envía la oferta al domiciliario asignado (si falla, propaga la excepción) y, en modo
+        broadcast, a los K-1 mejores disponibles siguientes; luego arma el timeout de la oferta.
+        Cada dispatch_id se ofrece una sola vez (ledger): repetirlo no reenvía nada.
+        """
+        if dispatch_id:
+            if dispatch_id in self._offers_sent:
+                self.offers_deduped += 1
+                logger.warning("OFFER duplicada ignorada dispatch_id=%s driver_chat_id=%s", dispatch_id, driver_chat_id)
+                return
+            # se marca antes del envío (otra tarea no la duplica mientras tanto); si falla se desmarca
+            self._offers_sent[dispatch_id] = None
+            while len(self._offers_sent) > self.max_threads * 4:
+                self._offers_sent.popitem(last=False)
+        try:
+            await self.tg_client.send_text(
+                chat_id=int(driver_chat_id), text=message, parse_mode="Markdown", priority=PRIORITY_OFFER
+            )
+        except Exception:
+            self._offers_sent.pop(dispatch_id, None)
+            raise
+
+        disp = self.dispatches.get(dispatch_id) if dispatch_id else None
+        if disp is None:
+            return
+
+        extra_n = self.dispatch_service.offer_broadcast_k - 1
+        if extra_n > 0:
+            skip = {int(driver_chat_id)} | set(exclude or ())
+            extras = []
+            for d in self.dispatch_service.reserve_extra_drivers(disp.order, skip, extra_n):
+                # si ya lo aceptó el primero mientras tanto, el extra se libera sin enviarle nada
+                if self.dispatches.add_offer(dispatch_id, int(d.chat_id)):
+                    extras.append(int(d.chat_id))
+                else:
+                    self.drivers.set_available(int(d.chat_id), True)
+
+            results = await asyncio.gather(
+                *[
+                    self.tg_client.send_text(chat_id=cid, text=message, parse_mode="Markdown", priority=PRIORITY_OFFER)
+                    for cid in extras
+                ],
+                return_exceptions=True,
+            )
+            for cid, r in zip(extras, results):
+                if isinstance(r, Exception):
+                    logger.warning("No pude enviar oferta broadcast driver_chat_id=%s: %s", cid, r)
+                    self.dispatches.decline(dispatch_id, cid)
+                    self.drivers.set_available(cid, True)
+            logger.info("OFFER broadcast dispatch_id=%s drivers=%s", dispatch_id, disp.offered_to)
+
+        self.arm_offer_timeout(dispatch_id)
+
+    async def _release_other_offers(self, disp: Dispatch, winner_chat_id: int) -> None:
+        """Tras el claim: libera a los demás domiciliarios de la oferta y les avisa."""
+        losers = []
+        for cid in list(disp.offered_to):
+            if cid == winner_chat_id:
+                continue
+            if self.dispatches.clear_active_for_driver(cid, disp.dispatch_id):
+                self.drivers.set_available(cid, True)
+                losers.append(cid)
+        if not losers:
+            return
+        results = await asyncio.gather(
+            *[
+                self.tg_client.send_text(
+                    chat_id=cid,
+                    text=f"⚠️ El pedido (ID: {disp.dispatch_id}) ya fue tomado por otro domiciliario. Quedaste disponible.",
+                    priority=PRIORITY_DRIVER,
+                )
+                for cid in losers
+            ],
+            return_exceptions=True,
+        )
+        for cid, r in zip(losers, results):
+            if isinstance(r, Exception):
+                logger.warning("No pude avisar 'ya fue tomado' driver_chat_id=%s: %s", cid, r)
+
+    # ---------------------------
+    # Timeouts de oferta
+    # ---------------------------
+    @staticmethod
+    def _dispatch_snapshot(disp: Dispatch) -> Dict[str, Any]:
+        return {
+            "dispatch_id": disp.dispatch_id,
+            "driver_chat_id": disp.driver_chat_id,
+            "customer_chat_id": disp.customer_chat_id,
+            "order": disp.order,
+            "status": disp.status,
+            "offered_to": list(disp.offered_to),
+        }
+
+    def arm_offer_timeout(self, dispatch_id: str) -> None:
+        if self.offer_timeouts is None:
+            return
+        disp = self.dispatches.get(dispatch_id)
+        if disp is None:
+            return
+        timeout_s = self.dispatch_service.offer_timeout_for(disp.order)
+        if timeout_s <= 0:
+            return
+        self.offer_timeouts.arm(dispatch_id, timeout_s, self._dispatch_snapshot(disp))
+
+    def cancel_offer_timeout(self, dispatch_id: Optional[str]) -> None:
+        if self.offer_timeouts is not None and dispatch_id:
+            self.offer_timeouts.cancel(dispatch_id)
+
+    async def on_offer_expired(self, offer: Dict[str, Any]) -> None:
+        # mismo carril que los mensajes del domiciliario: no compite con un ACEPTO en vuelo
+        await self.scheduler.run(int(offer["driver_chat_id"]), self._expire_offer, offer)
+
+    async def _expire_offer(self, offer: Dict[str, Any]) -> None:
+        dispatch_id = str(offer["dispatch_id"])
+        driver_chat_id = int(offer["driver_chat_id"])
+        customer_chat_id = offer.get("customer_chat_id")
+
+        # si no está en memoria (reinicio), se usa el snapshot guardado con el timer
+        disp = self.dispatches.get(dispatch_id)
+        if disp is not None:
+            if not self.dispatches.expire(dispatch_id):
+                return
+            offered = list(disp.offered_to)
+        else:
+            offered = [int(x) for x in offer.get("offered_to") or [driver_chat_id]]
+
+        for cid in offered:
+            self.dispatches.clear_active_for_driver(cid, dispatch_id)
+            if self.dispatches.get_active_dispatch_for_driver(cid) is None:
+                self.drivers.set_available(cid, True)
+
+        logger.info("OFFER expirada dispatch_id=%s drivers=%s", dispatch_id, offered)
+        for cid in offered:
+            try:
+                await self.tg_client.send_text(
+                    chat_id=cid,
+                    text=f"⏰ El pedido (ID: {dispatch_id}) expiró sin respuesta y ya no está asignado a ti.",
+                    priority=PRIORITY_DRIVER,
+                )
+            except Exception:
+                logger.exception("No pude avisar vencimiento driver_chat_id=%s", cid)
+
+        result = await self.reassign_and_send(
+            offer, exclude_driver_chat_id=driver_chat_id, exclude_chat_ids=set(offered)
+        )
+        if not result.get("ok") and customer_chat_id is not None:
+            try:
+                await self.tg_client.send_text(
+                    chat_id=int(customer_chat_id),
+                    text=f"⚠️ El domiciliario no respondió a tiempo (ID: {dispatch_id}). En este momento no tengo otro disponible. ¿Deseas esperar o cancelar?",
+                )
+            except Exception:
+                logger.exception("No pude notificar al cliente sin disponibilidad chat_id=%r", customer_chat_id)
+
     # ---------------------------
     # Domiciliario flow
     # ---------------------------
@@ -176,9 +591,12 @@ class TelegramRouter:
         driver = self.drivers.get_by_chat(driver_chat_id)
         t = (text or "").strip().lower()
 
+        async def reply(msg: str):
+            await self.tg_client.send_text(chat_id=int(driver_chat_id), text=msg, priority=PRIORITY_DRIVER)
+
         active = self.dispatches.get_active_dispatch_for_driver(int(driver_chat_id))
         if not active:
-            await update.message.reply_text(
+            await reply(
                 "No tengo un pedido activo. Si te llega uno, responde ACEPTO, NO PUEDO o COMPLETADO."
             )
             return
@@ -196,26 +614,43 @@ class TelegramRouter:
 
         # 1) ACEPTAR
         if t in ["acepto", "aceptar", "ok", "listo", "si", "sí"]:
-            active.status = "accepted"
-            active.accepted_ts = int(time.time())
+            if active.status == "accepted" and active.driver_chat_id == int(driver_chat_id):
+                await reply("✅ Ya tienes este pedido. Cuando entregues, responde COMPLETADO.")
+                return
+            # primer ACEPTO gana (la oferta pudo ir a varios domiciliarios)
+            if not self.dispatches.claim(dispatch_id, int(driver_chat_id)):
+                if self.dispatches.clear_active_for_driver(int(driver_chat_id), dispatch_id):
+                    self.drivers.set_available(driver_chat_id, True)
+                await reply("⚠️ Este pedido ya fue tomado por otro domiciliario. Quedaste disponible.")
+                return
+            self.cancel_offer_timeout(dispatch_id)
+            await self._release_other_offers(active, int(driver_chat_id))
 
             try:
-                await context.bot.send_message(
+                await self.tg_client.send_text(
                     chat_id=int(customer_chat_id),
                     text=f"✅ Tu pedido fue aceptado por {getattr(driver, 'name', 'el domiciliario')} y va en camino. (ID: {dispatch_id})",
                 )
             except Exception:
                 logger.exception("No pude notificar al cliente chat_id=%r", customer_chat_id)
-                await update.message.reply_text("✅ Aceptado, pero no pude notificar al cliente (chat_id inválido).")
+                await reply("✅ Aceptado, pero no pude notificar al cliente (chat_id inválido).")
                 return
 
-            await update.message.reply_text("✅ Pedido aceptado. Cuando entregues, responde COMPLETADO.")
+            await reply("✅ Pedido aceptado. Cuando entregues, responde COMPLETADO.")
             return
 
         # 2) RECHAZAR
         if t in ["no puedo", "rechazo", "no", "cancelar"]:
-            active.status = "rejected"
-            active.rejected_ts = int(time.time())
+            remaining = self.dispatches.decline(dispatch_id, int(driver_chat_id))
+            if remaining:
+                # otros domiciliarios siguen con la oferta abierta: no hay que reasignar
+                self.drivers.set_available(driver_chat_id, True)
+                await reply("Entendido. Quedaste disponible.")
+                return
+            self.cancel_offer_timeout(dispatch_id)
+            if remaining is None:
+                # ya la había aceptado: accepted -> rejected y se reasigna como siempre
+                self.dispatches.transition(dispatch_id, "rejected", rejected_ts=int(time.time()))
 
             # liberar driver actual
             self.drivers.set_available(driver_chat_id, True)
@@ -224,24 +659,25 @@ class TelegramRouter:
             # reasignar
             result = await self.reassign_and_send(dispatch, exclude_driver_chat_id=int(driver_chat_id))
             if result.get("ok"):
-                await update.message.reply_text("Entendido. Reasigné el pedido a otro domiciliario.")
+                await reply("Entendido. Reasigné el pedido a otro domiciliario.")
             else:
                 # avisa al cliente si no hay nadie
                 try:
-                    await context.bot.send_message(
+                    await self.tg_client.send_text(
                         chat_id=int(customer_chat_id),
                         text=f"⚠️ El domiciliario no pudo tomar tu pedido (ID: {dispatch_id}). En este momento no tengo otro disponible. ¿Deseas esperar o cancelar?",
                     )
                 except Exception:
                     logger.exception("No pude notificar al cliente sin disponibilidad chat_id=%r", customer_chat_id)
 
-                await update.message.reply_text("Entendido. No hay otro domiciliario disponible por ahora.")
+                await reply("Entendido. No hay otro domiciliario disponible por ahora.")
             return
 
         # 3) COMPLETAR
         if t in ["completado", "completo", "entregado", "finalizado", "terminado", "listo entregado"]:
-            active.status = "completed"
-            active.completed_ts = int(time.time())
+            if not self.dispatches.transition(dispatch_id, "completed", completed_ts=int(time.time())):
+                await reply("Primero responde ACEPTO para tomar el pedido.")
+                return
 
             # liberar driver
             self.drivers.set_available(driver_chat_id, True)
@@ -249,22 +685,50 @@ class TelegramRouter:
 
             # notificar al cliente
             try:
-                await context.bot.send_message(
+                await self.tg_client.send_text(
                     chat_id=int(customer_chat_id),
                     text=f"✅ Pedido entregado. ¡Gracias! (ID: {dispatch_id})",
                 )
             except Exception:
                 logger.exception("No pude notificar al cliente completado chat_id=%r", customer_chat_id)
 
-            await update.message.reply_text("✅ Pedido marcado como COMPLETADO. Ya quedaste disponible.")
+            await reply("✅ Pedido marcado como COMPLETADO. Ya quedaste disponible.")
             return
 
-        await update.message.reply_text("Responde únicamente con: ACEPTO, NO PUEDO o COMPLETADO.")
+        await reply("Responde únicamente con: ACEPTO, NO PUEDO o COMPLETADO.")
+
+    # ---------------------------
+    # Ubicación en vivo (domiciliarios)
+    # ---------------------------
+    async def on_location(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Telegram envía la live location como mensaje inicial y luego como edited_message
+        en cada actualización; ambas alimentan el índice espacial de domiciliarios.
+        """
+        msg = update.effective_message
+        if msg is None or msg.location is None:
+            return
+        chat_id = update.effective_chat.id
+        if not self.drivers.update_location(chat_id, msg.location.latitude, msg.location.longitude):
+            return
+
+        # solo confirmar el mensaje inicial, no cada actualización
+        if update.message is not None:
+            try:
+                await self.tg_client.send_text(
+                    chat_id=chat_id, text="📍 Ubicación recibida. Te asignaré pedidos cercanos.", priority=PRIORITY_DRIVER
+                )
+            except Exception:
+                logger.exception("No pude confirmar ubicación driver_chat_id=%s", chat_id)
 
     # ---------------------------
     # Main router entrypoint
     # ---------------------------
     async def on_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # Orden estricto por chat: evita dos ainvoke simultáneos sobre el mismo thread_id
+        await self.scheduler.run(update.effective_chat.id, self._handle_text, update, context)
+
+    async def _handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = update.effective_chat.id
         text = (update.message.text or "").strip()
 
@@ -275,20 +739,30 @@ class TelegramRouter:
             except Exception:
                 logger.exception("Error en handle_driver_message driver_chat_id=%s", chat_id)
                 try:
-                    await update.message.reply_text("Se presentó un error procesando tu respuesta. Reintenta.")
+                    await self.tg_client.send_text(
+                        chat_id=chat_id, text="Se presentó un error procesando tu respuesta. Reintenta.", priority=PRIORITY_DRIVER
+                    )
                 except Exception:
                     pass
             return
 
-        # 2) cliente
-        try:
-            await context.bot.send_chat_action(chat_id=chat_id, action="typing")
-        except Exception:
-            logger.exception("No pude enviar chat_action typing chat_id=%s", chat_id)
+        # 2) cliente: primero fast path sin LLM, luego caché de respuestas, luego el agente
+        answer = await self.answer_fast_path(text, chat_id)
+        cache_key = None
+        if answer is None:
+            answer, cache_key = await self.answer_from_cache(text, chat_id)
+        if answer is None:
+            if self.stream_replies:
+                try:
+                    await self.stream_agent(text, chat_id, cache_key)
+                except Exception:
+                    logger.exception("Fallo enviando respuesta en streaming chat_id=%s", chat_id)
+                return
 
-        answer = await self.run_agent(text, chat_id)
+            async with keep_typing(self.tg_client, chat_id, every_s=self.typing_refresh_s):
+                answer = await self.run_agent(text, chat_id, cache_key)
 
         try:
-            await update.message.reply_text(answer)
+            await self.tg_client.send_text(chat_id=chat_id, text=answer, priority=PRIORITY_CUSTOMER)
         except Exception:
-            logger.exception("Fallo reply_text al usuario chat_id=%s", chat_id)
+            logger.exception("Fallo enviando respuesta al usuario chat_id=%s", chat_id)
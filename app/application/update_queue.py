@@ -0,0 +1,127 @@
+# app/application/update_queue.py
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+
+class UpdateQueue:
+    """
+    Cola de updates de Telegram (modo fast-ack del webhook):
+    - enqueue() deja el update en la cola y retorna de inmediato (el webhook responde 200)
+    - N workers asyncio consumen la cola y llaman al handler (tg_app.process_update)
+    - stats() expone profundidad y tiempos de espera para dimensionar el pool
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        workers: int = 8,
+        maxsize: int = 1000,
+    ):
+        self._handler = handler
+        self._workers_n = max(1, int(workers))
+        self._queue: asyncio.Queue[Tuple[float, Any]] = asyncio.Queue(maxsize=max(0, int(maxsize)))
+        self._tasks: List[asyncio.Task] = []
+
+        # métricas
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._dequeued = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_last = 0.0
+        self._proc_total = 0.0
+
+    # ---------------------------
+    # Ciclo de vida
+    # ---------------------------
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"update-worker-{i}")
+            for i in range(self._workers_n)
+        ]
+        logger.info("UpdateQueue iniciada workers=%s maxsize=%s", self._workers_n, self._queue.maxsize)
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Espera (con timeout) a que se vacíe la cola y luego cancela los workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("UpdateQueue: timeout drenando cola, pendientes=%s", self._queue.qsize())
+
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ---------------------------
+    # Productor
+    # ---------------------------
+    def enqueue(self, update: Any) -> bool:
+        """Retorna False si la cola está llena (el webhook debe pedir reintento a Telegram)."""
+        try:
+            self._queue.put_nowait((time.monotonic(), update))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    # ---------------------------
+    # Consumidores
+    # ---------------------------
+    async def _worker(self, idx: int) -> None:
+        while True:
+            enqueued_at, update = await self._queue.get()
+            started = time.monotonic()
+            wait = started - enqueued_at
+            self._dequeued += 1
+            self._wait_last = wait
+            self._wait_total += wait
+            if wait > self._wait_max:
+                self._wait_max = wait
+
+            try:
+                await self._handler(update)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+                logger.exception("UpdateQueue worker=%s fallo procesando update", idx)
+            finally:
+                self._proc_total += time.monotonic() - started
+                self._queue.task_done()
+
+    # ---------------------------
+    # Métricas
+    # ---------------------------
+    def stats(self) -> Dict[str, Any]:
+        done = self.processed + self.failed
+        return {
+            "workers": self._workers_n,
+            "depth": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_last": round(self._wait_last * 1000, 2),
+            "wait_ms_avg": round(self._wait_total / self._dequeued * 1000, 2) if self._dequeued else 0.0,
+            "wait_ms_max": round(self._wait_max * 1000, 2),
+            "process_ms_avg": round(self._proc_total / done * 1000, 2) if done else 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
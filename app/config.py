@@ -11,5 +11,97 @@ class Settings:
     telegram_token_env: str = "TELEGRAM_BOT_TOKEN"
     webhook_url_env: str = "TELEGRAM_WEBHOOK_URL"
     openai_key_env: str = "OPENAI_API_KEY"
+    # Bot API alterno (servidor local de Bot API o el fake de benchmarks/bench_cold_start.py)
+    telegram_api_base_url: str = os.getenv("TELEGRAM_API_BASE_URL", "")
+
+    # Secretos: variable de entorno > archivo en SECRETS_LOCAL_DIR > caché (TTL) > Secret Manager.
+    # SECRETS_CACHE_TTL_S=0 desactiva la caché. La caché guarda los secretos en texto plano:
+    # solo para desarrollo local (nunca en un volumen compartido ni en producción)
+    secrets_local_dir: str = os.getenv("SECRETS_LOCAL_DIR", "")
+    secrets_cache_path: str = os.getenv("SECRETS_CACHE_PATH", "/tmp/domiflash_secrets.json")
+    secrets_cache_ttl_s: float = float(os.getenv("SECRETS_CACHE_TTL_S", "0"))
+
+    # Webhook: "sync" procesa el update dentro del request; "queue" encola y responde 200 de inmediato
+    # (en Cloud Run, "queue" requiere CPU siempre asignada para que los workers sigan corriendo)
+    webhook_mode: str = os.getenv("WEBHOOK_MODE", "sync")
+    update_workers: int = int(os.getenv("UPDATE_WORKERS", "8"))
+    update_queue_maxsize: int = int(os.getenv("UPDATE_QUEUE_MAXSIZE", "1000"))
+
+    # Memoria de conversaciones (checkpointer): máximo de threads (LRU) y TTL de inactividad
+    checkpoint_max_threads: int = int(os.getenv("CHECKPOINT_MAX_THREADS", "5000"))
+    checkpoint_ttl_seconds: float = float(os.getenv("CHECKPOINT_TTL_SECONDS", "21600"))
+
+    # Historial enviado al LLM por turno: últimos N turnos dentro de un presupuesto de tokens
+    history_max_turns: int = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+    history_max_tokens: int = int(os.getenv("HISTORY_MAX_TOKENS", "2500"))
+
+    # Tools con salida compacta (tabular, llaves cortas) en vez de JSON verboso, separadas por coma
+    # (p. ej. "get_menu,price_order"); "" (default) = todas en JSON verboso. Opt-in: cambia lo que
+    # ve el modelo; medir antes con benchmarks/bench_tool_outputs.py --real
+    tool_output_compact: str = os.getenv("TOOL_OUTPUT_COMPACT", "")
+
+    # Fast path sin LLM para "menú", "qué restaurantes hay", "precio <item>"
+    fast_path_enabled: bool = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+
+    # Caché de respuestas del agente para preguntas informativas repetidas ("qué pizzas tienen"):
+    # texto normalizado + restaurante + versión del menú, LRU + TTL; nunca en turnos que tocan el pedido
+    response_cache_enabled: bool = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+    response_cache_size: int = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    response_cache_ttl_s: float = float(os.getenv("RESPONSE_CACHE_TTL_S", "900"))
+
+    # Respuestas del LLM en streaming: primer mensaje con los primeros tokens y ediciones
+    # cada STREAM_EDIT_INTERVAL_S (cuentan para el límite por chat); "typing" cada TYPING_REFRESH_S
+    stream_replies: bool = os.getenv("STREAM_REPLIES", "0") == "1"
+    stream_edit_interval_s: float = float(os.getenv("STREAM_EDIT_INTERVAL_S", "1.0"))
+    stream_min_chars: int = int(os.getenv("STREAM_MIN_CHARS", "20"))
+    typing_refresh_s: float = float(os.getenv("TYPING_REFRESH_S", "4"))
+
+    # LRU de cotizaciones (price_order) por orden canónica + versión del menú
+    pricing_cache_size: int = int(os.getenv("PRICING_CACHE_SIZE", "1024"))
+
+    # Asignación por cercanía: antigüedad máxima de la live location y radio de búsqueda
+    driver_location_max_age_s: float = float(os.getenv("DRIVER_LOCATION_MAX_AGE_S", "600"))
+    max_pickup_km: float = float(os.getenv("MAX_PICKUP_KM", "15"))
+
+    # Despacho: "greedy" asigna pedido a pedido; "batch" agrupa pedidos por ventana y resuelve
+    # la asignación óptima del lote (candidatos = los K disponibles más cercanos a cada restaurante)
+    dispatch_mode: str = os.getenv("DISPATCH_MODE", "greedy")
+    batch_window_s: float = float(os.getenv("BATCH_WINDOW_S", "5"))
+    batch_max_orders: int = int(os.getenv("BATCH_MAX_ORDERS", "50"))
+    batch_candidates_k: int = int(os.getenv("BATCH_CANDIDATES_K", "16"))
+
+    # Oferta sin respuesta del domiciliario -> se reasigna (el MENU puede definir offer_timeout_s
+    # por restaurante; 0 desactiva). Las ofertas pendientes se guardan en OFFER_TIMEOUTS_PATH
+    # (en Cloud Run, apuntar a un volumen montado para que sobrevivan a una nueva instancia)
+    offer_timeout_s: float = float(os.getenv("OFFER_TIMEOUT_S", "90"))
+    offer_timeouts_path: str = os.getenv("OFFER_TIMEOUTS_PATH", "/tmp/domiflash_offer_timeouts.json")
+
+    # Oferta en paralelo: el pedido se envía a los K mejores disponibles y el primer ACEPTO gana
+    # (los demás reciben "ya fue tomado" y quedan libres). 1 = un domiciliario a la vez
+    offer_broadcast_k: int = int(os.getenv("OFFER_BROADCAST_K", "1"))
+
+    # assign_driver reserva al domiciliario por este tiempo; si no llega send_order_to_driver, se libera
+    reservation_lease_s: float = float(os.getenv("RESERVATION_LEASE_S", "120"))
+
+    # Cola de salida a Telegram: token bucket global (~30 msg/s del bot) y por chat (~1 msg/s),
+    # RetryAfter respetado, reintentos con backoff y prioridad ofertas > domiciliarios > clientes
+    tg_send_queue_enabled: bool = os.getenv("TG_SEND_QUEUE_ENABLED", "1") == "1"
+    tg_global_rate: float = float(os.getenv("TG_GLOBAL_RATE", "25"))
+    tg_global_burst: float = float(os.getenv("TG_GLOBAL_BURST", "30"))
+    tg_chat_rate: float = float(os.getenv("TG_CHAT_RATE", "1"))
+    tg_chat_burst: float = float(os.getenv("TG_CHAT_BURST", "3"))
+    tg_send_max_retries: int = int(os.getenv("TG_SEND_MAX_RETRIES", "5"))
+    tg_send_concurrency: int = int(os.getenv("TG_SEND_CONCURRENCY", "8"))
+
+    # Pools HTTP compartidos (OpenAI y Telegram): tamaño, keepalive, HTTP/2 (requiere h2),
+    # warmup en startup y ping periódico para no pagar DNS + TLS en el primer mensaje
+    openai_http_pool_size: int = int(os.getenv("OPENAI_HTTP_POOL_SIZE", "20"))
+    openai_http2: bool = os.getenv("OPENAI_HTTP2", "1") == "1"
+    tg_http_pool_size: int = int(os.getenv("TG_HTTP_POOL_SIZE", "64"))
+    tg_http2: bool = os.getenv("TG_HTTP2", "0") == "1"
+    http_keepalive_connections: int = int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS", "10"))
+    http_keepalive_expiry_s: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "120"))
+    http_keepalive_ping_s: float = float(os.getenv("HTTP_KEEPALIVE_PING_S", "45"))
+    http_log_requests: bool = os.getenv("HTTP_LOG_REQUESTS", "1") == "1"
 
 settings = Settings()
@@ -2,6 +2,8 @@ MENU = {
     "Pizzeria Orientini - Marinilla": {
         "currency": "COP",
         "delivery_fee": 6000,
+        "location": {"lat": 6.1748, "lng": -75.3372},
+        "offer_timeout_s": 120,
         "items": {
             "pizza personal": {"price": 18000},
             "pizza mediana": {"price": 35000},
@@ -22,6 +24,8 @@ MENU = {
     "Hamburguesas El Parque": {
         "currency": "COP",
         "delivery_fee": 5000,
+        "location": {"lat": 6.1736, "lng": -75.3357},
+        "offer_timeout_s": 90,
         "items": {
             "hamburguesa sencilla": {"price": 16000},
             "hamburguesa doble": {"price": 24000},
@@ -12,11 +12,18 @@ class Driver:
 class Dispatch:
     dispatch_id: str
     driver_chat_id: int
-    customer_chat_id: int
+    customer_chat_id: Optional[int]        # None mientras está solo "reserved"
     order: Dict[str, Any]
     status: str = "sent"
     ts: int = 0
     accepted_ts: Optional[int] = None
     rejected_ts: Optional[int] = None
     completed_ts: Optional[int] = None
+    expired_ts: Optional[int] = None
     reassigned_from: Optional[str] = None
+    # domiciliarios que recibieron la oferta (varios en modo broadcast); el primero en aceptar gana
+    offered_to: List[int] = field(default_factory=list)
+    # reserva (assign_driver): vence en lease_until si nunca se envía; llamadas repetidas con la
+    # misma idempotency_key devuelven este mismo despacho
+    lease_until: Optional[float] = None
+    idempotency_key: Optional[str] = None
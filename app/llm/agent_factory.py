@@ -1,10 +1,27 @@
 import os
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
 
-def build_agent(tools, model: str, temperature: float):
-    llm = ChatOpenAI(model=model, temperature=temperature)
+from app.llm.checkpointer import BoundedMemorySaver
+from app.llm.history import HistoryTrimmer
+
+def build_agent(
+    tools,
+    model: str,
+    temperature: float,
+    checkpointer=None,
+    history_max_turns: int = 6,
+    history_max_tokens: int = 2500,
+    http_client=None,
+    http_async_client=None,
+):
+    # pools compartidos (app/adapters/http_pools.py): reuso de conexiones entre turnos
+    llm = ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
 
     system_prompt = """
 Eres “Domiflash”, agente virtual de atención para una empresa de domicilios.
@@ -20,7 +37,6 @@ REGLAS:
 - Haz UNA sola pregunta a la vez si falta info.
 - No inventes datos.
 - Antes de despachar, muestra un resumen y pide confirmación: “¿Confirmas el pedido?”
-- Customer_chat_id es el valor exacto mostrado en el system message dinámico: customer_chat_id=...
 
 MENÚ Y PRECIOS (OBLIGATORIO):
 - Para mostrar opciones y precios, primero llama get_menu(restaurante).
@@ -45,18 +61,25 @@ CIERRE ANTES DE CONFIRMAR (OBLIGATORIO):
 - Pregunta: “¿Confirmas el pedido por <TOTAL>?”
 
 DESPACHO AUTOMÁTICO (OBLIGATORIO):
-Cuando el usuario confirme explícitamente el pedido, debes ejecutar EXACTAMENTE estos pasos:
-Paso 1) Llama a assign_driver(order_json)
-Paso 2) Si ok=true, llama a send_order_to_driver(driver_chat_id, customer_chat_id, dispatch_id, order_json)
+Cuando el usuario confirme explícitamente el pedido, llama UNA vez a dispatch_order(order_json):
+asigna el domiciliario, registra el despacho y le envía el pedido en un solo paso.
+- Si ok=true, confirma al cliente con el nombre del domiciliario (driver_name).
+- Si ok=false, explica el error al cliente (p. ej. no hay domiciliarios disponibles).
 IMPORTANTE:
-- customer_chat_id es el valor EXACTO del system message dinámico: customer_chat_id=...
+- El cliente se identifica automáticamente (no necesitas su chat_id).
 - No inventes driver_chat_id ni dispatch_id.
+- No uses assign_driver / send_order_to_driver para un pedido nuevo: dispatch_order ya hace ambos pasos.
+- Si repites una llamada, recibirás el mismo dispatch_id (duplicate=true): no es un segundo pedido.
 """.strip()
 
-    checkpointer = MemorySaver()
+    if checkpointer is None:
+        checkpointer = BoundedMemorySaver()
+
+    # Pre-model: system prompt + resumen de turnos viejos + últimos turnos dentro del presupuesto
+    trimmer = HistoryTrimmer(system_prompt, max_turns=history_max_turns, max_tokens=history_max_tokens)
     return create_react_agent(
         model=llm,
         tools=tools,
-        state_modifier=system_prompt,
+        state_modifier=trimmer,
         checkpointer=checkpointer,
     )
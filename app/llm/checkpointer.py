@@ -0,0 +1,163 @@
+# app/llm/checkpointer.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver con memoria acotada:
+    - Máximo max_threads conversaciones (LRU por último acceso)
+    - Conversaciones inactivas más de ttl_seconds se eliminan
+    - Por conversación solo se guarda el último checkpoint (y los blobs que referencia);
+      el agente siempre retoma desde el último, así que el historial de pasos no se usa
+    - stats() reporta tamaño y contadores de evicción
+    """
+
+    def __init__(self, max_threads: int = 5000, ttl_seconds: float = 6 * 3600, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max(1, int(max_threads))
+        self.ttl_seconds = float(ttl_seconds)
+
+        # thread_id -> último acceso (monotonic); el orden del OrderedDict es el orden LRU
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        # índices por thread para borrar en O(llaves del thread) y no O(llaves totales)
+        self._write_keys: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._blob_keys: Dict[str, Set[Tuple[str, str, str, Any]]] = {}
+        self._lock = threading.RLock()
+
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+
+    # ---------------------------
+    # LRU / TTL
+    # ---------------------------
+    def _touch(self, thread_id: str) -> None:
+        now = time.monotonic()
+        self._last_access[thread_id] = now
+        self._last_access.move_to_end(thread_id)
+        self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        if self.ttl_seconds > 0:
+            while self._last_access:
+                thread_id, last = next(iter(self._last_access.items()))
+                if now - last <= self.ttl_seconds:
+                    break
+                self._drop_thread(thread_id)
+                self.evicted_ttl += 1
+
+        while len(self._last_access) > self.max_threads:
+            thread_id = next(iter(self._last_access))
+            self._drop_thread(thread_id)
+            self.evicted_lru += 1
+
+    def _drop_thread(self, thread_id: str) -> None:
+        self._last_access.pop(thread_id, None)
+        self.storage.pop(thread_id, None)
+        for k in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(k, None)
+        for k in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(k, None)
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str, checkpoint: Checkpoint) -> None:
+        """Deja solo el último checkpoint del namespace, sus writes y los blobs vigentes."""
+        latest_id = checkpoint["id"]
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for cid in [c for c in checkpoints if c < latest_id]:
+            del checkpoints[cid]
+
+        write_keys = self._write_keys.get(thread_id)
+        if write_keys:
+            for k in [k for k in write_keys if k[1] == checkpoint_ns and k[2] < latest_id]:
+                write_keys.discard(k)
+                self.writes.pop(k, None)
+
+        blob_keys = self._blob_keys.get(thread_id)
+        if blob_keys:
+            versions = checkpoint["channel_versions"]
+            for k in [k for k in blob_keys if k[1] == checkpoint_ns and versions.get(k[2]) != k[3]]:
+                blob_keys.discard(k)
+                self.blobs.pop(k, None)
+
+    # ---------------------------
+    # BaseCheckpointSaver
+    # ---------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            # evita que el defaultdict cree entradas vacías para threads desconocidos
+            if thread_id not in self.storage:
+                return None
+            last = self._last_access.get(thread_id)
+            if last is not None and self.ttl_seconds > 0 and time.monotonic() - last > self.ttl_seconds:
+                self._drop_thread(thread_id)
+                self.evicted_ttl += 1
+                return None
+            self._touch(thread_id)
+            tup = super().get_tuple(config)
+            if tup is not None:
+                # MemorySaver.get_tuple crea la llave de writes (defaultdict) aunque esté vacía
+                cfg = tup.config["configurable"]
+                self._write_keys.setdefault(thread_id, set()).add(
+                    (thread_id, cfg.get("checkpoint_ns", ""), cfg["checkpoint_id"])
+                )
+            return tup
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            out = super().put(config, checkpoint, metadata, new_versions)
+            blob_keys = self._blob_keys.setdefault(thread_id, set())
+            for k, v in new_versions.items():
+                blob_keys.add((thread_id, checkpoint_ns, k, v))
+            self._prune_thread(thread_id, checkpoint_ns, checkpoint)
+            self._touch(thread_id)
+            return out
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys.setdefault(thread_id, set()).add((thread_id, checkpoint_ns, checkpoint_id))
+            self._touch(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+
+    # ---------------------------
+    # Métricas
+    # ---------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threads": len(self._last_access),
+                "max_threads": self.max_threads,
+                "ttl_seconds": self.ttl_seconds,
+                "checkpoints": sum(len(c) for ns in self.storage.values() for c in ns.values()),
+                "blobs": len(self.blobs),
+                "writes": len(self.writes),
+                "evicted_lru": self.evicted_lru,
+                "evicted_ttl": self.evicted_ttl,
+            }
@@ -0,0 +1,203 @@
+# app/llm/history.py
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+ORDER_FIELDS = ("restaurante", "cliente", "direccion", "telefono", "medio_pago", "observaciones")
+
+
+def approx_tokens(m: BaseMessage) -> int:
+    """Estimación barata (~4 caracteres por token + overhead por mensaje); no requiere tokenizer."""
+    content = m.content if isinstance(m.content, str) else json.dumps(m.content, ensure_ascii=False)
+    n = len(content)
+    for tc in getattr(m, "tool_calls", None) or []:
+        n += len(tc.get("name", "")) + len(json.dumps(tc.get("args", {}), ensure_ascii=False))
+    return n // 4 + 4
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(approx_tokens(m) for m in messages)
+
+
+class _Summary:
+    """Resumen acumulado de los turnos ya recortados de un thread."""
+
+    __slots__ = ("last_id", "folded", "fields", "items", "customer_lines", "total")
+
+    def __init__(self):
+        self.last_id: Optional[str] = None
+        self.folded = 0
+        self.fields: Dict[str, str] = {}
+        self.items: List[Dict[str, Any]] = []
+        self.customer_lines: List[str] = []
+        self.total: Optional[str] = None
+
+
+class HistoryTrimmer:
+    """
+    Etapa previa al modelo (state_modifier del agente):
+    - Envía al LLM solo los últimos max_turns turnos y, si aún excede max_tokens, recorta más
+      (el turno actual siempre se conserva completo)
+    - Los turnos recortados se pliegan en un resumen compacto (system message) que conserva
+      los campos del pedido capturados (cliente, direccion, telefono, medio_pago, items) y los
+      últimos mensajes del cliente
+    - El resumen es incremental por thread: cada llamada solo pliega los mensajes nuevos
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        max_turns: int = 6,
+        max_tokens: int = 2500,
+        summary_lines: int = 8,
+        max_threads: int = 5000,
+    ):
+        self.system_message = SystemMessage(content=system_prompt)
+        self.max_turns = max(1, int(max_turns))
+        self.max_tokens = int(max_tokens)
+        self.summary_lines = int(summary_lines)
+        self.max_threads = max(1, int(max_threads))
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        # lock: con astream el state_modifier corre en threads del executor (varios chats a la vez)
+        self._summaries_lock = threading.Lock()
+
+    # ---------------------------
+    # state_modifier
+    # ---------------------------
+    def __call__(self, state: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> List[BaseMessage]:
+        messages: List[BaseMessage] = list(state["messages"])
+        thread_id = str(((config or {}).get("configurable") or {}).get("thread_id", ""))
+
+        starts = self._turn_starts(messages)
+        cut = starts[-self.max_turns] if len(starts) > self.max_turns else (starts[0] if starts else 0)
+
+        # recortar por presupuesto de tokens, sin tocar el turno actual
+        kept_starts = [s for s in starts if s >= cut]
+        budget = self.max_tokens - approx_tokens(self.system_message)
+        while len(kept_starts) > 1 and count_tokens(messages[cut:]) > budget:
+            kept_starts.pop(0)
+            cut = kept_starts[0]
+
+        recent = messages[cut:]
+        out: List[BaseMessage] = [self.system_message]
+        if cut > 0:
+            summary = self._fold(thread_id, messages[:cut])
+            text = self._render(summary)
+            if text:
+                out.append(SystemMessage(content=text))
+        out.extend(recent)
+
+        logger.debug(
+            "HISTORY thread=%s msgs=%s->%s tokens~%s->%s",
+            thread_id, len(messages), len(recent), count_tokens(messages), count_tokens(out),
+        )
+        return out
+
+    # ---------------------------
+    # Turnos
+    # ---------------------------
+    @staticmethod
+    def _turn_starts(messages: Sequence[BaseMessage]) -> List[int]:
+        """Índice de inicio de cada turno: un HumanMessage junto con los system messages que lo preceden."""
+        starts: List[int] = []
+        for i, m in enumerate(messages):
+            if isinstance(m, HumanMessage):
+                j = i
+                while j > 0 and isinstance(messages[j - 1], SystemMessage):
+                    j -= 1
+                starts.append(j)
+        return starts
+
+    # ---------------------------
+    # Resumen incremental
+    # ---------------------------
+    def _fold(self, thread_id: str, older: Sequence[BaseMessage]) -> _Summary:
+        with self._summaries_lock:
+            summary = self._summaries.get(thread_id)
+        start = 0
+        if summary is not None and summary.last_id is not None:
+            # continuar desde el último mensaje plegado si sigue en el historial
+            if summary.folded <= len(older) and getattr(older[summary.folded - 1], "id", None) == summary.last_id:
+                start = summary.folded
+            else:
+                summary = None
+        if summary is None:
+            summary = _Summary()
+
+        for m in older[start:]:
+            self._fold_message(summary, m)
+        summary.folded = len(older)
+        summary.last_id = getattr(older[-1], "id", None) if older else None
+
+        if thread_id:
+            with self._summaries_lock:
+                self._summaries[thread_id] = summary
+                self._summaries.move_to_end(thread_id)
+                while len(self._summaries) > self.max_threads:
+                    self._summaries.popitem(last=False)
+        return summary
+
+    def _fold_message(self, summary: _Summary, m: BaseMessage) -> None:
+        if isinstance(m, HumanMessage) and isinstance(m.content, str):
+            line = " ".join(m.content.split())[:160]
+            if line:
+                summary.customer_lines.append(line)
+                del summary.customer_lines[: -self.summary_lines]
+            return
+
+        if isinstance(m, AIMessage):
+            for tc in m.tool_calls or []:
+                order = _parse_order((tc.get("args") or {}).get("order_json"))
+                if not order:
+                    continue
+                for k in ORDER_FIELDS:
+                    v = order.get(k)
+                    if v:
+                        summary.fields[k] = str(v)
+                if isinstance(order.get("items"), list) and order["items"]:
+                    summary.items = order["items"]
+            return
+
+        if isinstance(m, ToolMessage) and isinstance(m.content, str):
+            payload = _parse_order(m.content)
+            if payload and payload.get("ok") is True and payload.get("total") is not None:
+                # price_order en formato verboso (currency) o compacto (cur)
+                currency = payload.get("currency") or payload.get("cur") or ""
+                summary.total = f"{payload['total']} {currency}".strip()
+
+    def _render(self, summary: _Summary) -> str:
+        parts: List[str] = []
+        if summary.fields or summary.items or summary.total:
+            fields = "; ".join(f"{k}={summary.fields[k]}" for k in ORDER_FIELDS if k in summary.fields)
+            parts.append(f"Datos del pedido ya capturados: {fields or 'ninguno'}")
+            if summary.items:
+                parts.append("items=" + json.dumps(summary.items, ensure_ascii=False, separators=(",", ":")))
+            if summary.total:
+                parts.append(f"último total cotizado={summary.total}")
+        if summary.customer_lines:
+            parts.append("Mensajes previos del cliente:\n" + "\n".join(f"- {ln}" for ln in summary.customer_lines))
+        if not parts:
+            return ""
+        return "RESUMEN DE LA CONVERSACIÓN PREVIA (turnos anteriores recortados):\n" + "\n".join(parts)
+
+
+def _parse_order(value: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        s = value.strip()
+        if s.startswith("{") and s.endswith("}"):
+            try:
+                parsed = json.loads(s)
+            except Exception:
+                return None
+            return parsed if isinstance(parsed, dict) else None
+    return None
+
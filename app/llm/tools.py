@@ -1,9 +1,11 @@
 # app/llm/tools.py
 import json
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, Iterable, Optional, Set
 
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
+from app.repositories.dispatch_repo import DispatchStateError
 from app.repositories.menu_repo import MenuRepository
 from app.services.pricing_service import PricingService
 from app.services.dispatch_service import DispatchService
@@ -13,7 +15,20 @@ def build_tools(
     menu_repo: MenuRepository,
     pricing_service: PricingService,
     dispatch_service: DispatchService,
+    compact_outputs: Iterable[str] = (),
 ):
+    # tools cuya salida va en formato compacto (tabular, llaves cortas): cada resultado queda en
+    # el historial y se reenvía al modelo en los turnos siguientes
+    compact = set(compact_outputs)
+
+    def customer_from_config(config: Optional[RunnableConfig]) -> Optional[int]:
+        # el router pasa el chat del cliente en la config del run (no en el historial)
+        value = ((config or {}).get("configurable") or {}).get("customer_chat_id")
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
     @tool
     def healthcheck() -> str:
         """Devuelve un estado simple del servicio."""
@@ -30,41 +45,84 @@ def build_tools(
 
     @tool
     def get_menu(restaurant: str) -> str:
-        """Devuelve el menú disponible para un restaurante (items, opciones, domicilio)."""
-        return json.dumps(menu_repo.get_menu(restaurant))
+        """
+        Devuelve el menú disponible para un restaurante (items, opciones, domicilio).
+        Formato compacto: r=restaurante, cur=moneda, dom=domicilio y una fila por ítem según cols
+        (opciones como "nombre=valor extra;...").
+        """
+        if "get_menu" in compact:
+            return menu_repo.get_menu_compact(restaurant)
+        return menu_repo.get_menu_json(restaurant)
 
     @tool
     def price_order(order_json: str) -> str:
         """
         Calcula total de una orden con base en MENU.
         Retorna: ok, subtotal, domicilio, total, detalle_lineas, warnings
+        (formato compacto: r, sub, dom, total, una fila por línea según cols, warn).
         """
-        return json.dumps(pricing_service.price(order_json))
+        if "price_order" in compact:
+            return pricing_service.price_compact(order_json)
+        return pricing_service.price_json(order_json)
 
     @tool
-    def assign_driver(order_json, exclude_chat_ids=None) -> str:
+    async def dispatch_order(order_json, exclude_chat_ids=None, config: RunnableConfig = None) -> str:
         """
-        Asigna un domiciliario disponible.
+        Despacha el pedido confirmado en un solo paso: asigna un domiciliario, registra el
+        despacho y le envía el pedido.
+        Retorna JSON: ok, dispatch_id, driver_chat_id, driver_name (o ok=false con error).
+        Repetir la llamada con la misma orden retorna el mismo despacho (duplicate=true).
+        """
+        order = dispatch_service.normalize_order(order_json)
+        exclude = dispatch_service.normalize_exclude(exclude_chat_ids)
+        return json.dumps(
+            await dispatch_service.dispatch_order_async(
+                order=order, customer_chat_id=customer_from_config(config), exclude=exclude
+            )
+        )
+
+    @tool
+    async def assign_driver(order_json, exclude_chat_ids=None, config: RunnableConfig = None) -> str:
+        """
+        Asigna (reserva) un domiciliario disponible.
         Retorna JSON: ok, dispatch_id, driver_chat_id, driver_name...
+        Repetir la llamada con la misma orden retorna la misma reserva (duplicate=true).
         """
+        # async: en modo batch espera la ventana de emparejamiento sin ocupar un thread
         order = dispatch_service.normalize_order(order_json)
         exclude = dispatch_service.normalize_exclude(exclude_chat_ids)
-        return json.dumps(dispatch_service.assign_driver(order=order, exclude=exclude))
+        customer = customer_from_config(config)
+        key = dispatch_service.idempotency_key(order, customer, exclude)
+        return json.dumps(
+            await dispatch_service.assign_driver_async(order=order, exclude=exclude, idempotency_key=key)
+        )
 
     @tool
-    def send_order_to_driver(driver_chat_id: int, customer_chat_id: int, dispatch_id: str, order_json: str) -> str:
+    def send_order_to_driver(
+        driver_chat_id: int, dispatch_id: str, order_json: str, config: RunnableConfig = None
+    ) -> str:
         """
         Registra el despacho y devuelve el mensaje que debe enviarse al domiciliario.
         (El envío real se hace en el handler async.)
         """
         order = dispatch_service.normalize_order(order_json)
-        dispatch_service.register_dispatch(
-            dispatch_id=dispatch_id,
-            driver_chat_id=int(driver_chat_id),
-            customer_chat_id=int(customer_chat_id),
-            order=order,
-        )
+        try:
+            disp, created = dispatch_service.register_dispatch(
+                dispatch_id=dispatch_id,
+                driver_chat_id=int(driver_chat_id),
+                customer_chat_id=customer_from_config(config),
+                order=order,
+            )
+        except DispatchStateError as e:
+            return json.dumps({"ok": False, "dispatch_id": dispatch_id, "error": str(e)})
+        if not created:
+            # llamada repetida: sin "message" para que no se reenvíe la oferta
+            return json.dumps({"ok": True, "dispatch_id": dispatch_id, "duplicate": True, "status": disp.status})
+
         msg = dispatch_service.format_order_message(order)
-        return json.dumps({"ok": True, "driver_chat_id": int(driver_chat_id), "message": msg})
+        return json.dumps(
+            {"ok": True, "dispatch_id": dispatch_id, "driver_chat_id": int(driver_chat_id), "message": msg}
+        )
 
-    return [healthcheck, summarize_text, assign_driver, send_order_to_driver, get_menu, price_order]
+    # assign_driver + send_order_to_driver quedan por compatibilidad (dispatch_order hace ambos)
+    return [healthcheck, summarize_text, dispatch_order, assign_driver, send_order_to_driver, get_menu, price_order]
@@ -811,30 +811,47 @@
 
 
 # app/main.py
+from __future__ import annotations
+
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
 import logging
 import os
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 from fastapi import FastAPI, Request, HTTPException
-from telegram import Update
-from telegram.ext import Application, MessageHandler, CommandHandler, ContextTypes, filters
 
 from app.config import settings
-from app.adapters.secrets import load_secret_as_env
+from app.adapters.secrets import SecretLoader
+from app.adapters.send_queue import SendQueue
 from app.adapters.telegram_client import TelegramClient
 
 from app.domain.models import Driver
 from app.repositories.driver_repo import DriverRepository
+from app.repositories.geo_index import GeoGrid
 from app.repositories.dispatch_repo import DispatchRepository
 from app.repositories.menu_repo import MenuRepository
 
 from app.services.pricing_service import PricingService
 from app.services.dispatch_service import DispatchService
+from app.services.batch_matcher import BatchMatcher
 
-from app.llm.tools import build_tools
-from app.llm.agent_factory import build_agent
-
+from app.application.intent_router import IntentRouter
+from app.application.offer_timeouts import OfferTimeouts
+from app.application.response_cache import ResponseCache
+from app.application.startup_profile import StartupProfile
 from app.application.telegram_router import TelegramRouter
+from app.application.update_queue import UpdateQueue
+
+if TYPE_CHECKING:
+    # imports pesados (telegram, httpx, langchain/langgraph) se difieren al startup
+    import httpx
+    from telegram.ext import Application
+    from app.adapters.http_pools import PoolKeepAlive, PoolStats
+    from app.llm.checkpointer import BoundedMemorySaver
 
 
 logging.basicConfig(level=logging.INFO)
@@ -844,6 +861,18 @@ app = FastAPI(title="Telegram + LangGraph Agent (Clean-ish)")
 
 tg_app: Optional[Application] = None
 router: Optional[TelegramRouter] = None
+update_queue: Optional[UpdateQueue] = None
+checkpointer: Optional[BoundedMemorySaver] = None
+pricing_service: Optional[PricingService] = None
+offer_timeouts: Optional[OfferTimeouts] = None
+send_queue: Optional[SendQueue] = None
+http_pools: Dict[str, PoolStats] = {}
+http_keepalive: Optional[PoolKeepAlive] = None
+openai_clients: Optional[Tuple[httpx.Client, httpx.AsyncClient]] = None
+agent_task: Optional[asyncio.Task] = None
+
+startup_profile = StartupProfile()
+startup_profile.record("import app.main", _IMPORT_STARTED, time.perf_counter() - _IMPORT_STARTED)
 
 
 # -----------------------------
@@ -854,14 +883,75 @@ DRIVERS = [
 ]
 
 
+# -----------------------------
+# Imports diferidos (en threads, solapados con I/O del startup)
+# -----------------------------
+def _import_telegram_stack() -> None:
+    with startup_profile.phase("import telegram + httpx"):
+        import telegram.ext  # noqa: F401
+        import app.adapters.http_pools  # noqa: F401
+
+
+def _build_agent_stack(menu_repo, pricing_service, dispatch_service, openai_clients) -> Tuple[Any, Any]:
+    with startup_profile.phase("import langchain + langgraph"):
+        from app.llm.agent_factory import build_agent
+        from app.llm.checkpointer import BoundedMemorySaver
+        from app.llm.tools import build_tools
+
+    with startup_profile.phase("build agent"):
+        tools = build_tools(
+            menu_repo=menu_repo,
+            pricing_service=pricing_service,
+            dispatch_service=dispatch_service,
+            compact_outputs=[t.strip() for t in settings.tool_output_compact.split(",") if t.strip()],
+        )
+        saver = BoundedMemorySaver(
+            max_threads=settings.checkpoint_max_threads,
+            ttl_seconds=settings.checkpoint_ttl_seconds,
+        )
+        agent = build_agent(
+            tools=tools,
+            model=settings.llm_model,
+            temperature=settings.llm_temperature,
+            checkpointer=saver,
+            history_max_turns=settings.history_max_turns,
+            history_max_tokens=settings.history_max_tokens,
+            http_client=openai_clients[0],
+            http_async_client=openai_clients[1],
+        )
+    return agent, saver
+
+
 @app.on_event("startup")
 async def on_startup():
-    global tg_app, router
-
-    # 1) Secrets (no en import)
-    load_secret_as_env("telegram_bot_mvp", "TELEGRAM_BOT_TOKEN", project_id=settings.project_id)
-    load_secret_as_env("openai_key", "OPENAI_API_KEY", project_id=settings.project_id)
-    load_secret_as_env("url_domiflash", "TELEGRAM_WEBHOOK_URL", project_id=settings.project_id)
+    global tg_app, router, update_queue, checkpointer, pricing_service, offer_timeouts, send_queue
+    global http_keepalive, openai_clients, agent_task
+
+    # 1) Secrets (no en import) + import de telegram en paralelo
+    await asyncio.gather(
+        startup_profile.timed(
+            "secrets",
+            SecretLoader(
+                project_id=settings.project_id,
+                local_dir=settings.secrets_local_dir,
+                cache_path=settings.secrets_cache_path,
+                cache_ttl_s=settings.secrets_cache_ttl_s,
+            ).load_as_env({
+                settings.telegram_token_env: "telegram_bot_mvp",
+                settings.openai_key_env: "openai_key",
+                settings.webhook_url_env: "url_domiflash",
+            }),
+        ),
+        asyncio.to_thread(_import_telegram_stack),
+    )
+    from telegram.ext import Application, CommandHandler, MessageHandler, filters
+    from app.adapters.http_pools import (
+        PoolKeepAlive,
+        PoolStats,
+        build_openai_clients,
+        build_telegram_request,
+        warm_openai,
+    )
 
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL")
@@ -871,61 +961,196 @@ async def on_startup():
         return
 
     # 2) Repos / services
-    drivers_repo = DriverRepository(DRIVERS)
-    dispatch_repo = DispatchRepository()
-    menu_repo = MenuRepository()
-    pricing_service = PricingService(menu_repo=menu_repo)
-    dispatch_service = DispatchService(drivers=drivers_repo, dispatches=dispatch_repo)
+    with startup_profile.phase("repos + services"):
+        drivers_repo = DriverRepository(
+            DRIVERS, locations=GeoGrid(max_age_s=settings.driver_location_max_age_s)
+        )
+        dispatch_repo = DispatchRepository()
+        menu_repo = MenuRepository()
+        pricing_service = PricingService(menu_repo=menu_repo, cache_size=settings.pricing_cache_size)
+        dispatch_service = DispatchService(
+            drivers=drivers_repo,
+            dispatches=dispatch_repo,
+            menu_repo=menu_repo,
+            max_pickup_km=settings.max_pickup_km,
+            matcher=BatchMatcher(
+                drivers_repo,
+                window_s=settings.batch_window_s,
+                max_batch=settings.batch_max_orders,
+                candidates_k=settings.batch_candidates_k,
+                max_pickup_km=settings.max_pickup_km,
+            ) if settings.dispatch_mode == "batch" else None,
+            offer_timeout_s=settings.offer_timeout_s,
+            offer_broadcast_k=settings.offer_broadcast_k,
+            reservation_lease_s=settings.reservation_lease_s,
+        )
+
+    # 3) Pools HTTP compartidos (OpenAI + Telegram)
+    http_pools["openai"] = PoolStats("openai", log_requests=settings.http_log_requests)
+    http_pools["telegram"] = PoolStats("telegram", log_requests=settings.http_log_requests)
+    openai_clients = build_openai_clients(
+        http_pools["openai"],
+        pool_size=settings.openai_http_pool_size,
+        keepalive_connections=settings.http_keepalive_connections,
+        keepalive_expiry_s=settings.http_keepalive_expiry_s,
+        http2=settings.openai_http2,
+    )
+    openai_base_url = os.getenv("OPENAI_BASE_URL")
+    openai_key = os.getenv("OPENAI_API_KEY")
+    # warmup en paralelo con la construcción del agente y de Telegram
+    openai_warmup = asyncio.create_task(
+        startup_profile.timed("openai warmup", warm_openai(openai_clients[1], openai_key, openai_base_url))
+    )
+
+    # 3b) Tools + agent: imports + build en un thread; no bloquea el webhook. Los updates que
+    # no necesitan LLM (domiciliarios, fast path) se atienden mientras tanto
+    async def build_agent_in_background():
+        global checkpointer
+        agent, checkpointer = await asyncio.to_thread(
+            _build_agent_stack, menu_repo, pricing_service, dispatch_service, openai_clients
+        )
+        logger.info("Agente listo (+%.0fms desde el import de app.main)", startup_profile.elapsed_ms())
+        return agent
 
-    # 3) Tools + agent
-    tools = build_tools(menu_repo=menu_repo, pricing_service=pricing_service, dispatch_service=dispatch_service)
-    agent = build_agent(tools=tools, model=settings.llm_model, temperature=settings.llm_temperature)
+    agent_task = asyncio.create_task(build_agent_in_background())
 
     # 4) Telegram infra
-    tg_client = TelegramClient()
+    send_queue = SendQueue(
+        global_rate=settings.tg_global_rate,
+        global_burst=settings.tg_global_burst,
+        chat_rate=settings.tg_chat_rate,
+        chat_burst=settings.tg_chat_burst,
+        max_retries=settings.tg_send_max_retries,
+        concurrency=settings.tg_send_concurrency,
+    ) if settings.tg_send_queue_enabled else None
+    tg_client = TelegramClient(queue=send_queue)
 
     # 5) Router (application layer)
+    offer_timeouts = OfferTimeouts(path=settings.offer_timeouts_path) if settings.offer_timeout_s > 0 else None
     router = TelegramRouter(
         tg_client=tg_client,
         drivers=drivers_repo,
         dispatches=dispatch_repo,
         dispatch_service=dispatch_service,
-        agent=agent,
+        agent=None,
+        agent_task=agent_task,
+        intents=IntentRouter(menu_repo, pricing_service) if settings.fast_path_enabled else None,
+        offer_timeouts=offer_timeouts,
+        stream_replies=settings.stream_replies,
+        stream_edit_interval_s=settings.stream_edit_interval_s,
+        stream_min_chars=settings.stream_min_chars,
+        typing_refresh_s=settings.typing_refresh_s,
+        response_cache=ResponseCache(
+            menu_repo,
+            max_entries=settings.response_cache_size,
+            ttl_s=settings.response_cache_ttl_s,
+            max_chats=settings.checkpoint_max_threads,
+        ) if settings.response_cache_enabled else None,
+        max_threads=settings.checkpoint_max_threads,
     )
 
     # 6) Inicializar Telegram app + handlers
-    tg_app = Application.builder().token(token).build()
+    tg_request = build_telegram_request(
+        http_pools["telegram"],
+        pool_size=settings.tg_http_pool_size,
+        keepalive_connections=settings.http_keepalive_connections,
+        keepalive_expiry_s=settings.http_keepalive_expiry_s,
+        http2=settings.tg_http2,
+    )
+    builder = Application.builder().token(token).request(tg_request)
+    if settings.telegram_api_base_url:
+        builder = builder.base_url(settings.telegram_api_base_url)
+    tg_app = builder.build()
 
     tg_app.add_handler(CommandHandler("start", router.start_cmd))
     tg_app.add_handler(CommandHandler("id", router.id_cmd))
     tg_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, router.on_text))
+    tg_app.add_handler(MessageHandler(filters.LOCATION, router.on_location))
 
-    await tg_app.initialize()
-    await tg_app.bot.set_webhook(url=f"{webhook_url.rstrip('/')}/telegram")
+    with startup_profile.phase("telegram initialize"):
+        await tg_app.initialize()
+    with startup_profile.phase("set webhook"):
+        await tg_app.bot.set_webhook(url=f"{webhook_url.rstrip('/')}/telegram")
     await tg_app.start()
 
     # Conectar bot al client wrapper (para enviar desde run_agent)
     tg_client.set_bot(tg_app.bot)
-
-    logger.info("Startup OK. Webhook listo.")
+    if send_queue is not None:
+        await send_queue.start()
+
+    # initialize() (get_me) + set_webhook ya abrieron la conexión de Telegram; falta OpenAI
+    await openai_warmup
+    http_keepalive = PoolKeepAlive(interval_s=settings.http_keepalive_ping_s)
+    http_keepalive.add(http_pools["telegram"], tg_app.bot.get_me)
+    http_keepalive.add(
+        http_pools["openai"], lambda: warm_openai(openai_clients[1], openai_key, openai_base_url)
+    )
+    await http_keepalive.start()
+
+    # Timers de ofertas (restaura las pendientes del último proceso; requiere el bot conectado)
+    if offer_timeouts is not None:
+        await offer_timeouts.start(router.on_offer_expired)
+
+    # 7) Modo fast-ack: cola + pool de workers
+    if settings.webhook_mode == "queue":
+        update_queue = UpdateQueue(
+            handler=tg_app.process_update,
+            workers=settings.update_workers,
+            maxsize=settings.update_queue_maxsize,
+        )
+        await update_queue.start()
+
+    logger.info(
+        "Startup OK. Webhook listo. mode=%s dispatch=%s", settings.webhook_mode, settings.dispatch_mode
+    )
+    startup_profile.log()
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    global tg_app
+    global tg_app, update_queue, offer_timeouts, send_queue, http_keepalive, openai_clients, agent_task
+    if update_queue is not None:
+        await update_queue.stop()
+        update_queue = None
+    if offer_timeouts is not None:
+        await offer_timeouts.stop()
+        offer_timeouts = None
+    if send_queue is not None:
+        # drena lo pendiente (respuestas ya generadas) antes de cerrar el bot
+        await send_queue.stop()
+        send_queue = None
     if tg_app is not None:
         await tg_app.stop()
         await tg_app.shutdown()
         tg_app = None
+    if http_keepalive is not None:
+        await http_keepalive.stop()
+        http_keepalive = None
+    if agent_task is not None:
+        # el thread del build no se puede cancelar: se espera a que termine antes de cerrar pools
+        await asyncio.gather(agent_task, return_exceptions=True)
+        agent_task = None
+    if openai_clients is not None:
+        openai_clients[0].close()
+        await openai_clients[1].aclose()
+        openai_clients = None
 
 
 @app.post("/telegram")
 async def telegram_webhook(req: Request):
     if tg_app is None:
         raise HTTPException(status_code=503, detail="Bot no inicializado")
+    from telegram import Update
 
     data = await req.json()
     update = Update.de_json(data, tg_app.bot)
+
+    if update_queue is not None:
+        # fast-ack: responder 200 ya; si la cola está llena, Telegram reintenta más tarde
+        if not update_queue.enqueue(update):
+            raise HTTPException(status_code=503, detail="Cola de updates llena")
+        return {"ok": True, "queued": True}
+
     await tg_app.process_update(update)
     return {"ok": True}
 
@@ -936,4 +1161,27 @@ async def health():
         "status": "ok",
         "telegram_ready": tg_app is not None,
         "router_ready": router is not None,
+        "agent_ready": (
+            agent_task is not None and agent_task.done()
+            and not agent_task.cancelled() and agent_task.exception() is None
+        ),
+        "startup": startup_profile.report(),
+        "update_queue": update_queue.stats() if update_queue is not None else None,
+        "chat_scheduler": router.scheduler.stats() if router is not None else None,
+        "checkpointer": checkpointer.stats() if checkpointer is not None else None,
+        "pricing_cache": pricing_service.cache_stats() if pricing_service is not None else None,
+        "fast_path": router.intents.stats() if router is not None and router.intents is not None else None,
+        "response_cache": (
+            router.response_cache.stats() if router is not None and router.response_cache is not None else None
+        ),
+        "offers_deduped": router.offers_deduped if router is not None else None,
+        "offer_timeouts": offer_timeouts.stats() if offer_timeouts is not None else None,
+        "send_queue": send_queue.stats() if send_queue is not None else None,
+        "http_pools": {name: p.stats() for name, p in http_pools.items()},
+        "http_keepalive": http_keepalive.stats() if http_keepalive is not None else None,
+        "batch_matching": (
+            router.dispatch_service.matcher.stats()
+            if router is not None and router.dispatch_service.matcher is not None
+            else None
+        ),
     }
@@ -1,16 +1,55 @@
-from typing import Dict, Optional
+import heapq
+import secrets
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from app.domain.models import Dispatch
 
+# Máquina de estados del despacho:
+#   reserved -> sent -> accepted -> completed
+#      |          |        \-> rejected
+#      |          |-> rejected / expired
+#      |-> released (venció la reserva sin send_order_to_driver) -> sent (si el domiciliario sigue libre)
+TRANSITIONS: Dict[str, set] = {
+    "reserved": {"sent", "released"},
+    "released": {"sent"},
+    "sent": {"accepted", "rejected", "expired"},
+    "accepted": {"completed", "rejected"},
+}
+
+# estados en los que una llamada repetida (misma idempotency key) devuelve el mismo despacho:
+# vivo o ya terminado. Solo rejected / expired / released permiten una asignación nueva.
+IDEMPOTENT_STATES = {"reserved", "sent", "accepted", "completed"}
+
+
+class DispatchStateError(ValueError):
+    """Transición inválida (p. ej. enviar un despacho reservado para otro domiciliario)."""
+
+
 class DispatchRepository:
+    """
+    Despachos y pedido activo por domiciliario.
+    Todas las transiciones de estado son atómicas bajo un lock (webhooks concurrentes +
+    tools en threads del executor) y solo siguen TRANSITIONS.
+    """
+
     def __init__(self):
+        self._lock = threading.RLock()
         self._dispatches: Dict[str, Dispatch] = {}
         self._driver_active: Dict[int, str] = {}
+        self._by_key: Dict[str, str] = {}
+        # (lease_until, dispatch_id) de las reservas vivas
+        self._leases: List[Tuple[float, str]] = []
 
     def set_active_for_driver(self, driver_chat_id: int, dispatch_id: str) -> None:
         self._driver_active[driver_chat_id] = dispatch_id
 
-    def clear_active_for_driver(self, driver_chat_id: int) -> None:
-        self._driver_active.pop(driver_chat_id, None)
+    def clear_active_for_driver(self, driver_chat_id: int, dispatch_id: Optional[str] = None) -> bool:
+        """Si se pasa dispatch_id, solo limpia cuando ese es el pedido activo del domiciliario."""
+        with self._lock:
+            if dispatch_id is not None and self._driver_active.get(driver_chat_id) != dispatch_id:
+                return False
+            return self._driver_active.pop(driver_chat_id, None) is not None
 
     def get_active_dispatch_for_driver(self, driver_chat_id: int) -> Optional[Dispatch]:
         disp_id = self._driver_active.get(driver_chat_id)
@@ -23,3 +62,144 @@ class DispatchRepository:
 
     def get(self, dispatch_id: str) -> Optional[Dispatch]:
         return self._dispatches.get(dispatch_id)
+
+    def new_id(self) -> str:
+        """ID único en el repositorio (el segundo solo ya no basta: dos pedidos en el mismo segundo)."""
+        with self._lock:
+            while True:
+                dispatch_id = f"disp_{int(time.time())}_{secrets.token_hex(4)}"
+                if dispatch_id not in self._dispatches:
+                    return dispatch_id
+
+    # ---------------------------
+    # Transiciones
+    # ---------------------------
+    def transition(self, dispatch_id: str, to: str, **fields: Any) -> bool:
+        """Cambia el estado si la transición es válida (atómico); False si no aplica."""
+        with self._lock:
+            disp = self._dispatches.get(dispatch_id)
+            if disp is None or to not in TRANSITIONS.get(disp.status, ()):
+                return False
+            disp.status = to
+            for k, v in fields.items():
+                setattr(disp, k, v)
+            return True
+
+    def reserve(self, disp: Dispatch) -> Tuple[Dispatch, bool]:
+        """
+        Guarda un despacho "reserved" con lease. Si ya hay uno vivo con la misma
+        idempotency_key retorna (existente, False) y el llamador debe soltar su domiciliario.
+        """
+        with self._lock:
+            if disp.idempotency_key:
+                prev = self.find_by_key(disp.idempotency_key)
+                if prev is not None:
+                    return prev, False
+                self._by_key[disp.idempotency_key] = disp.dispatch_id
+            disp.status = "reserved"
+            self._dispatches[disp.dispatch_id] = disp
+            if disp.lease_until is not None:
+                heapq.heappush(self._leases, (disp.lease_until, disp.dispatch_id))
+            return disp, True
+
+    def find_by_key(self, idempotency_key: str) -> Optional[Dispatch]:
+        with self._lock:
+            disp = self._dispatches.get(self._by_key.get(idempotency_key, ""))
+            if disp is None or disp.status not in IDEMPOTENT_STATES:
+                return None
+            return disp
+
+    def release_expired(self, now: Optional[float] = None) -> List[Dispatch]:
+        """reserved -> released para las reservas con lease vencido; retorna las liberadas."""
+        now = time.time() if now is None else now
+        out: List[Dispatch] = []
+        with self._lock:
+            while self._leases and self._leases[0][0] <= now:
+                _, dispatch_id = heapq.heappop(self._leases)
+                disp = self._dispatches.get(dispatch_id)
+                if disp is not None and disp.status == "reserved" and self.transition(dispatch_id, "released"):
+                    out.append(disp)
+        return out
+
+    def mark_sent(
+        self,
+        dispatch_id: str,
+        driver_chat_id: int,
+        customer_chat_id: Optional[int],
+        order: Dict[str, Any],
+        reassigned_from: Optional[str] = None,
+        allow_released: bool = False,
+    ) -> Tuple[Dispatch, bool]:
+        """
+        reserved -> sent y lo deja como pedido activo del domiciliario.
+        Idempotente: si ya estaba enviado (o más adelante) retorna (existente, False).
+        "released" solo se acepta con allow_released (el llamador ya volvió a reservar al domiciliario).
+        Un id desconocido crea el despacho directamente en "sent" (compatibilidad).
+        """
+        with self._lock:
+            disp = self._dispatches.get(dispatch_id)
+            if disp is None:
+                disp = Dispatch(dispatch_id=dispatch_id, driver_chat_id=driver_chat_id, customer_chat_id=customer_chat_id, order=order)
+                self._dispatches[dispatch_id] = disp
+            elif disp.status not in ("reserved", "released"):
+                return disp, False
+            elif disp.status == "released" and not allow_released:
+                raise DispatchStateError(f"La reserva {dispatch_id} venció.")
+            elif disp.driver_chat_id != driver_chat_id:
+                raise DispatchStateError(
+                    f"{dispatch_id} está reservado para otro domiciliario ({disp.driver_chat_id})."
+                )
+
+            disp.status = "sent"
+            disp.customer_chat_id = customer_chat_id
+            disp.order = order
+            disp.ts = int(time.time())
+            disp.lease_until = None
+            disp.reassigned_from = reassigned_from
+            disp.offered_to = [driver_chat_id]
+            self._driver_active[driver_chat_id] = dispatch_id
+            return disp, True
+
+    # ---------------------------
+    # Ofertas a varios domiciliarios
+    # ---------------------------
+    def add_offer(self, dispatch_id: str, driver_chat_id: int) -> bool:
+        """Suma un domiciliario a la oferta (status "sent") y la deja como su pedido activo."""
+        with self._lock:
+            disp = self._dispatches.get(dispatch_id)
+            if disp is None or disp.status != "sent":
+                return False
+            if driver_chat_id not in disp.offered_to:
+                disp.offered_to.append(driver_chat_id)
+            self._driver_active[driver_chat_id] = dispatch_id
+            return True
+
+    def claim(self, dispatch_id: str, driver_chat_id: int) -> bool:
+        """Primer ACEPTO gana: sent -> accepted solo si driver_chat_id estaba en la oferta."""
+        with self._lock:
+            disp = self._dispatches.get(dispatch_id)
+            if disp is None or driver_chat_id not in disp.offered_to:
+                return False
+            return self.transition(
+                dispatch_id, "accepted", driver_chat_id=driver_chat_id, accepted_ts=int(time.time())
+            )
+
+    def expire(self, dispatch_id: str) -> bool:
+        """sent -> expired (la oferta venció sin ACEPTO); False si ya cambió de estado."""
+        return self.transition(dispatch_id, "expired", expired_ts=int(time.time()))
+
+    def decline(self, dispatch_id: str, driver_chat_id: int) -> Optional[List[int]]:
+        """
+        Retira al domiciliario de la oferta. Retorna los que siguen con la oferta abierta;
+        si no queda ninguno el despacho pasa a "rejected". None si la oferta ya no estaba abierta.
+        """
+        with self._lock:
+            disp = self._dispatches.get(dispatch_id)
+            if disp is None or disp.status != "sent" or driver_chat_id not in disp.offered_to:
+                return None
+            disp.offered_to.remove(driver_chat_id)
+            if self._driver_active.get(driver_chat_id) == dispatch_id:
+                del self._driver_active[driver_chat_id]
+            if not disp.offered_to:
+                self.transition(dispatch_id, "rejected", rejected_ts=int(time.time()))
+            return list(disp.offered_to)
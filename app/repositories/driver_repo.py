@@ -1,28 +1,157 @@
-from typing import Optional, List, Set
+import threading
+from typing import Dict, Iterable, Optional, List, Set, Tuple
 from app.domain.models import Driver
+from app.repositories.geo_index import GeoGrid
 
 class DriverRepository:
-    def __init__(self, drivers: List[Driver]):
-        self._drivers = drivers
+    """
+    Roster de domiciliarios indexado:
+    - chat_id -> Driver (hash) para is_driver_chat / get_by_chat en O(1)
+    - conjunto ordenado de disponibles para pick_available sin recorrer toda la flota
+    - grilla espacial con la última ubicación (live location) de cada domiciliario
+    - lock: las tools sync del agente corren en threads del executor
+    La disponibilidad se cambia solo vía set_available/pick_available (no mutar Driver directo).
+    """
 
+    def __init__(self, drivers: List[Driver], locations: Optional[GeoGrid] = None):
+        self._lock = threading.RLock()
+        self.locations = locations or GeoGrid()
+        self._by_chat: Dict[int, Driver] = {}
+        # dict como "set ordenado": conserva el orden de llegada al pool de disponibles
+        self._available: Dict[int, Driver] = {}
+        self.upsert_many(drivers)
+
+    # ---------------------------
+    # Consultas
+    # ---------------------------
     def is_driver_chat(self, chat_id: int) -> bool:
-        return any(d.chat_id == chat_id for d in self._drivers)
+        return chat_id in self._by_chat
 
     def get_by_chat(self, chat_id: int) -> Optional[Driver]:
-        for d in self._drivers:
-            if d.chat_id == chat_id:
-                return d
-        return None
+        return self._by_chat.get(chat_id)
+
+    def all(self) -> List[Driver]:
+        with self._lock:
+            return list(self._by_chat.values())
+
+    def available_count(self) -> int:
+        return len(self._available)
 
+    # ---------------------------
+    # Disponibilidad
+    # ---------------------------
     def pick_available(self, exclude_chat_ids: Set[int] | None = None) -> Optional[Driver]:
         exclude_chat_ids = exclude_chat_ids or set()
-        for d in self._drivers:
-            if d.is_available and d.chat_id not in exclude_chat_ids:
-                d.is_available = False
-                return d
+        with self._lock:
+            for chat_id, d in self._available.items():
+                if chat_id not in exclude_chat_ids:
+                    del self._available[chat_id]
+                    d.is_available = False
+                    return d
         return None
 
+    def pick_nearest_available(
+        self,
+        lat: float,
+        lng: float,
+        exclude_chat_ids: Set[int] | None = None,
+        max_radius_km: float = 15.0,
+    ) -> Optional[Tuple[Driver, float]]:
+        """Domiciliario disponible más cercano con ubicación reciente -> (driver, km); lo marca ocupado."""
+        exclude_chat_ids = exclude_chat_ids or set()
+        with self._lock:
+            available = self._available
+            found = self.locations.nearest(
+                lat,
+                lng,
+                accept=lambda chat_id: chat_id in available and chat_id not in exclude_chat_ids,
+                max_radius_km=max_radius_km,
+            )
+            if found is None:
+                return None
+            chat_id, km = found
+            d = available.pop(chat_id)
+            d.is_available = False
+            return d, km
+
+    def nearest_candidates(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        exclude_chat_ids: Set[int] | None = None,
+        max_radius_km: float = 15.0,
+    ) -> List[Tuple[int, float]]:
+        """Hasta k disponibles más cercanos -> [(chat_id, km)]; no los marca ocupados (ver claim)."""
+        exclude_chat_ids = exclude_chat_ids or set()
+        with self._lock:
+            available = self._available
+            return self.locations.k_nearest(
+                lat,
+                lng,
+                k,
+                accept=lambda chat_id: chat_id in available and chat_id not in exclude_chat_ids,
+                max_radius_km=max_radius_km,
+            )
+
+    def claim(self, chat_id: int) -> Optional[Driver]:
+        """Marca ocupado a un domiciliario solo si sigue disponible (atómico); None si ya lo tomaron."""
+        with self._lock:
+            d = self._available.pop(chat_id, None)
+            if d is not None:
+                d.is_available = False
+            return d
+
+    def update_location(self, chat_id: int, lat: float, lng: float, ts: Optional[float] = None) -> bool:
+        """Actualiza la ubicación de un domiciliario conocido; False si el chat no es de un domiciliario."""
+        with self._lock:
+            if chat_id not in self._by_chat:
+                return False
+            self.locations.update(chat_id, float(lat), float(lng), ts=ts)
+            return True
+
     def set_available(self, chat_id: int, is_available: bool) -> None:
-        d = self.get_by_chat(chat_id)
-        if d:
+        with self._lock:
+            d = self._by_chat.get(chat_id)
+            if not d:
+                return
             d.is_available = is_available
+            if is_available:
+                self._available[chat_id] = d
+            else:
+                self._available.pop(chat_id, None)
+
+    # ---------------------------
+    # Roster en caliente
+    # ---------------------------
+    def upsert(self, driver: Driver) -> None:
+        self.upsert_many([driver])
+
+    def upsert_many(self, drivers: Iterable[Driver]) -> None:
+        """Agrega o actualiza domiciliarios (por chat_id) sin reiniciar el servicio."""
+        with self._lock:
+            for d in drivers:
+                chat_id = int(d.chat_id)
+                self._by_chat[chat_id] = d
+                if d.is_available:
+                    self._available[chat_id] = d
+                else:
+                    self._available.pop(chat_id, None)
+
+    def remove(self, chat_id: int) -> Optional[Driver]:
+        with self._lock:
+            self._available.pop(chat_id, None)
+            self.locations.remove(chat_id)
+            return self._by_chat.pop(chat_id, None)
+
+    def replace_all(self, drivers: Iterable[Driver]) -> None:
+        """Reemplaza el roster completo (los que no vengan en la lista se eliminan)."""
+        with self._lock:
+            drivers = list(drivers)
+            keep = {int(d.chat_id) for d in drivers}
+            for chat_id in list(self._by_chat):
+                if chat_id not in keep:
+                    self.locations.remove(chat_id)
+            self._by_chat = {}
+            self._available = {}
+            self.upsert_many(drivers)
@@ -0,0 +1,145 @@
+import heapq
+import math
+import time
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+KM_PER_DEG_LAT = 110.57
+KM_PER_DEG_LNG_EQUATOR = 111.32
+
+Cell = Tuple[int, int]
+
+
+def distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distancia equirectangular; suficiente a escala de ciudad y mucho más barata que haversine."""
+    x = (lng2 - lng1) * KM_PER_DEG_LNG_EQUATOR * math.cos(math.radians((lat1 + lat2) / 2))
+    y = (lat2 - lat1) * KM_PER_DEG_LAT
+    return math.hypot(x, y)
+
+
+class GeoGrid:
+    """
+    Índice espacial en grilla uniforme (celdas de cell_deg grados):
+    - update() mueve un punto de celda en O(1) (pensado para live locations de Telegram)
+    - nearest() busca por anillos de celdas alrededor del origen y se detiene en cuanto
+      ningún anillo más lejano puede mejorar el mejor candidato
+    - puntos con más de max_age_s sin actualizarse se ignoran en las búsquedas
+    """
+
+    def __init__(self, cell_deg: float = 0.01, max_age_s: float = 600):
+        self.cell_deg = float(cell_deg)
+        self.max_age_s = float(max_age_s)
+        self._cells: Dict[Cell, Set[Hashable]] = {}
+        # key -> (lat, lng, celda, ts)
+        self._points: Dict[Hashable, Tuple[float, float, Cell, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    # ---------------------------
+    # Escritura
+    # ---------------------------
+    def update(self, key: Hashable, lat: float, lng: float, ts: Optional[float] = None) -> None:
+        cell = self._cell(lat, lng)
+        prev = self._points.get(key)
+        if prev is not None and prev[2] != cell:
+            bucket = self._cells.get(prev[2])
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._cells[prev[2]]
+        if prev is None or prev[2] != cell:
+            self._cells.setdefault(cell, set()).add(key)
+        self._points[key] = (lat, lng, cell, time.time() if ts is None else ts)
+
+    def remove(self, key: Hashable) -> None:
+        prev = self._points.pop(key, None)
+        if prev is None:
+            return
+        bucket = self._cells.get(prev[2])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[prev[2]]
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, float, float]]:
+        p = self._points.get(key)
+        return (p[0], p[1], p[3]) if p else None
+
+    # ---------------------------
+    # Búsqueda
+    # ---------------------------
+    @staticmethod
+    def _ring(ci: int, cj: int, r: int) -> Iterator[Cell]:
+        if r == 0:
+            yield (ci, cj)
+            return
+        for d in range(-r, r + 1):
+            yield (ci + d, cj - r)
+            yield (ci + d, cj + r)
+        for d in range(-r + 1, r):
+            yield (ci - r, cj + d)
+            yield (ci + r, cj + d)
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        accept: Optional[Callable[[Hashable], bool]] = None,
+        max_radius_km: float = 15.0,
+        now: Optional[float] = None,
+    ) -> Optional[Tuple[Hashable, float]]:
+        """(key, distancia_km) del punto aceptado más cercano dentro del radio, o None."""
+        found = self.k_nearest(lat, lng, 1, accept=accept, max_radius_km=max_radius_km, now=now)
+        return found[0] if found else None
+
+    def k_nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        accept: Optional[Callable[[Hashable], bool]] = None,
+        max_radius_km: float = 15.0,
+        now: Optional[float] = None,
+    ) -> List[Tuple[Hashable, float]]:
+        """Hasta k puntos aceptados más cercanos dentro del radio, ordenados por distancia."""
+        if not self._points or k < 1:
+            return []
+        now = time.time() if now is None else now
+        min_age_ts = now - self.max_age_s if self.max_age_s > 0 else -math.inf
+
+        # lado mínimo de una celda en km (el lado en longitud se achica con la latitud)
+        cell_km = self.cell_deg * min(KM_PER_DEG_LAT, KM_PER_DEG_LNG_EQUATOR * math.cos(math.radians(lat)))
+        max_ring = int(math.ceil(max_radius_km / cell_km)) + 1
+
+        ci, cj = self._cell(lat, lng)
+        # max-heap por distancia (negada) con los k mejores
+        best: List[Tuple[float, int, Hashable]] = []
+        seq = 0
+        cells = self._cells
+        points = self._points
+        for r in range(max_ring + 1):
+            for cell in self._ring(ci, cj, r):
+                bucket = cells.get(cell)
+                if not bucket:
+                    continue
+                for key in bucket:
+                    p_lat, p_lng, _, ts = points[key]
+                    if ts < min_age_ts:
+                        continue
+                    d = distance_km(lat, lng, p_lat, p_lng)
+                    if d > max_radius_km or (len(best) == k and d >= -best[0][0]):
+                        continue
+                    if accept is not None and not accept(key):
+                        continue
+                    seq += 1
+                    if len(best) == k:
+                        heapq.heapreplace(best, (-d, seq, key))
+                    else:
+                        heapq.heappush(best, (-d, seq, key))
+            # todo punto del anillo r+1 está al menos a r * cell_km del origen
+            if len(best) == k and -best[0][0] <= r * cell_km:
+                break
+        return [(key, -nd) for nd, _, key in sorted(best, reverse=True)]
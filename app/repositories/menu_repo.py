@@ -1,28 +1,106 @@
+import json
+import threading
 from typing import Dict, Any
 from app.domain.menu_data import MENU
 
+def _opts_text(opts: Dict[str, Any]) -> str:
+    return ";".join(f"{k}={v}" for k, v in opts.items())
+
+
+def compact_menu(payload: Dict[str, Any]) -> str:
+    """
+    Menú en forma tabular para la tool get_menu: llaves cortas, una fila por ítem
+    [item, precio, bordes, adiciones] con las opciones como "nombre=extra;..." y JSON sin
+    espacios ni escapes \\u. Mismo contenido que get_menu_json con menos tokens.
+    """
+    options = payload.get("options", {})
+    rows = []
+    for item, price in payload["items"].items():
+        opts = options.get(item, {})
+        rows.append([item, price, _opts_text(opts.get("bordes", {})), _opts_text(opts.get("adiciones", {}))])
+    compact = {
+        "ok": True,
+        "r": payload["restaurant"],
+        "cur": payload["currency"],
+        "dom": payload["delivery_fee"],
+        "cols": ["item", "precio", "bordes", "adiciones"],
+        "rows": rows,
+    }
+    return json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+
+
 class MenuRepository:
     def __init__(self, menu: Dict[str, Any] | None = None):
         self._menu = menu or MENU
+        self._version = 1
+        # serializa a los escritores; los lectores (tools en threads) no toman lock
+        self._write_lock = threading.Lock()
+        self._build_payloads(self._menu)
 
-    def get_menu(self, restaurant: str) -> Dict[str, Any]:
-        r = (restaurant or "").strip()
-        if r not in self._menu:
-            return {
-                "ok": False,
-                "error": "Restaurante no encontrado",
-                "available_restaurants": list(self._menu.keys()),
+    @property
+    def version(self) -> int:
+        """Se incrementa con cada cambio del menú (para invalidar índices/caches derivados)."""
+        return self._version
+
+    # ---------------------------
+    # Payloads precalculados (se reconstruyen cuando cambia el menú)
+    # ---------------------------
+    def _build_payloads(self, menu: Dict[str, Any]) -> None:
+        """
+        Arma los payloads en dicts locales y los publica de una vez: un get_menu concurrente
+        ve el menú anterior completo o el nuevo completo, nunca un dict vacío o a medias.
+        """
+        payloads: Dict[str, Dict[str, Any]] = {}
+        payloads_json: Dict[str, str] = {}
+        payloads_compact: Dict[str, str] = {}
+        for r, data in menu.items():
+            payload = {
+                "ok": True,
+                "restaurant": r,
+                "currency": data.get("currency", "COP"),
+                "delivery_fee": data.get("delivery_fee", 0),
+                "items": {k: v["price"] for k, v in data["items"].items()},
+                "options": data.get("options", {}),
             }
+            payloads[r] = payload
+            payloads_json[r] = json.dumps(payload)
+            payloads_compact[r] = compact_menu(payload)
 
-        data = self._menu[r]
-        return {
-            "ok": True,
-            "restaurant": r,
-            "currency": data.get("currency", "COP"),
-            "delivery_fee": data.get("delivery_fee", 0),
-            "items": {k: v["price"] for k, v in data["items"].items()},
-            "options": data.get("options", {}),
+        not_found = {
+            "ok": False,
+            "error": "Restaurante no encontrado",
+            "available_restaurants": list(menu.keys()),
         }
+        not_found_json = json.dumps(not_found)
+        not_found_compact = json.dumps(not_found, ensure_ascii=False, separators=(",", ":"))
+
+        self._menu = menu
+        self._payloads, self._payloads_json, self._payloads_compact = payloads, payloads_json, payloads_compact
+        self._not_found, self._not_found_json, self._not_found_compact = not_found, not_found_json, not_found_compact
+
+    def get_menu(self, restaurant: str) -> Dict[str, Any]:
+        """Payload del menú (compartido entre llamadas: no mutarlo)."""
+        return self._payloads.get((restaurant or "").strip(), self._not_found)
+
+    def get_menu_json(self, restaurant: str) -> str:
+        """Igual que get_menu pero ya serializado (lo que consume la tool get_menu)."""
+        return self._payloads_json.get((restaurant or "").strip(), self._not_found_json)
+
+    def get_menu_compact(self, restaurant: str) -> str:
+        """Como get_menu_json pero en formato compacto (ver compact_menu): menos tokens por llamada."""
+        return self._payloads_compact.get((restaurant or "").strip(), self._not_found_compact)
 
     def raw(self) -> Dict[str, Any]:
         return self._menu
+
+    def set_menu(self, menu: Dict[str, Any]) -> None:
+        # la versión sube después de publicar los payloads: quien vea la versión nueva
+        # (caches de pricing / respuestas) ya encuentra el menú nuevo
+        with self._write_lock:
+            self._build_payloads(menu)
+            self._version += 1
+
+    def update_restaurant(self, restaurant: str, data: Dict[str, Any]) -> None:
+        with self._write_lock:
+            self._build_payloads({**self._menu, restaurant: data})
+            self._version += 1
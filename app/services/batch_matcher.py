@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.domain.models import Driver
+from app.repositories.driver_repo import DriverRepository
+
+
+logger = logging.getLogger("tg-langgraph-agent")
+
+# costo de un par (pedido, domiciliario) que no es candidato; nunca gana frente a uno real
+NO_EDGE = 1e9
+
+Origin = Tuple[float, float]
+
+
+def solve_assignment(cost: List[List[float]]) -> List[int]:
+    """
+    Asignación de costo mínimo (húngaro, O(n^2 m)) sobre una matriz n x m.
+    Retorna para cada fila la columna asignada; -1 si la fila quedó sin columna (n > m).
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    if m == 0:
+        return [-1] * n
+    if n > m:
+        # el algoritmo asume filas <= columnas: se resuelve la transpuesta
+        by_col = solve_assignment([[cost[i][j] for i in range(n)] for j in range(m)])
+        res = [-1] * n
+        for j, i in enumerate(by_col):
+            if i >= 0:
+                res[i] = j
+        return res
+
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)      # p[j] = fila (1-based) asignada a la columna j
+    way = [0] * (m + 1)
+    cols = range(1, m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = inf
+            j1 = 0
+            for j in cols:
+                if not used[j]:
+                    cur = row[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    res = [-1] * n
+    for j in cols:
+        if p[j]:
+            res[p[j] - 1] = j - 1
+    return res
+
+
+class BatchMatcher:
+    """
+    Emparejamiento por ventanas (modo "batch" de DispatchService):
+    - request() encola el pedido y espera a que cierre la ventana (window_s) o se llene (max_batch)
+    - plan() arma la matriz de costos (km de recogida) contra los candidates_k disponibles más
+      cercanos a cada restaurante y resuelve la asignación óptima de todo el lote a la vez
+    - los domiciliarios se reservan con DriverRepository.claim; si alguno ya fue tomado por otra
+      vía, ese pedido vuelve con None y DispatchService cae al modo greedy
+    """
+
+    def __init__(
+        self,
+        drivers: DriverRepository,
+        window_s: float = 5.0,
+        max_batch: int = 50,
+        candidates_k: int = 16,
+        max_pickup_km: float = 15.0,
+    ):
+        self.drivers = drivers
+        self.window_s = float(window_s)
+        self.max_batch = max(1, int(max_batch))
+        self.candidates_k = max(1, int(candidates_k))
+        self.max_pickup_km = float(max_pickup_km)
+
+        self._pending: List[Tuple[Origin, Set[int], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # referencias a los flush en curso (el loop solo guarda referencias débiles a las tareas)
+        self._flushing: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.orders = 0
+        self.matched = 0
+        self.total_km = 0.0
+        self.last_plan_ms = 0.0
+
+    # ---------------------------
+    # Entrada principal
+    # ---------------------------
+    async def request(self, origin: Origin, exclude: Optional[Set[int]] = None) -> Optional[Tuple[Driver, float]]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((origin, set(exclude or ()), fut))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush_now)
+        return await fut
+
+    def _flush_now(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._flush(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, batch: List[Tuple[Origin, Set[int], asyncio.Future]]) -> None:
+        # los llamadores cancelados durante la ventana no entran al plan ni reservan domiciliario
+        batch = [entry for entry in batch if not entry[2].done()]
+        if not batch:
+            return
+        try:
+            # armar la matriz y resolver el húngaro es CPU puro: fuera del event loop
+            plan = await asyncio.to_thread(self.plan, [(origin, exclude) for origin, exclude, _ in batch])
+        except Exception as e:
+            logger.exception("BATCH plan falló (%s pedidos): %s", len(batch), e)
+            plan = [None] * len(batch)
+
+        matched = 0
+        km_sum = 0.0
+        for (_, _, fut), choice in zip(batch, plan):
+            if fut.done():
+                # cancelado mientras se calculaba el plan: no reservar
+                continue
+            result = None
+            if choice is not None:
+                driver = self.drivers.claim(choice[0])
+                if driver is not None:
+                    result = (driver, choice[1])
+            try:
+                fut.set_result(result)
+            except Exception:
+                # no se pudo entregar: el domiciliario vuelve al pool
+                if result is not None:
+                    self.drivers.set_available(choice[0], True)
+                continue
+            if result is not None:
+                matched += 1
+                km_sum += result[1]
+
+        self.batches += 1
+        self.orders += len(batch)
+        self.matched += matched
+        self.total_km += km_sum
+        logger.info(
+            "BATCH size=%s matched=%s pickup_km=%.2f plan_ms=%.1f",
+            len(batch), matched, km_sum, self.last_plan_ms,
+        )
+
+    # ---------------------------
+    # Plan (sin efectos: no reserva domiciliarios)
+    # ---------------------------
+    def plan(self, requests: List[Tuple[Origin, Set[int]]]) -> List[Optional[Tuple[int, float]]]:
+        """Para cada (origen, excluidos) -> (driver_chat_id, km) o None; minimiza la suma de km."""
+        t0 = time.perf_counter()
+        col_of: Dict[int, int] = {}
+        edges: List[List[Tuple[int, float]]] = []
+        for (lat, lng), exclude in requests:
+            row = []
+            for chat_id, km in self.drivers.nearest_candidates(
+                lat, lng, self.candidates_k, exclude_chat_ids=exclude, max_radius_km=self.max_pickup_km
+            ):
+                j = col_of.setdefault(chat_id, len(col_of))
+                row.append((j, km))
+            edges.append(row)
+
+        chat_ids = list(col_of)
+        out: List[Optional[Tuple[int, float]]] = [None] * len(requests)
+        if chat_ids:
+            cost = []
+            for row in edges:
+                r = [NO_EDGE] * len(chat_ids)
+                for j, km in row:
+                    r[j] = km
+                cost.append(r)
+            for i, j in enumerate(solve_assignment(cost)):
+                if j >= 0 and cost[i][j] < NO_EDGE:
+                    out[i] = (chat_ids[j], cost[i][j])
+
+        self.last_plan_ms = (time.perf_counter() - t0) * 1000
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_s": self.window_s,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "orders": self.orders,
+            "matched": self.matched,
+            "avg_batch": round(self.orders / self.batches, 2) if self.batches else 0.0,
+            "avg_pickup_km": round(self.total_km / self.matched, 3) if self.matched else 0.0,
+            "last_plan_ms": round(self.last_plan_ms, 2),
+        }
@@ -1,16 +1,39 @@
+import hashlib
 import json
 import time
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from app.domain.models import Dispatch
+from app.domain.models import Dispatch, Driver
 from app.repositories.driver_repo import DriverRepository
-from app.repositories.dispatch_repo import DispatchRepository
+from app.repositories.dispatch_repo import DispatchRepository, DispatchStateError
+from app.repositories.menu_repo import MenuRepository
+from app.services.batch_matcher import BatchMatcher
 
 
 class DispatchService:
-    def __init__(self, drivers: DriverRepository, dispatches: DispatchRepository):
+    def __init__(
+        self,
+        drivers: DriverRepository,
+        dispatches: DispatchRepository,
+        menu_repo: Optional[MenuRepository] = None,
+        max_pickup_km: float = 15.0,
+        matcher: Optional[BatchMatcher] = None,
+        offer_timeout_s: float = 90.0,
+        offer_broadcast_k: int = 1,
+        reservation_lease_s: float = 120.0,
+    ):
         self.drivers = drivers
         self.dispatches = dispatches
+        self.menu_repo = menu_repo
+        self.max_pickup_km = max_pickup_km
+        # modo "batch": si hay matcher, assign_driver_async agrupa pedidos por ventana
+        self.matcher = matcher
+        # tiempo que tiene el domiciliario para responder (el MENU puede definirlo por restaurante)
+        self.offer_timeout_s = offer_timeout_s
+        # cuántos domiciliarios reciben la misma oferta a la vez (1 = uno por uno)
+        self.offer_broadcast_k = max(1, int(offer_broadcast_k))
+        # assign_driver reserva al domiciliario; si nunca llega send_order_to_driver, se libera solo
+        self.reservation_lease_s = reservation_lease_s
 
     # -------------------------
     # Normalizadores (igual a tu script)
@@ -51,43 +74,241 @@ class DispatchService:
     # -------------------------
     # Asignación / registro
     # -------------------------
-    def assign_driver(self, order: Dict[str, Any], exclude: Optional[Set[int]] = None) -> Dict[str, Any]:
+    def restaurant_location(self, order: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        if self.menu_repo is None:
+            return None
+        cfg = self.menu_repo.raw().get((order.get("restaurante") or "").strip()) or {}
+        loc = cfg.get("location") or {}
+        if loc.get("lat") is None or loc.get("lng") is None:
+            return None
+        return float(loc["lat"]), float(loc["lng"])
+
+    def offer_timeout_for(self, order: Dict[str, Any]) -> float:
+        if self.menu_repo is not None:
+            cfg = self.menu_repo.raw().get((order.get("restaurante") or "").strip()) or {}
+            if cfg.get("offer_timeout_s") is not None:
+                return float(cfg["offer_timeout_s"])
+        return float(self.offer_timeout_s)
+
+    # -------------------------
+    # Reservas (reserved -> sent)
+    # -------------------------
+    def idempotency_key(
+        self, order: Dict[str, Any], customer_chat_id: Optional[int] = None, exclude: Optional[Set[int]] = None
+    ) -> str:
+        """Misma orden + mismo cliente + mismos excluidos -> misma llave (llamadas repetidas del LLM)."""
+        raw = json.dumps(
+            {"c": customer_chat_id, "o": order, "x": sorted(exclude or ())},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def release_expired_reservations(self) -> int:
+        """Devuelve al pool a los domiciliarios cuya reserva venció sin envío."""
+        released = self.dispatches.release_expired()
+        for disp in released:
+            self.drivers.set_available(disp.driver_chat_id, True)
+        return len(released)
+
+    def assign_driver(
+        self,
+        order: Dict[str, Any],
+        exclude: Optional[Set[int]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
         exclude = exclude or set()
+        self.release_expired_reservations()
+        if idempotency_key:
+            prev = self.dispatches.find_by_key(idempotency_key)
+            if prev is not None:
+                return self._assignment_result(prev, duplicate=True)
+
+        # 1) el disponible más cercano al restaurante (según live location)
+        driver = None
+        distance_km = None
+        origin = self.restaurant_location(order)
+        if origin is not None:
+            found = self.drivers.pick_nearest_available(
+                origin[0], origin[1], exclude_chat_ids=exclude, max_radius_km=self.max_pickup_km
+            )
+            if found is not None:
+                driver, distance_km = found
 
-        driver = self.drivers.pick_available(exclude_chat_ids=exclude)
+        # 2) sin ubicaciones: el primero disponible
+        if driver is None:
+            driver = self.drivers.pick_available(exclude_chat_ids=exclude)
         if not driver:
             return {"ok": False, "error": "No hay domiciliarios disponibles."}
+        return self._reserve(driver, distance_km, order, idempotency_key)
+
+    async def assign_driver_async(
+        self,
+        order: Dict[str, Any],
+        exclude: Optional[Set[int]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Igual que assign_driver, pero en modo batch espera la ventana del matcher para asignar
+        el lote completo de forma óptima. Sin matcher, sin ubicación del restaurante o si el
+        lote no le dejó domiciliario, cae al modo greedy.
+        """
+        origin = self.restaurant_location(order)
+        if self.matcher is None or origin is None:
+            return self.assign_driver(order, exclude, idempotency_key)
+        self.release_expired_reservations()
+        if idempotency_key:
+            prev = self.dispatches.find_by_key(idempotency_key)
+            if prev is not None:
+                return self._assignment_result(prev, duplicate=True)
+        found = await self.matcher.request(origin, exclude)
+        if found is None:
+            return self.assign_driver(order, exclude, idempotency_key)
+        driver, distance_km = found
+        return self._reserve(driver, distance_km, order, idempotency_key)
 
-        dispatch_id = f"disp_{int(time.time())}"
+    def reserve_extra_drivers(self, order: Dict[str, Any], exclude: Set[int], n: int) -> List[Driver]:
+        """Reserva hasta n domiciliarios más (los más cercanos al restaurante) para una oferta broadcast."""
+        out: List[Driver] = []
+        exclude = set(exclude)
+        origin = self.restaurant_location(order)
+        while len(out) < n:
+            driver = None
+            if origin is not None:
+                found = self.drivers.pick_nearest_available(
+                    origin[0], origin[1], exclude_chat_ids=exclude, max_radius_km=self.max_pickup_km
+                )
+                if found is not None:
+                    driver = found[0]
+            if driver is None:
+                driver = self.drivers.pick_available(exclude_chat_ids=exclude)
+            if driver is None:
+                break
+            out.append(driver)
+            exclude.add(int(driver.chat_id))
+        return out
 
-        return {
+    def _reserve(
+        self,
+        driver: Driver,
+        distance_km: Optional[float],
+        order: Dict[str, Any],
+        idempotency_key: Optional[str],
+    ) -> Dict[str, Any]:
+        disp, created = self.dispatches.reserve(
+            Dispatch(
+                dispatch_id=self.dispatches.new_id(),
+                driver_chat_id=int(driver.chat_id),
+                customer_chat_id=None,
+                order=order,
+                ts=int(time.time()),
+                lease_until=time.time() + self.reservation_lease_s,
+                idempotency_key=idempotency_key,
+            )
+        )
+        if not created:
+            # otra llamada con la misma llave ganó la carrera: soltar el domiciliario elegido
+            self.drivers.set_available(int(driver.chat_id), True)
+            return self._assignment_result(disp, duplicate=True)
+        return self._assignment_result(disp, distance_km=distance_km)
+
+    def _assignment_result(
+        self, disp: Dispatch, distance_km: Optional[float] = None, duplicate: bool = False
+    ) -> Dict[str, Any]:
+        driver = self.drivers.get_by_chat(disp.driver_chat_id)
+        res = {
             "ok": True,
-            "dispatch_id": dispatch_id,
-            "driver_id": driver.driver_id,
-            "driver_name": driver.name,
-            "driver_chat_id": int(driver.chat_id),
+            "dispatch_id": disp.dispatch_id,
+            "driver_id": getattr(driver, "driver_id", ""),
+            "driver_name": getattr(driver, "name", ""),
+            "driver_chat_id": int(disp.driver_chat_id),
         }
+        if distance_km is not None:
+            res["distance_km"] = round(distance_km, 2)
+        if duplicate:
+            res.update(duplicate=True, status=disp.status)
+        return res
 
     def register_dispatch(
         self,
         dispatch_id: str,
         driver_chat_id: int,
-        customer_chat_id: int,
+        customer_chat_id: Optional[int],
         order: Dict[str, Any],
         reassigned_from: Optional[str] = None,
-    ) -> Dispatch:
-        disp = Dispatch(
-            dispatch_id=dispatch_id,
-            driver_chat_id=int(driver_chat_id),
-            customer_chat_id=int(customer_chat_id),
-            order=order,
-            status="sent",
-            ts=int(time.time()),
-            reassigned_from=reassigned_from,
-        )
-        self.dispatches.save(disp)
-        self.dispatches.set_active_for_driver(int(driver_chat_id), dispatch_id)
-        return disp
+    ) -> Tuple[Dispatch, bool]:
+        """
+        reserved -> sent. Retorna (dispatch, created); created=False si ya estaba enviado
+        (llamada repetida: no se debe reenviar el mensaje al domiciliario).
+        Lanza DispatchStateError si la reserva es de otro domiciliario o venció y él ya no está libre.
+        """
+        driver_chat_id = int(driver_chat_id)
+        customer_chat_id = int(customer_chat_id) if customer_chat_id is not None else None
+        for _ in range(2):
+            prev = self.dispatches.get(dispatch_id)
+            reclaimed = False
+            if prev is not None and prev.status == "released":
+                # la reserva venció: solo se puede enviar si el domiciliario sigue libre
+                if prev.driver_chat_id != driver_chat_id or self.drivers.claim(driver_chat_id) is None:
+                    raise DispatchStateError(f"La reserva {dispatch_id} venció; vuelve a llamar assign_driver.")
+                reclaimed = True
+            try:
+                return self.dispatches.mark_sent(
+                    dispatch_id=dispatch_id,
+                    driver_chat_id=driver_chat_id,
+                    customer_chat_id=customer_chat_id,
+                    order=order,
+                    reassigned_from=reassigned_from,
+                    allow_released=reclaimed,
+                )
+            except DispatchStateError:
+                if reclaimed:
+                    self.drivers.set_available(driver_chat_id, True)
+                    raise
+                cur = self.dispatches.get(dispatch_id)
+                if cur is None or cur.status != "released":
+                    raise
+                # el lease venció justo entre la lectura y mark_sent: reintentar re-reservando
+        raise DispatchStateError(f"La reserva {dispatch_id} venció; vuelve a llamar assign_driver.")
+
+    async def dispatch_order_async(
+        self,
+        order: Dict[str, Any],
+        customer_chat_id: Optional[int],
+        exclude: Optional[Set[int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        assign_driver + register_dispatch en un solo paso (tool dispatch_order): reserva al
+        domiciliario, pasa el despacho a "sent" y retorna el mensaje para él. Repetirlo con la
+        misma orden y cliente retorna el mismo despacho con duplicate=true y sin "message",
+        también después del ACEPTO o de COMPLETADO (ver IDEMPOTENT_STATES).
+        """
+        key = self.idempotency_key(order, customer_chat_id, exclude)
+        res = await self.assign_driver_async(order=order, exclude=exclude, idempotency_key=key)
+        if not res.get("ok"):
+            return res
+        try:
+            disp, created = self.register_dispatch(
+                dispatch_id=res["dispatch_id"],
+                driver_chat_id=res["driver_chat_id"],
+                customer_chat_id=customer_chat_id,
+                order=order,
+            )
+        except DispatchStateError as e:
+            return {"ok": False, "dispatch_id": res["dispatch_id"], "error": str(e)}
+
+        out = {
+            "ok": True,
+            "dispatch_id": disp.dispatch_id,
+            "driver_chat_id": int(disp.driver_chat_id),
+            "driver_name": res.get("driver_name", ""),
+        }
+        if not created:
+            out.update(duplicate=True, status=disp.status)
+            return out
+        if res.get("distance_km") is not None:
+            out["distance_km"] = res["distance_km"]
+        out["message"] = self.format_order_message(order)
+        return out
 
     # -------------------------
     # Mensaje para driver (igual a tu script)
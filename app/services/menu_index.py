@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple
+
+
+def norm_key(value: Any) -> str:
+    return str(value).strip().lower()
+
+
+@dataclass(frozen=True)
+class CompiledItem:
+    key: str                                  # nombre original en el MENU
+    price: int
+    bordes: Dict[str, int] = field(default_factory=dict)               # norm -> extra
+    adiciones: Dict[str, Tuple[str, int]] = field(default_factory=dict)  # norm -> (nombre original, extra)
+
+
+@dataclass(frozen=True)
+class CompiledRestaurant:
+    name: str
+    currency: str
+    delivery_fee: int
+    items: Dict[str, CompiledItem]            # norm -> item
+
+
+@dataclass(frozen=True)
+class CompiledMenu:
+    version: int
+    restaurants: Dict[str, CompiledRestaurant]
+
+
+def compile_menu(menu: Dict[str, Any], version: int = 0) -> CompiledMenu:
+    """
+    Indexa el MENU una sola vez por versión: cada línea de pedido se resuelve con
+    lookups O(1) por nombre normalizado (item, borde, adición) en vez de recorrer el menú.
+    Si dos llaves colisionan al normalizar, gana la primera (mismo orden que el recorrido lineal).
+    """
+    restaurants: Dict[str, CompiledRestaurant] = {}
+    for r_name, cfg in menu.items():
+        options_cfg = cfg.get("options", {})
+        items: Dict[str, CompiledItem] = {}
+        for key, item_cfg in cfg.get("items", {}).items():
+            nk = key.lower()
+            if nk in items:
+                continue
+            item_opts = options_cfg.get(key, {})
+
+            bordes: Dict[str, int] = {}
+            for b, extra in (item_opts.get("bordes") or {}).items():
+                bordes.setdefault(norm_key(b), int(extra))
+
+            adiciones: Dict[str, Tuple[str, int]] = {}
+            for a, extra in (item_opts.get("adiciones") or {}).items():
+                adiciones.setdefault(a.lower(), (a, int(extra)))
+
+            items[nk] = CompiledItem(key=key, price=int(item_cfg["price"]), bordes=bordes, adiciones=adiciones)
+
+        restaurants[r_name] = CompiledRestaurant(
+            name=r_name,
+            currency=cfg.get("currency", "COP"),
+            delivery_fee=int(cfg.get("delivery_fee", 0)),
+            items=items,
+        )
+    return CompiledMenu(version=version, restaurants=restaurants)
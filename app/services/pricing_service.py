@@ -1,26 +1,282 @@
 import json
-from typing import Any, Dict, List
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional
 from app.repositories.menu_repo import MenuRepository
+from app.services.menu_index import CompiledMenu, compile_menu, norm_key
+
+
+def compact_quote(result: Dict[str, Any]) -> str:
+    """
+    Cotización en forma tabular para la tool price_order: llaves cortas (sub, dom, total) y
+    detalle_lineas como filas [item, cant, base, extras, unit, linea, opciones] con un solo
+    encabezado, en vez de repetir los nombres de campo en cada línea. Mismos datos que la
+    versión verbosa; los errores van sin cambios.
+    """
+    if not result.get("ok"):
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    rows = []
+    for d in result["detalle_lineas"]:
+        opts = d.get("opciones") or {}
+        chosen = ([opts["bordes"]] if opts.get("bordes") else []) + list(opts.get("adiciones") or [])
+        rows.append([
+            d["item"], d["cantidad"], d["base"], d["extras"], d["unitario"], d["total_linea"], ";".join(chosen)
+        ])
+    compact: Dict[str, Any] = {
+        "ok": True,
+        "r": result["restaurant"],
+        "cur": result["currency"],
+        "sub": result["subtotal"],
+        "dom": result["delivery_fee"],
+        "total": result["total"],
+        "cols": ["item", "cant", "base", "extras", "unit", "linea", "opciones"],
+        "rows": rows,
+    }
+    if result.get("warnings"):
+        compact["warn"] = result["warnings"]
+    return json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+
+
+class _Priced:
+    """Resultado cacheado: dict + JSON serializado una sola vez (para la tool price_order)."""
+
+    __slots__ = ("result", "_json", "_compact")
+
+    def __init__(self, result: Dict[str, Any]):
+        self.result = result
+        self._json: Optional[str] = None
+        self._compact: Optional[str] = None
+
+    @property
+    def json(self) -> str:
+        if self._json is None:
+            self._json = json.dumps(self.result)
+        return self._json
+
+    @property
+    def compact(self) -> str:
+        if self._compact is None:
+            self._compact = compact_quote(self.result)
+        return self._compact
+
+
+# Estados por orden / por línea en BatchQuote
+ORDER_OK = 0
+ORDER_INVALID_JSON = 1
+ORDER_UNKNOWN_RESTAURANT = 2
+ORDER_ERROR = 3
+
+LINE_OK = 0
+LINE_ITEM_NOT_FOUND = 1
+LINE_INVALID_BORDE = 2
+LINE_INVALID_ADICION = 4
+
+
+@dataclass
+class BatchQuote:
+    """
+    Resultado columnar de price_many (arrays compactos en vez de dicts anidados).
+    Por orden i: status, restaurant_idx, subtotal, delivery_fee, total y sus líneas en
+    line_*[line_start[i]:line_start[i + 1]]. status/line_status usan ORDER_*/LINE_* (bitmask).
+    """
+    menu_version: int
+    restaurants: List[str] = field(default_factory=list)
+    items: List[str] = field(default_factory=list)
+
+    status: bytearray = field(default_factory=bytearray)
+    restaurant_idx: array = field(default_factory=lambda: array("l"))
+    subtotal: array = field(default_factory=lambda: array("q"))
+    delivery_fee: array = field(default_factory=lambda: array("q"))
+    total: array = field(default_factory=lambda: array("q"))
+    line_start: array = field(default_factory=lambda: array("q", [0]))
+
+    line_item: array = field(default_factory=lambda: array("l"))
+    line_qty: array = field(default_factory=lambda: array("l"))
+    line_unit: array = field(default_factory=lambda: array("q"))
+    line_total: array = field(default_factory=lambda: array("q"))
+    line_status: bytearray = field(default_factory=bytearray)
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    @property
+    def n_lines(self) -> int:
+        return len(self.line_status)
+
+    def order(self, i: int) -> Dict[str, Any]:
+        """Fila i en forma de dict (para depurar o exportar pocas órdenes)."""
+        a, b = self.line_start[i], self.line_start[i + 1]
+        r = self.restaurant_idx[i]
+        return {
+            "status": self.status[i],
+            "restaurant": self.restaurants[r] if r >= 0 else None,
+            "subtotal": self.subtotal[i],
+            "delivery_fee": self.delivery_fee[i],
+            "total": self.total[i],
+            "lines": [
+                {
+                    "item": self.items[self.line_item[j]] if self.line_item[j] >= 0 else None,
+                    "cantidad": self.line_qty[j],
+                    "unitario": self.line_unit[j],
+                    "total_linea": self.line_total[j],
+                    "status": self.line_status[j],
+                }
+                for j in range(a, b)
+            ],
+        }
+
 
 class PricingService:
-    def __init__(self, menu_repo: MenuRepository):
+    def __init__(self, menu_repo: MenuRepository, cache_size: int = 1024):
         self.menu_repo = menu_repo
+        self._compiled: Optional[CompiledMenu] = None
+
+        # LRU: (versión del menú, orden canónica | texto crudo) -> _Priced
+        # lock: price_order es una tool sync y corre en threads del executor
+        self.cache_size = max(0, int(cache_size))
+        self._cache: "OrderedDict[Hashable, _Priced]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_version: Optional[int] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def compiled(self) -> CompiledMenu:
+        """Índice del menú; se recompila solo cuando cambia menu_repo.version."""
+        c = self._compiled
+        # versión antes que el menú: si cambia en medio, el índice queda con la versión vieja y
+        # se recompila en la siguiente llamada (nunca menú viejo con versión nueva)
+        version = self.menu_repo.version
+        if c is None or c.version != version:
+            c = compile_menu(self.menu_repo.raw(), version=version)
+            self._compiled = c
+        return c
+
+    # -------------------------
+    # Cache de cotizaciones
+    # -------------------------
+    @staticmethod
+    def canonical_key(order: Dict[str, Any]) -> Optional[Hashable]:
+        """
+        Forma canónica (hashable) de la orden: solo los campos que afectan el precio, con
+        nombres/opciones normalizados; el orden de las llaves del JSON no importa.
+        None si la orden no se puede canonicalizar.
+        """
+        try:
+            items = []
+            for it in order.get("items", []):
+                opts = it.get("opciones") or {}
+                adds = opts.get("adiciones") or []
+                if isinstance(adds, str):
+                    adds = [adds]
+                items.append((
+                    (it.get("nombre") or "").strip().lower(),
+                    max(1, int(it.get("cantidad") or 1)),
+                    norm_key(opts["bordes"]) if opts.get("bordes") else None,
+                    tuple(norm_key(a) for a in adds),
+                ))
+            return ((order.get("restaurante") or "").strip(), tuple(items))
+        except Exception:
+            return None
+
+    def _cache_check_version(self, version: int) -> None:
+        with self._cache_lock:
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+
+    def _cache_get(self, key: Hashable) -> Optional[_Priced]:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _cache_put(self, key: Hashable, entry: _Priced) -> None:
+        with self._cache_lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _priced(self, order_json: str | Dict[str, Any]) -> _Priced:
+        if not self.cache_size:
+            try:
+                order = json.loads(order_json) if isinstance(order_json, str) else order_json
+            except Exception as e:
+                return _Priced({"ok": False, "error": "order_json inválido", "detail": str(e)})
+            return _Priced(self._price_order(order))
+
+        version = self.menu_repo.version
+        self._cache_check_version(version)
+
+        # 1) mismo texto exacto -> ni siquiera se parsea el JSON
+        raw_key = (version, "raw", order_json) if isinstance(order_json, str) else None
+        if raw_key is not None:
+            entry = self._cache_get(raw_key)
+            if entry is not None:
+                self.cache_hits += 1
+                return entry
 
-    def price(self, order_json: str | Dict[str, Any]) -> Dict[str, Any]:
         try:
             order = json.loads(order_json) if isinstance(order_json, str) else order_json
         except Exception as e:
-            return {"ok": False, "error": "order_json inválido", "detail": str(e)}
+            return _Priced({"ok": False, "error": "order_json inválido", "detail": str(e)})
+
+        # 2) misma orden canónica
+        canon = self.canonical_key(order)
+        key = (version, canon) if canon is not None else None
+        if key is not None:
+            entry = self._cache_get(key)
+            if entry is not None:
+                self.cache_hits += 1
+                if raw_key is not None:
+                    self._cache_put(raw_key, entry)
+                return entry
+
+        self.cache_misses += 1
+        entry = _Priced(self._price_order(order))
+        if key is not None:
+            self._cache_put(key, entry)
+            if raw_key is not None:
+                self._cache_put(raw_key, entry)
+        return entry
+
+    def cache_stats(self) -> Dict[str, Any]:
+        total = self.cache_hits + self.cache_misses
+        return {
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / total, 4) if total else 0.0,
+        }
 
+    # -------------------------
+    # Cotización
+    # -------------------------
+    def price(self, order_json: str | Dict[str, Any]) -> Dict[str, Any]:
+        """Cotiza la orden (cacheado). El dict retornado es compartido: no mutarlo."""
+        return self._priced(order_json).result
+
+    def price_json(self, order_json: str | Dict[str, Any]) -> str:
+        """Igual que price() pero ya serializado (lo que consume la tool price_order)."""
+        return self._priced(order_json).json
+
+    def price_compact(self, order_json: str | Dict[str, Any]) -> str:
+        """Igual que price_json pero en formato compacto (ver compact_quote)."""
+        return self._priced(order_json).compact
+
+    def _price_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
         restaurant = (order.get("restaurante") or "").strip()
-        menu = self.menu_repo.raw()
+        menu = self.compiled().restaurants
         if restaurant not in menu:
             return {"ok": False, "error": "Restaurante no encontrado", "restaurant": restaurant}
 
         cfg = menu[restaurant]
-        items_cfg = cfg.get("items", {})
-        options_cfg = cfg.get("options", {})
-        delivery_fee = int(cfg.get("delivery_fee", 0))
+        delivery_fee = cfg.delivery_fee
 
         warnings: List[str] = []
         detail: List[Dict[str, Any]] = []
@@ -32,50 +288,36 @@ class PricingService:
             if qty < 1:
                 qty = 1
 
-            found_key = None
-            for k in items_cfg.keys():
-                if k.lower() == name:
-                    found_key = k
-                    break
-
-            if not found_key:
+            item = cfg.items.get(name)
+            if item is None:
                 warnings.append(f"Item no encontrado: {it.get('nombre')}")
                 continue
 
-            base_price = int(items_cfg[found_key]["price"])
+            found_key = item.key
+            base_price = item.price
             line_extra = 0
             chosen_opts = it.get("opciones") or {}
 
-            item_opts = options_cfg.get(found_key, {})
-            bordes_cfg = (item_opts.get("bordes") or {})
             bordes_choice = chosen_opts.get("bordes")
             if bordes_choice:
-                extra = bordes_cfg.get(str(bordes_choice).lower())
-                if extra is None:
-                    extra = bordes_cfg.get(str(bordes_choice))
+                extra = item.bordes.get(norm_key(bordes_choice))
                 if extra is None:
                     warnings.append(f"Opción bordes inválida en {found_key}: {bordes_choice}")
                 else:
-                    line_extra += int(extra)
+                    line_extra += extra
 
-            add_cfg = (item_opts.get("adiciones") or {})
             adds = chosen_opts.get("adiciones") or []
             if isinstance(adds, str):
                 adds = [adds]
 
             adds_ok = []
             for a in adds:
-                a_str = str(a).strip().lower()
-                extra = None
-                for k in add_cfg.keys():
-                    if k.lower() == a_str:
-                        extra = add_cfg[k]
-                        adds_ok.append(k)
-                        break
-                if extra is None:
+                found = item.adiciones.get(str(a).strip().lower())
+                if found is None:
                     warnings.append(f"Adición inválida en {found_key}: {a}")
                 else:
-                    line_extra += int(extra)
+                    adds_ok.append(found[0])
+                    line_extra += found[1]
 
             unit = base_price + line_extra
             line_total = unit * qty
@@ -95,10 +337,149 @@ class PricingService:
         return {
             "ok": True,
             "restaurant": restaurant,
-            "currency": cfg.get("currency", "COP"),
+            "currency": cfg.currency,
             "subtotal": subtotal,
             "delivery_fee": delivery_fee,
             "total": total,
             "detalle_lineas": detail,
             "warnings": warnings,
         }
+
+    # -------------------------
+    # Cotización masiva
+    # -------------------------
+    def price_many(self, orders: Iterable[str | Dict[str, Any]]) -> BatchQuote:
+        """
+        Re-cotiza muchas órdenes en una sola pasada contra el menú compilado, sin el LRU de
+        price() ni dicts por línea. Mismas reglas que price(): ítems desconocidos no suman, opciones
+        inválidas no suman extra (y quedan marcadas en line_status).
+        """
+        compiled = self.compiled()
+        out = BatchQuote(menu_version=compiled.version)
+        restaurants = compiled.restaurants
+        rest_idx: Dict[str, int] = {}
+        item_idx: Dict[int, Dict[str, int]] = {}   # restaurante -> item -> posición en out.items
+
+        # locales para el loop caliente
+        status_append = out.status.append
+        rest_append = out.restaurant_idx.append
+        sub_append = out.subtotal.append
+        fee_append = out.delivery_fee.append
+        total_append = out.total.append
+        start_append = out.line_start.append
+        l_item, l_qty, l_unit, l_total, l_status = (
+            out.line_item, out.line_qty, out.line_unit, out.line_total, out.line_status,
+        )
+        loads = json.loads
+
+        for raw in orders:
+            try:
+                order = loads(raw) if isinstance(raw, str) else raw
+            except Exception:
+                order = None
+            if not isinstance(order, dict):
+                status_append(ORDER_INVALID_JSON)
+                rest_append(-1)
+                sub_append(0)
+                fee_append(0)
+                total_append(0)
+                start_append(len(l_status))
+                continue
+
+            restaurant = (order.get("restaurante") or "").strip()
+            cfg = restaurants.get(restaurant)
+            if cfg is None:
+                status_append(ORDER_UNKNOWN_RESTAURANT)
+                rest_append(-1)
+                sub_append(0)
+                fee_append(0)
+                total_append(0)
+                start_append(len(l_status))
+                continue
+
+            r = rest_idx.get(restaurant)
+            if r is None:
+                r = rest_idx[restaurant] = len(out.restaurants)
+                out.restaurants.append(restaurant)
+
+            first_line = len(l_status)
+            subtotal = 0
+            order_status = ORDER_OK
+            cfg_items = cfg.items
+            item_pos = item_idx.setdefault(r, {})
+            try:
+                for it in order.get("items", []):
+                    qty = int(it.get("cantidad") or 1)
+                    if qty < 1:
+                        qty = 1
+                    item = cfg_items.get((it.get("nombre") or "").strip().lower())
+                    if item is None:
+                        l_item.append(-1)
+                        l_qty.append(qty)
+                        l_unit.append(0)
+                        l_total.append(0)
+                        l_status.append(LINE_ITEM_NOT_FOUND)
+                        continue
+
+                    flags = LINE_OK
+                    unit = item.price
+                    opts = it.get("opciones")
+                    if opts:
+                        b = opts.get("bordes")
+                        if b:
+                            extra = item.bordes.get(str(b).strip().lower())
+                            if extra is None:
+                                flags |= LINE_INVALID_BORDE
+                            else:
+                                unit += extra
+                        adds = opts.get("adiciones")
+                        if adds:
+                            if isinstance(adds, str):
+                                adds = (adds,)
+                            item_adds = item.adiciones
+                            for a in adds:
+                                found = item_adds.get(str(a).strip().lower())
+                                if found is None:
+                                    flags |= LINE_INVALID_ADICION
+                                else:
+                                    unit += found[1]
+
+                    ii = item_pos.get(item.key)
+                    if ii is None:
+                        ii = item_pos[item.key] = len(out.items)
+                        out.items.append(item.key)
+
+                    line_total = unit * qty
+                    subtotal += line_total
+                    l_item.append(ii)
+                    l_qty.append(qty)
+                    l_unit.append(unit)
+                    l_total.append(line_total)
+                    l_status.append(flags)
+            except Exception:
+                # orden malformada (p.ej. cantidad no numérica): se descartan sus líneas
+                for col in (l_item, l_qty, l_unit, l_total, l_status):
+                    del col[first_line:]
+                order_status = ORDER_ERROR
+                subtotal = 0
+
+            fee = cfg.delivery_fee if order_status == ORDER_OK else 0
+            status_append(order_status)
+            rest_append(r)
+            sub_append(subtotal)
+            fee_append(fee)
+            total_append(subtotal + fee)
+            start_append(len(l_status))
+
+        return out
+
+    def price_stream(
+        self, orders: Iterable[str | Dict[str, Any]], chunk_size: int = 50_000
+    ) -> Iterator[BatchQuote]:
+        """price_many por bloques, para streams que no caben completos en memoria."""
+        it = iter(orders)
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                return
+            yield self.price_many(chunk)
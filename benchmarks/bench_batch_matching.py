@@ -0,0 +1,110 @@
+"""
+Benchmark de emparejamiento pedidos -> domiciliarios: greedy vs batch (por ventanas).
+
+Simula ventanas de pico de almuerzo: en cada ventana llegan N pedidos de restaurantes
+concentrados en algunas zonas y hay M domiciliarios disponibles repartidos por la ciudad.
+- greedy: cada pedido, en orden de llegada, toma el disponible más cercano
+- batch:  BatchMatcher.plan sobre todo el lote + claim; los que queden sin par caen a greedy
+Compara la distancia total de recogida (km) y el tiempo de plan por ventana.
+
+Uso:
+    python -m benchmarks.bench_batch_matching --windows 50 --orders 30 --drivers 45
+"""
+import argparse
+import random
+import statistics
+
+from app.domain.models import Driver
+from app.repositories.driver_repo import DriverRepository
+from app.services.batch_matcher import BatchMatcher
+
+# bbox aproximado del Valle de Aburrá + Oriente antioqueño
+LAT_MIN, LAT_MAX = 6.10, 6.35
+LNG_MIN, LNG_MAX = -75.65, -75.30
+
+
+def build_window(rnd: random.Random, restaurants, orders: int, drivers: int):
+    origins = [rnd.choice(restaurants) for _ in range(orders)]
+    fleet = [
+        (10_000 + i, rnd.uniform(LAT_MIN, LAT_MAX), rnd.uniform(LNG_MIN, LNG_MAX))
+        for i in range(drivers)
+    ]
+    return origins, fleet
+
+
+def build_repo(fleet) -> DriverRepository:
+    repo = DriverRepository(
+        [Driver(driver_id=f"d{cid}", name=f"Driver {cid}", chat_id=cid, is_available=True) for cid, _, _ in fleet]
+    )
+    for cid, lat, lng in fleet:
+        repo.update_location(cid, lat, lng)
+    return repo
+
+
+def run_greedy(repo: DriverRepository, origins, max_km: float):
+    km, assigned = 0.0, 0
+    for lat, lng in origins:
+        found = repo.pick_nearest_available(lat, lng, max_radius_km=max_km)
+        if found is not None:
+            km += found[1]
+            assigned += 1
+    return km, assigned
+
+
+def run_batch(repo: DriverRepository, origins, max_km: float, k: int):
+    matcher = BatchMatcher(repo, candidates_k=k, max_pickup_km=max_km)
+    plan = matcher.plan([(o, set()) for o in origins])
+    km, assigned = 0.0, 0
+    leftovers = []
+    for origin, choice in zip(origins, plan):
+        if choice is not None and repo.claim(choice[0]) is not None:
+            km += choice[1]
+            assigned += 1
+        else:
+            leftovers.append(origin)
+    # igual que DispatchService.assign_driver_async: sin par en el lote -> greedy
+    g_km, g_assigned = run_greedy(repo, leftovers, max_km)
+    return km + g_km, assigned + g_assigned, matcher.last_plan_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--windows", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=30, help="pedidos por ventana")
+    parser.add_argument("--drivers", type=int, default=45, help="disponibles por ventana")
+    parser.add_argument("--restaurants", type=int, default=12)
+    parser.add_argument("--k", type=int, default=16, help="candidatos por pedido (BatchMatcher)")
+    parser.add_argument(
+        "--max-km", type=float, default=50.0,
+        help="radio de recogida; por defecto cubre todo el bbox para que ambos modos asignen lo mismo",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    restaurants = [
+        (rnd.uniform(LAT_MIN, LAT_MAX), rnd.uniform(LNG_MIN, LNG_MAX)) for _ in range(args.restaurants)
+    ]
+
+    g_total = b_total = 0.0
+    g_assigned = b_assigned = 0
+    plan_ms = []
+    for _ in range(args.windows):
+        origins, fleet = build_window(rnd, restaurants, args.orders, args.drivers)
+        km, n = run_greedy(build_repo(fleet), origins, args.max_km)
+        g_total += km
+        g_assigned += n
+        km, n, ms = run_batch(build_repo(fleet), origins, args.max_km, args.k)
+        b_total += km
+        b_assigned += n
+        plan_ms.append(ms)
+
+    print(f"ventanas={args.windows} pedidos/ventana={args.orders} disponibles/ventana={args.drivers} k={args.k}")
+    print(f"greedy: asignados={g_assigned} km_total={g_total:,.1f} km/pedido={g_total / max(g_assigned, 1):.2f}")
+    print(f"batch:  asignados={b_assigned} km_total={b_total:,.1f} km/pedido={b_total / max(b_assigned, 1):.2f}")
+    print(f"ahorro: {100 * (1 - b_total / g_total):.1f}% km de recogida")
+    print(f"plan por ventana: p50={statistics.median(plan_ms):.1f}ms max={max(plan_ms):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark de memoria del checkpointer de conversaciones.
+
+Simula N turnos repartidos entre muchos chats (get_tuple + put por turno, como hace
+el agente) y reporta RSS y tamaño del checkpointer cada cierto número de turnos.
+
+Uso:
+    python -m benchmarks.bench_checkpointer --turns 1000000 --chats 200000
+    python -m benchmarks.bench_checkpointer --saver memory --turns 200000
+"""
+import argparse
+import random
+import resource
+import time
+from datetime import datetime, timezone
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.llm.checkpointer import BoundedMemorySaver
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def simulate_turn(saver, thread_id: str, turn: int, history: int) -> None:
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    prev = saver.get_tuple(config)
+    if prev is not None:
+        messages = list(prev.checkpoint["channel_values"].get("messages", []))[-history:]
+        checkpoint = dict(prev.checkpoint)
+        config = prev.config
+    else:
+        messages = []
+        checkpoint = empty_checkpoint()
+
+    messages.append(f"turno {turn}: quiero una pizza mediana con borde de queso")
+    messages.append("Claro, ¿a qué dirección la enviamos?")
+
+    version = saver.get_next_version(checkpoint["channel_versions"].get("messages"), None)
+    checkpoint = {
+        **checkpoint,
+        "id": str(uuid6(clock_seq=turn)),
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "channel_values": {"messages": messages},
+        "channel_versions": {**checkpoint["channel_versions"], "messages": version},
+    }
+    saver.put(config, checkpoint, {"source": "loop", "step": turn}, {"messages": version})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--saver", choices=["bounded", "memory"], default="bounded")
+    parser.add_argument("--turns", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=200_000)
+    parser.add_argument("--max-threads", type=int, default=5000)
+    parser.add_argument("--history", type=int, default=20, help="mensajes que se conservan por turno")
+    parser.add_argument("--report-every", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    if args.saver == "bounded":
+        saver = BoundedMemorySaver(max_threads=args.max_threads, ttl_seconds=0)
+    else:
+        saver = MemorySaver()
+
+    base = rss_mb()
+    t0 = time.perf_counter()
+    print(f"saver={args.saver} turns={args.turns} chats={args.chats} rss_inicial={base:.1f}MB")
+    for turn in range(1, args.turns + 1):
+        # mitad de los turnos en un grupo pequeño de chats activos, el resto esporádicos
+        chat = rnd.randrange(2000) if rnd.random() < 0.5 else rnd.randrange(args.chats)
+        simulate_turn(saver, str(chat), turn, args.history)
+
+        if turn % args.report_every == 0:
+            elapsed = time.perf_counter() - t0
+            extra = ""
+            if isinstance(saver, BoundedMemorySaver):
+                st = saver.stats()
+                extra = f" threads={st['threads']} blobs={st['blobs']} evicted_lru={st['evicted_lru']}"
+            else:
+                extra = f" threads={len(saver.storage)} blobs={len(saver.blobs)}"
+            print(
+                f"turn={turn:>9} rss={rss_mb():8.1f}MB (+{rss_mb() - base:7.1f})"
+                f" {turn / elapsed:8.0f} turnos/s{extra}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Benchmark de cold start: tiempo hasta el primer update atendido.
+
+Levanta un servidor falso (Bot API de Telegram + API de OpenAI) y arranca la app real con
+uvicorn en un subproceso, con los secretos por variables de entorno. Desde el spawn del
+proceso mide:
+- webhook listo: primer POST /telegram aceptado
+- primer update atendido: llega el sendMessage de respuesta a "menú" (fast path, sin LLM)
+- primera respuesta del LLM: llega el sendMessage de un mensaje que pasa por el agente
+Al final imprime el perfil de arranque (/health -> startup) de la última corrida.
+
+Uso:
+    python -m benchmarks.bench_cold_start --runs 3
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+CUSTOMER_CHAT_ID = 5550001
+
+
+class FakeApis(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    sent = []  # (monotonic, chat_id, text)
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _params(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        if "json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(raw or "{}")
+        return {k: v[0] for k, v in parse_qs(raw).items()}
+
+    def do_GET(self):
+        if self.path.endswith("/models"):
+            return self._reply({"object": "list", "data": []})
+        self._reply({"ok": False}, 404)
+
+    def do_POST(self):
+        params = self._params()
+        if self.path.endswith("/chat/completions"):
+            return self._reply({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": params.get("model", "fake"),
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "¡Hola! ¿De qué restaurante quieres pedir?"},
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getMe":
+            return self._reply({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "Domiflash", "username": "domiflash_bot",
+                "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False,
+            }})
+        if method == "sendMessage":
+            chat_id = int(params["chat_id"])
+            with self.lock:
+                self.sent.append((time.monotonic(), chat_id, params.get("text", "")))
+            return self._reply({"ok": True, "result": {
+                "message_id": len(self.sent), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", ""),
+            }})
+        # setWebhook, sendChatAction, deleteWebhook, ...
+        self._reply({"ok": True, "result": True})
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def update_payload(update_id: int, text: str) -> bytes:
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "text": text,
+            "chat": {"id": CUSTOMER_CHAT_ID, "type": "private"},
+            "from": {"id": CUSTOMER_CHAT_ID, "is_bot": False, "first_name": "Cliente"},
+        },
+    }).encode()
+
+
+def post(url: str, data: bytes, timeout: float = 30.0) -> int:
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return r.status
+
+
+def wait_reply(after_index: int, deadline: float) -> float:
+    while time.monotonic() < deadline:
+        with FakeApis.lock:
+            for ts, chat_id, _ in FakeApis.sent[after_index:]:
+                if chat_id == CUSTOMER_CHAT_ID:
+                    return ts
+        time.sleep(0.002)
+    raise TimeoutError("sin respuesta")
+
+
+def one_run(fake_url: str, timeout_s: float):
+    port = free_port()
+    app_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": "123456:FAKE",
+        "TELEGRAM_WEBHOOK_URL": app_url,
+        "TELEGRAM_API_BASE_URL": f"{fake_url}/bot",
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "OFFER_TIMEOUTS_PATH": os.path.join(tempfile.mkdtemp(), "offers.json"),
+        "HTTP_LOG_REQUESTS": "0",
+    }
+    FakeApis.sent.clear()
+    t0 = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = t0 + timeout_s
+        # 1) webhook listo (uvicorn solo acepta conexiones cuando terminó el startup)
+        while True:
+            try:
+                if post(f"{app_url}/telegram", update_payload(1, "menú")) == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise TimeoutError("la app no arrancó")
+                time.sleep(0.01)
+        t_ready = time.monotonic()
+        t_first = wait_reply(0, deadline)
+
+        # 2) mensaje que necesita al agente (espera el build en background si aún no terminó)
+        index = len(FakeApis.sent)
+        post(f"{app_url}/telegram", update_payload(2, "hola, quiero hacer un pedido"))
+        t_llm = wait_reply(index, deadline)
+
+        with urllib.request.urlopen(f"{app_url}/health", timeout=10) as r:
+            startup = json.loads(r.read())["startup"]
+        return t_ready - t0, t_first - t0, t_llm - t0, startup
+    finally:
+        proc.terminate()
+        proc.wait(timeout=20)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApis)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake_url = f"http://127.0.0.1:{server.server_port}"
+
+    ready, first, llm = [], [], []
+    startup = None
+    for i in range(args.runs):
+        r, f, l, startup = one_run(fake_url, args.timeout)
+        ready.append(r)
+        first.append(f)
+        llm.append(l)
+        print(f"run {i + 1}: webhook listo={r * 1000:.0f}ms primer update={f * 1000:.0f}ms primera respuesta LLM={l * 1000:.0f}ms")
+    server.shutdown()
+
+    print(
+        f"mediana: webhook listo={statistics.median(ready) * 1000:.0f}ms "
+        f"primer update atendido={statistics.median(first) * 1000:.0f}ms "
+        f"primera respuesta LLM={statistics.median(llm) * 1000:.0f}ms"
+    )
+    print("perfil de arranque (última corrida):")
+    if startup.get("process_before_app_ms") is not None:
+        print(f"  {'proceso -> import app.main':<34} {startup['process_before_app_ms']:>8.0f}ms")
+    for p in startup["phases"]:
+        print(f"  {p['name']:<34} {p['ms']:>8.0f}ms  (+{p['start_ms']:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark de latencia confirmación -> domiciliario notificado: assign_driver +
+send_order_to_driver (dos llamadas a tools, tres al LLM) vs dispatch_order (una tool, dos al LLM).
+
+El agente real (build_agent + TelegramRouter) corre contra un OpenAI falso que tarda --llm-ms
+por llamada y, cuando el cliente confirma, pide las tools según la variante. Un bot falso
+registra cuándo llega la oferta al domiciliario y cuándo la respuesta al cliente. Se mide desde
+que llega el "sí, confirmo" del cliente.
+
+Uso:
+    python -m benchmarks.bench_dispatch_tool --orders 20 --llm-ms 800
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from app.adapters.telegram_client import TelegramClient
+from app.application.telegram_router import TelegramRouter
+from app.domain.models import Driver
+from app.llm.agent_factory import build_agent
+from app.llm.tools import build_tools
+from app.repositories.dispatch_repo import DispatchRepository
+from app.repositories.driver_repo import DriverRepository
+from app.repositories.menu_repo import MenuRepository
+from app.services.dispatch_service import DispatchService
+from app.services.pricing_service import PricingService
+
+CONFIRM = "sí, confirmo el pedido"
+DRIVER_BASE = 90_000
+
+
+def order_for(n: int) -> dict:
+    return {
+        "restaurante": "Pizzeria Orientini - Marinilla", "cliente": f"Cliente {n}",
+        "direccion": f"Calle {n} # 1-{n}, Marinilla", "telefono": "3001234567", "medio_pago": "efectivo",
+        "items": [{"nombre": "pizza mediana", "cantidad": 1}],
+    }
+
+
+def make_handler(llm_ms: float):
+    class FakeOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        one_step = True
+        calls = 0
+        lock = threading.Lock()
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            with self.lock:
+                type(self).calls += 1
+                n = type(self).calls
+            time.sleep(llm_ms / 1000)
+
+            messages = body.get("messages") or [{}]
+            last = messages[-1]
+            call = None
+            if last.get("role") == "user" and last.get("content") == CONFIRM:
+                order = json.dumps(order_for(len(messages)))
+                call = ("dispatch_order" if self.one_step else "assign_driver", {"order_json": order})
+            elif last.get("role") == "tool" and not self.one_step:
+                payload = json.loads(last.get("content") or "{}")
+                if payload.get("ok") and "message" not in payload and "duplicate" not in payload:
+                    order = json.loads(messages[-2]["tool_calls"][0]["function"]["arguments"])["order_json"]
+                    call = ("send_order_to_driver", {
+                        "driver_chat_id": payload["driver_chat_id"], "dispatch_id": payload["dispatch_id"],
+                        "order_json": order,
+                    })
+            if call:
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": f"call_{n}", "type": "function",
+                    "function": {"name": call[0], "arguments": json.dumps(call[1])},
+                }]}
+            else:
+                message = {"role": "assistant", "content": "¡Listo! Tu pedido va en camino."}
+            out = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+    return FakeOpenAI
+
+
+class FakeBot:
+    def __init__(self):
+        self.times = {}  # chat_id -> instante del primer mensaje recibido
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.times.setdefault(int(chat_id), time.perf_counter())
+        return SimpleNamespace(message_id=1)
+
+    async def send_chat_action(self, chat_id, action):
+        pass
+
+
+async def run(one_step: bool, orders: int, handler) -> dict:
+    handler.one_step = one_step
+    handler.calls = 0
+    menu_repo = MenuRepository()
+    drivers = DriverRepository([Driver(f"d{i}", f"Driver {i}", DRIVER_BASE + i) for i in range(orders)])
+    dispatches = DispatchRepository()
+    dispatch_service = DispatchService(drivers, dispatches)
+    tools = build_tools(menu_repo, PricingService(menu_repo), dispatch_service)
+    agent = build_agent(tools=tools, model="fake-model", temperature=0)
+    bot = FakeBot()
+    tg = TelegramClient()
+    tg.set_bot(bot)
+    router = TelegramRouter(
+        tg_client=tg, drivers=drivers, dispatches=dispatches, dispatch_service=dispatch_service, agent=agent,
+    )
+
+    notified, replied = [], []
+    for n in range(orders):
+        chat_id = 5_550_000 + n
+        update = SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), message=SimpleNamespace(text=CONFIRM))
+        t0 = time.perf_counter()
+        await router._handle_text(update, None)
+        disp = next(d for d in dispatches._dispatches.values() if d.customer_chat_id == chat_id)
+        notified.append((bot.times[disp.driver_chat_id] - t0) * 1000)
+        replied.append((bot.times[chat_id] - t0) * 1000)
+    return {
+        "notified_p50": statistics.median(notified),
+        "replied_p50": statistics.median(replied),
+        "llm_calls": handler.calls / orders,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--llm-ms", type=float, default=800.0)
+    args = parser.parse_args()
+
+    handler = make_handler(args.llm_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    async def both():
+        return [await run(one_step, args.orders, handler) for one_step in (False, True)]
+
+    for label, r in zip(("assign + send_order", "dispatch_order"), asyncio.run(both())):
+        print(
+            f"{label:<19}: domiciliario notificado p50={r['notified_p50']:,.0f}ms "
+            f"respuesta al cliente p50={r['replied_p50']:,.0f}ms llamadas LLM por pedido={r['llm_calls']:.0f}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark del índice espacial de domiciliarios (GeoGrid + DriverRepository).
+
+Simula una flota moviéndose por la ciudad (live locations) y mide:
+- actualizaciones de ubicación por segundo
+- latencia de pick_nearest_available mientras llegan actualizaciones
+
+Uso:
+    python -m benchmarks.bench_geo --drivers 5000 --updates 500000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.domain.models import Driver
+from app.repositories.driver_repo import DriverRepository
+from app.repositories.geo_index import distance_km
+
+# bbox aproximado del Valle de Aburrá + Oriente antioqueño
+LAT_MIN, LAT_MAX = 6.10, 6.35
+LNG_MIN, LNG_MAX = -75.65, -75.30
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drivers", type=int, default=5000)
+    parser.add_argument("--updates", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--available", type=float, default=0.3, help="fracción de la flota disponible")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    drivers = [
+        Driver(driver_id=f"d{i}", name=f"Driver {i}", chat_id=10_000 + i, is_available=rnd.random() < args.available)
+        for i in range(args.drivers)
+    ]
+    repo = DriverRepository(drivers)
+    pos = {}
+    for d in drivers:
+        pos[d.chat_id] = (rnd.uniform(LAT_MIN, LAT_MAX), rnd.uniform(LNG_MIN, LNG_MAX))
+        repo.update_location(d.chat_id, *pos[d.chat_id])
+
+    # 1) ráfaga de actualizaciones (movimientos cortos, ~50 m)
+    ids = [d.chat_id for d in drivers]
+    t0 = time.perf_counter()
+    for _ in range(args.updates):
+        cid = ids[rnd.randrange(len(ids))]
+        lat, lng = pos[cid]
+        lat += rnd.uniform(-0.0005, 0.0005)
+        lng += rnd.uniform(-0.0005, 0.0005)
+        pos[cid] = (lat, lng)
+        repo.update_location(cid, lat, lng)
+    upd_s = time.perf_counter() - t0
+
+    # 2) consultas intercaladas con actualizaciones; el driver se libera después de cada pick
+    lat_us = []
+    checked = 0
+    for q in range(args.queries):
+        for _ in range(20):
+            cid = ids[rnd.randrange(len(ids))]
+            lat, lng = pos[cid]
+            repo.update_location(cid, lat + rnd.uniform(-0.0005, 0.0005), lng + rnd.uniform(-0.0005, 0.0005))
+        o_lat, o_lng = rnd.uniform(LAT_MIN, LAT_MAX), rnd.uniform(LNG_MIN, LNG_MAX)
+        t0 = time.perf_counter()
+        found = repo.pick_nearest_available(o_lat, o_lng)
+        lat_us.append((time.perf_counter() - t0) * 1e6)
+        if found is None:
+            continue
+        driver, km = found
+        if q < 200:
+            # verificación contra fuerza bruta
+            best = min(
+                distance_km(o_lat, o_lng, *repo.locations.get(d.chat_id)[:2])
+                for d in drivers
+                if d.is_available or d.chat_id == driver.chat_id
+            )
+            assert abs(best - km) < 1e-9, (best, km)
+            checked += 1
+        repo.set_available(driver.chat_id, True)
+
+    lat_us.sort()
+    print(f"flota={args.drivers} disponibles~{args.available:.0%}")
+    print(f"updates: {args.updates / upd_s:,.0f} /s")
+    print(
+        f"pick_nearest_available: p50={statistics.median(lat_us):.0f}us "
+        f"p99={lat_us[int(len(lat_us) * 0.99)]:.0f}us max={lat_us[-1]:.0f}us "
+        f"(verificadas vs fuerza bruta: {checked})"
+    )
+
+
+if __name__ == "__main__":
+    main()
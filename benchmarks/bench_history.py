@@ -0,0 +1,92 @@
+"""
+Benchmark de tokens de prompt por turno en conversaciones largas.
+
+Simula una conversación con llamadas a get_menu / price_order y compara los tokens
+(estimados) que recibe el modelo en cada llamada con historial completo vs HistoryTrimmer.
+
+Uso:
+    python -m benchmarks.bench_history --turns 40
+"""
+import argparse
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.domain.menu_data import MENU
+from app.llm.history import HistoryTrimmer, count_tokens
+from app.repositories.menu_repo import MenuRepository
+from app.services.pricing_service import PricingService
+
+SYSTEM_PROMPT = "Eres Domiflash, agente de domicilios. " * 60  # tamaño similar al prompt real
+
+RESTAURANT = "Pizzeria Orientini - Marinilla"
+
+
+def build_turn(turn: int, chat_id: int, pricing: PricingService, menu_repo: MenuRepository):
+    """Mensajes de un turno: (pre, tool_call, tool_result, respuesta)."""
+    order = {
+        "restaurante": RESTAURANT,
+        "cliente": "Ana Gómez",
+        "direccion": "Calle 30 # 31-12, Marinilla",
+        "telefono": "3001234567",
+        "medio_pago": "efectivo",
+        "items": [
+            {"nombre": "pizza mediana", "cantidad": 1 + turn % 3, "opciones": {"bordes": "queso", "adiciones": ["pepperoni"]}},
+            {"nombre": "gaseosa 1.5l", "cantidad": 1},
+        ],
+    }
+    pre = [
+        SystemMessage(content=f"customer_chat_id={chat_id} (usa este valor exacto cuando llames herramientas).", id=f"s{turn}"),
+        HumanMessage(content=f"Mensaje {turn}: mejor cambia la cantidad de pizzas a {1 + turn % 3}", id=f"h{turn}"),
+    ]
+    if turn % 2:
+        call = {"name": "price_order", "args": {"order_json": json.dumps(order, ensure_ascii=False)}, "id": f"c{turn}"}
+        result = json.dumps(pricing.price(order))
+    else:
+        call = {"name": "get_menu", "args": {"restaurant": RESTAURANT}, "id": f"c{turn}"}
+        result = json.dumps(menu_repo.get_menu(RESTAURANT))
+    tool_call = AIMessage(content="", tool_calls=[call], id=f"a{turn}")
+    tool_result = ToolMessage(content=result, tool_call_id=call["id"], id=f"t{turn}")
+    answer = AIMessage(content="Listo, este es el resumen de tu pedido. ¿Confirmas el pedido?", id=f"r{turn}")
+    return pre, tool_call, tool_result, answer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--max-turns", type=int, default=6)
+    parser.add_argument("--max-tokens", type=int, default=2500)
+    args = parser.parse_args()
+
+    menu_repo = MenuRepository(MENU)
+    pricing = PricingService(menu_repo)
+    trimmer = HistoryTrimmer(SYSTEM_PROMPT, max_turns=args.max_turns, max_tokens=args.max_tokens)
+    system = SystemMessage(content=SYSTEM_PROMPT)
+    config = {"configurable": {"thread_id": "bench"}}
+
+    history = []
+    total_full = total_trim = 0
+    print(f"{'turno':>5} {'full':>8} {'trimmed':>8}")
+    for turn in range(1, args.turns + 1):
+        pre, tool_call, tool_result, answer = build_turn(turn, 1000, pricing, menu_repo)
+        full_turn = trim_turn = 0
+
+        # 1ra llamada al modelo (decide tool call) y 2da (respuesta final)
+        history.extend(pre)
+        full_turn += count_tokens([system] + history)
+        trim_turn += count_tokens(trimmer({"messages": history}, config))
+        history.extend([tool_call, tool_result])
+        full_turn += count_tokens([system] + history)
+        trim_turn += count_tokens(trimmer({"messages": history}, config))
+        history.append(answer)
+
+        total_full += full_turn
+        total_trim += trim_turn
+        if turn in (1, 2, 5) or turn % 10 == 0:
+            print(f"{turn:>5} {full_turn:>8} {trim_turn:>8}")
+
+    print(f"total {total_full:>8} {total_trim:>8}  ({100 * (1 - total_trim / total_full):.0f}% menos)")
+
+
+if __name__ == "__main__":
+    main()
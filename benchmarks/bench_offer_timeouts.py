@@ -0,0 +1,96 @@
+"""
+Benchmark de OfferTimeouts con miles de ofertas pendientes.
+
+- arm()/cancel() por segundo con N ofertas vivas (la mayoría se cancela: el domiciliario responde)
+- retraso de disparo (deadline -> on_expire) de las que sí vencen
+- costo de persistir el estado completo (lo que se hace como máximo cada flush_interval_s)
+
+Uso:
+    python -m benchmarks.bench_offer_timeouts --offers 20000 --cancel 0.9
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.application.offer_timeouts import OfferTimeouts
+
+
+async def run(args) -> None:
+    rnd = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(), "offers.json")
+    timeouts = OfferTimeouts(path=path, flush_interval_s=1.0)
+
+    lags = []
+
+    async def on_expire(offer):
+        lags.append(time.time() - offer["deadline"])
+
+    await timeouts.start(on_expire)
+    order = {"restaurante": "Pizzeria Orientini - Marinilla", "items": [{"nombre": "pizza mediana", "cantidad": 2}]}
+
+    # 1) armar N ofertas con deadlines repartidos en la ventana
+    t0 = time.perf_counter()
+    deadlines = {}
+    for i in range(args.offers):
+        timeout_s = rnd.uniform(0.5, args.window)
+        deadlines[f"disp_{i}"] = time.time() + timeout_s
+        timeouts.arm(
+            f"disp_{i}", timeout_s,
+            {"driver_chat_id": i, "customer_chat_id": 1, "order": order, "deadline": deadlines[f"disp_{i}"]},
+        )
+    arm_s = time.perf_counter() - t0
+
+    # 2) cancelar la mayoría
+    ids = list(deadlines)
+    rnd.shuffle(ids)
+    to_cancel = ids[: int(len(ids) * args.cancel)]
+    t0 = time.perf_counter()
+    for dispatch_id in to_cancel:
+        timeouts.cancel(dispatch_id)
+    cancel_s = time.perf_counter() - t0
+    heap_after = timeouts.stats()["heap"]
+
+    # 3) persistencia: snapshot (en el loop) + escritura (en un thread)
+    t0 = time.perf_counter()
+    data = timeouts._snapshot()
+    snapshot_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    timeouts._write(data)
+    save_ms = (time.perf_counter() - t0) * 1000
+    size_kb = os.path.getsize(path) / 1024
+
+    expected = args.offers - len(to_cancel)
+    while len(lags) < expected:
+        await asyncio.sleep(0.05)
+    await timeouts.stop()
+
+    lags_ms = sorted(x * 1000 for x in lags)
+    print(f"ofertas={args.offers} canceladas={len(to_cancel)} vencidas={len(lags)}")
+    print(f"arm:    {args.offers / arm_s:,.0f}/s")
+    print(f"cancel: {len(to_cancel) / cancel_s:,.0f}/s (heap tras compactar={heap_after})")
+    print(
+        f"save:   snapshot={snapshot_ms:.1f}ms (bloquea el loop) write={save_ms:.1f}ms (thread) "
+        f"{size_kb:,.0f} KB con {expected} pendientes"
+    )
+    print(
+        f"lag de disparo: p50={statistics.median(lags_ms):.1f}ms "
+        f"p99={lags_ms[int(len(lags_ms) * 0.99) - 1]:.1f}ms max={lags_ms[-1]:.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=20_000)
+    parser.add_argument("--cancel", type=float, default=0.9, help="fracción que responde antes del timeout")
+    parser.add_argument("--window", type=float, default=5.0, help="deadlines repartidos en [0.5, window] s")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark de PricingService.price_many (re-cotización masiva).
+
+Genera N líneas de pedido sobre un catálogo sintético, verifica que los totales
+coincidan con price() y mide líneas por segundo. Para comparar, price() se llama
+orden por orden conservando los resultados (como lo haría una re-cotización real).
+
+Uso:
+    python -m benchmarks.bench_price_many --lines 1000000
+"""
+import argparse
+import random
+import time
+
+from app.repositories.menu_repo import MenuRepository
+from app.services.pricing_service import PricingService
+
+from benchmarks.bench_pricing import build_menu, build_orders
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--lines-per-order", type=int, default=4)
+    parser.add_argument("--restaurants", type=int, default=20)
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--adiciones", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    menu = build_menu(args.restaurants, args.items, args.adiciones)
+    n_orders = args.lines // args.lines_per_order
+    orders = build_orders(rnd, menu, n_orders, args.lines_per_order, args.items, args.adiciones)
+    service = PricingService(MenuRepository(menu), cache_size=0)
+    service.compiled()
+
+    t0 = time.perf_counter()
+    batch = service.price_many(orders)
+    elapsed = time.perf_counter() - t0
+
+    for i in range(0, len(orders), max(1, len(orders) // 500)):
+        assert batch.total[i] == service.price(orders[i])["total"], i
+
+    t0 = time.perf_counter()
+    results = [service.price(o) for o in orders]
+    single = time.perf_counter() - t0
+    del results
+
+    print(f"órdenes={len(batch)} líneas={batch.n_lines}")
+    print(f"price_many: {elapsed:6.2f} s  ({batch.n_lines / elapsed:,.0f} líneas/s)")
+    print(f"price():    {single:6.2f} s  ({batch.n_lines / single:,.0f} líneas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark de PricingService.price: índice compilado vs recorrido lineal original,
+y cache LRU de cotizaciones para órdenes repetidas (mismo JSON / misma orden canónica).
+
+Genera un catálogo sintético (cientos de items por restaurante) y órdenes aleatorias,
+verifica que ambos resultados coincidan y compara el tiempo por orden.
+
+Uso:
+    python -m benchmarks.bench_pricing --items 300 --orders 20000
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from app.repositories.menu_repo import MenuRepository
+from app.services.pricing_service import PricingService
+
+
+def legacy_price(menu: Dict[str, Any], order_json) -> Dict[str, Any]:
+    """Implementación original (recorre items_cfg / add_cfg por cada línea)."""
+    try:
+        order = json.loads(order_json) if isinstance(order_json, str) else order_json
+    except Exception as e:
+        return {"ok": False, "error": "order_json inválido", "detail": str(e)}
+
+    restaurant = (order.get("restaurante") or "").strip()
+    if restaurant not in menu:
+        return {"ok": False, "error": "Restaurante no encontrado", "restaurant": restaurant}
+
+    cfg = menu[restaurant]
+    items_cfg = cfg.get("items", {})
+    options_cfg = cfg.get("options", {})
+    delivery_fee = int(cfg.get("delivery_fee", 0))
+
+    warnings: List[str] = []
+    detail: List[Dict[str, Any]] = []
+    subtotal = 0
+
+    for it in order.get("items", []):
+        name = (it.get("nombre") or "").strip().lower()
+        qty = int(it.get("cantidad") or 1)
+        if qty < 1:
+            qty = 1
+
+        found_key = None
+        for k in items_cfg.keys():
+            if k.lower() == name:
+                found_key = k
+                break
+
+        if not found_key:
+            warnings.append(f"Item no encontrado: {it.get('nombre')}")
+            continue
+
+        base_price = int(items_cfg[found_key]["price"])
+        line_extra = 0
+        chosen_opts = it.get("opciones") or {}
+
+        item_opts = options_cfg.get(found_key, {})
+        bordes_cfg = (item_opts.get("bordes") or {})
+        bordes_choice = chosen_opts.get("bordes")
+        if bordes_choice:
+            extra = bordes_cfg.get(str(bordes_choice).lower())
+            if extra is None:
+                extra = bordes_cfg.get(str(bordes_choice))
+            if extra is None:
+                warnings.append(f"Opción bordes inválida en {found_key}: {bordes_choice}")
+            else:
+                line_extra += int(extra)
+
+        add_cfg = (item_opts.get("adiciones") or {})
+        adds = chosen_opts.get("adiciones") or []
+        if isinstance(adds, str):
+            adds = [adds]
+
+        adds_ok = []
+        for a in adds:
+            a_str = str(a).strip().lower()
+            extra = None
+            for k in add_cfg.keys():
+                if k.lower() == a_str:
+                    extra = add_cfg[k]
+                    adds_ok.append(k)
+                    break
+            if extra is None:
+                warnings.append(f"Adición inválida en {found_key}: {a}")
+            else:
+                line_extra += int(extra)
+
+        unit = base_price + line_extra
+        line_total = unit * qty
+        subtotal += line_total
+
+        detail.append({
+            "item": found_key,
+            "cantidad": qty,
+            "base": base_price,
+            "extras": line_extra,
+            "unitario": unit,
+            "total_linea": line_total,
+            "opciones": {"bordes": bordes_choice, "adiciones": adds_ok},
+        })
+
+    total = subtotal + delivery_fee
+    return {
+        "ok": True,
+        "restaurant": restaurant,
+        "currency": cfg.get("currency", "COP"),
+        "subtotal": subtotal,
+        "delivery_fee": delivery_fee,
+        "total": total,
+        "detalle_lineas": detail,
+        "warnings": warnings,
+    }
+
+
+def build_menu(restaurants: int, items: int, adiciones: int) -> Dict[str, Any]:
+    menu: Dict[str, Any] = {}
+    for r in range(restaurants):
+        menu[f"Restaurante {r}"] = {
+            "currency": "COP",
+            "delivery_fee": 5000,
+            "items": {f"Item {i}": {"price": 1000 + 100 * i} for i in range(items)},
+            "options": {
+                f"Item {i}": {
+                    "bordes": {"normal": 0, "queso": 4000},
+                    "adiciones": {f"Adicion {a}": 500 * (a + 1) for a in range(adiciones)},
+                }
+                for i in range(items)
+            },
+        }
+    return menu
+
+
+def build_orders(rnd: random.Random, menu: Dict[str, Any], n: int, lines: int, items: int, adiciones: int):
+    names = list(menu.keys())
+    orders = []
+    for _ in range(n):
+        orders.append({
+            "restaurante": rnd.choice(names),
+            "items": [
+                {
+                    "nombre": f"item {rnd.randrange(items)}",
+                    "cantidad": rnd.randint(1, 3),
+                    "opciones": {
+                        "bordes": rnd.choice(["normal", "queso", "Queso"]),
+                        "adiciones": [f"adicion {rnd.randrange(adiciones)}" for _ in range(rnd.randint(0, 3))],
+                    },
+                }
+                for _ in range(lines)
+            ],
+        })
+    return orders
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--restaurants", type=int, default=20)
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--adiciones", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    menu = build_menu(args.restaurants, args.items, args.adiciones)
+    orders = build_orders(rnd, menu, args.orders, args.lines, args.items, args.adiciones)
+    service = PricingService(MenuRepository(menu), cache_size=0)
+
+    t0 = time.perf_counter()
+    service.compiled()
+    compile_s = time.perf_counter() - t0
+
+    for o in orders[:500]:
+        assert legacy_price(menu, o) == service.price(o), o
+
+    t0 = time.perf_counter()
+    for o in orders:
+        legacy_price(menu, o)
+    legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for o in orders:
+        service.price(o)
+    indexed = time.perf_counter() - t0
+
+    # órdenes repetidas, como cuando el agente re-cotiza el mismo pedido varias veces
+    cached = PricingService(MenuRepository(menu), cache_size=3 * len(orders))
+    payloads = [json.dumps(o) for o in orders]
+    for p in payloads:
+        cached.price_json(p)
+    t0 = time.perf_counter()
+    for p in payloads:
+        cached.price_json(p)
+    repeat_raw = time.perf_counter() - t0
+    reordered = [json.dumps(dict(reversed(list(o.items())))) for o in orders]
+    t0 = time.perf_counter()
+    for p in reordered:
+        cached.price_json(p)
+    repeat_canon = time.perf_counter() - t0
+
+    n = len(orders)
+    print(f"catálogo: {args.restaurants} restaurantes x {args.items} items, {args.lines} líneas/orden")
+    print(f"lineal:   {legacy * 1e6 / n:8.1f} us/orden")
+    print(f"indexado: {indexed * 1e6 / n:8.1f} us/orden  (compilar: {compile_s * 1e3:.1f} ms)")
+    print(f"speedup:  {legacy / indexed:.1f}x")
+    print(f"cache (mismo JSON):     {repeat_raw * 1e6 / n:8.1f} us/orden")
+    print(f"cache (orden canónica): {repeat_canon * 1e6 / n:8.1f} us/orden  {cached.cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
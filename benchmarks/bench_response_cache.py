@@ -0,0 +1,209 @@
+"""
+Benchmark de la caché de respuestas (RESPONSE_CACHE_*): preguntas informativas repetidas.
+
+N chats concurrentes hacen preguntas frecuentes (con variaciones de saludo, tildes y signos)
+mezcladas con turnos que tocan el pedido; a mitad de la corrida se actualiza el menú. El
+agente real (build_agent + TelegramRouter) corre contra un OpenAI falso con --llm-ms por llamada.
+Compara sin caché vs con caché:
+- llamadas al LLM y latencia p50/p95 de las preguntas informativas
+- turnos de pedido respondidos desde la caché (debe ser 0)
+- respuestas con datos de otro cliente (debe ser 0): el LLM falso menciona la dirección del
+  cliente cuando está en el historial
+- respuestas invalidadas al cambiar el menú
+
+Uso:
+    python -m benchmarks.bench_response_cache --chats 40 --llm-ms 700
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from app.adapters.telegram_client import TelegramClient
+from app.application.response_cache import ResponseCache
+from app.application.telegram_router import TelegramRouter
+from app.llm.agent_factory import build_agent
+from app.llm.tools import build_tools
+from app.repositories.dispatch_repo import DispatchRepository
+from app.repositories.driver_repo import DriverRepository
+from app.repositories.menu_repo import MenuRepository
+from app.services.dispatch_service import DispatchService
+from app.services.pricing_service import PricingService
+
+RESTAURANT = "Pizzeria Orientini - Marinilla"
+
+QUESTIONS = [
+    "¿Qué pizzas tienen?",
+    "hola, qué pizzas tienen",
+    "Buenas tardes, ¿qué pizzas tienen por favor?",
+    "¿cuánto es el domicilio?",
+    "cuanto es el domicilio",
+    "¿Qué adiciones tiene la pizza mediana?",
+    "que adiciones tiene la pizza mediana?",
+    "¿tienen gaseosa?",
+]
+ADDRESS = "Calle 30 # 31-12"
+ORDER_TURNS = [
+    "quiero 2 pizzas medianas con borde de queso",
+    f"mi dirección es {ADDRESS}",
+    "¿cuánto es el total de mi pedido?",
+]
+
+
+def make_handler(llm_ms: float):
+    class FakeOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        calls = 0
+        lock = threading.Lock()
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            with self.lock:
+                type(self).calls += 1
+                n = type(self).calls
+            time.sleep(llm_ms / 1000)
+            last = (body.get("messages") or [{}])[-1]
+            if last.get("role") == "user" and "tienen" in (last.get("content") or ""):
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": f"call_{n}", "type": "function",
+                    "function": {"name": "get_menu", "arguments": json.dumps({"restaurant": RESTAURANT})},
+                }]}
+            else:
+                # como un modelo real, la respuesta puede arrastrar datos del cliente del historial
+                known = any(ADDRESS in (m.get("content") or "") for m in body.get("messages", []) if m.get("role") == "user")
+                suffix = f" (envío a {ADDRESS})" if known else ""
+                message = {"role": "assistant", "content": f"Respuesta del agente #{n}{suffix}"}
+            out = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+    return FakeOpenAI
+
+
+class FakeBot:
+    def __init__(self):
+        self.last: dict = {}
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.last[chat_id] = text
+        return SimpleNamespace(message_id=1)
+
+    async def send_chat_action(self, chat_id, action):
+        pass
+
+
+async def run(with_cache: bool, args, server_cls) -> dict:
+    menu_repo = MenuRepository()
+    pricing = PricingService(menu_repo)
+    drivers = DriverRepository([])
+    dispatches = DispatchRepository()
+    dispatch_service = DispatchService(drivers, dispatches)
+    agent = build_agent(tools=build_tools(menu_repo, pricing, dispatch_service), model="fake-model", temperature=0)
+    bot = FakeBot()
+    tg = TelegramClient()
+    tg.set_bot(bot)
+    cache = ResponseCache(menu_repo) if with_cache else None
+    router = TelegramRouter(
+        tg_client=tg, drivers=drivers, dispatches=dispatches, dispatch_service=dispatch_service,
+        agent=agent, response_cache=cache,
+    )
+
+    info_ms, order_ms = [], []
+    # cada respuesta del LLM falso es única: una respuesta repetida salió de la caché
+    answers_seen = set()
+    order_hits = 0
+    leaks = 0
+    gave_address = set()
+
+    async def send(chat_id: int, text: str, bucket) -> None:
+        nonlocal order_hits, leaks
+        if ADDRESS in text:
+            gave_address.add(chat_id)
+        update = SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), message=SimpleNamespace(text=text))
+        t0 = time.perf_counter()
+        await router._handle_text(update, None)
+        bucket.append((time.perf_counter() - t0) * 1000)
+        answer = bot.last.get(chat_id)
+        if bucket is order_ms and answer in answers_seen:
+            order_hits += 1
+        if answer and ADDRESS in answer and chat_id not in gave_address:
+            leaks += 1
+        answers_seen.add(answer)
+
+    async def chat(i: int, chat_id: int) -> None:
+        # llegadas repartidas en --arrival-s
+        await asyncio.sleep(args.arrival_s * i / args.chats)
+        for q in range(args.questions):
+            await send(chat_id, QUESTIONS[(chat_id + q) % len(QUESTIONS)], info_ms)
+            await send(chat_id, ORDER_TURNS[(chat_id + q) % len(ORDER_TURNS)], order_ms)
+
+    async def menu_update() -> None:
+        await asyncio.sleep(args.update_after)
+        menu_repo.update_restaurant(RESTAURANT, menu_repo.raw()[RESTAURANT])
+
+    server_cls.calls = 0
+    t0 = time.perf_counter()
+    await asyncio.gather(menu_update(), *(chat(c, 1000 + c) for c in range(args.chats)))
+    elapsed = time.perf_counter() - t0
+    info_ms.sort()
+    return {
+        "llm_calls": server_cls.calls,
+        "info_p50": statistics.median(info_ms),
+        "info_p95": info_ms[int(len(info_ms) * 0.95) - 1],
+        "order_p50": statistics.median(order_ms),
+        "order_hits": order_hits,
+        "leaks": leaks,
+        "elapsed": elapsed,
+        "cache": cache.stats() if cache else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=3, help="preguntas informativas por chat")
+    parser.add_argument("--llm-ms", type=float, default=700.0)
+    parser.add_argument("--arrival-s", type=float, default=10.0, help="ventana en que llegan los chats")
+    parser.add_argument("--update-after", type=float, default=5.0, help="segundos hasta actualizar el menú")
+    args = parser.parse_args()
+
+    handler = make_handler(args.llm_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    async def both():
+        return [await run(with_cache, args, handler) for with_cache in (False, True)]
+
+    for with_cache, r in zip((False, True), asyncio.run(both())):
+        label = "con caché" if with_cache else "sin caché"
+        print(
+            f"{label}: llamadas LLM={r['llm_calls']} preguntas p50={r['info_p50']:,.0f}ms p95={r['info_p95']:,.0f}ms "
+            f"pedido p50={r['order_p50']:,.0f}ms turnos de pedido desde caché={r['order_hits']} "
+            f"datos de otro cliente={r['leaks']} "
+            f"total={r['elapsed']:.1f}s"
+        )
+        if r["cache"]:
+            print(f"  caché: {r['cache']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark de customer_chat_id por config del run vs system message por turno.
+
+Antes, cada turno agregaba ("system", "customer_chat_id=...") al thread: el checkpointer lo
+guardaba y el historial crecía un mensaje por turno. Ahora el router lo pasa en
+config["configurable"] y assign_driver / send_order_to_driver lo leen de ahí.
+
+Corre varias conversaciones de pedido (hasta el despacho) con el agente real contra un OpenAI
+falso que emula el prompt caching del proveedor: prefijo común con un request anterior, en
+bloques de 128 tokens y desde 1024 tokens (~4 caracteres por token). Reporta por variante:
+- mensajes y caracteres persistidos por thread al final
+- tokens de prompt y tokens cacheados (usage -> cache_read) de toda la corrida
+- que el despacho quede con el customer_chat_id correcto
+
+Uso:
+    python -m benchmarks.bench_run_config --chats 5
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from app.adapters.telegram_client import TelegramClient
+from app.application.telegram_router import TelegramRouter
+from app.domain.models import Driver
+from app.llm.agent_factory import build_agent
+from app.llm.checkpointer import BoundedMemorySaver
+from app.llm.tools import build_tools
+from app.repositories.dispatch_repo import DispatchRepository
+from app.repositories.driver_repo import DriverRepository
+from app.repositories.menu_repo import MenuRepository
+from app.services.dispatch_service import DispatchService
+from app.services.pricing_service import PricingService
+
+RESTAURANT = "Pizzeria Orientini - Marinilla"
+ORDER = {
+    "restaurante": RESTAURANT, "cliente": "Ana Gómez", "direccion": "Calle 30 # 31-12, Marinilla",
+    "telefono": "3001234567", "medio_pago": "efectivo",
+    "items": [{"nombre": "pizza mediana", "cantidad": 2, "opciones": {"bordes": "queso"}}],
+}
+# (mensaje del cliente, tool que "decide" el modelo falso, args)
+SCRIPT = [
+    ("hola, ¿qué tienen en la Pizzeria Orientini?", "get_menu", {"restaurant": RESTAURANT}),
+    ("quiero 2 pizzas medianas con borde de queso", "price_order", {"order_json": json.dumps(ORDER)}),
+    ("mi nombre es Ana Gómez", None, None),
+    ("la dirección es Calle 30 # 31-12, Marinilla", None, None),
+    ("mi teléfono es 3001234567", None, None),
+    ("pago en efectivo", "price_order", {"order_json": json.dumps(ORDER)}),
+    ("¿el borde de queso cuánto suma?", "get_menu", {"restaurant": RESTAURANT}),
+    ("perfecto", None, None),
+    ("sí, confirmo el pedido", "assign_driver", {"order_json": json.dumps(ORDER)}),
+    ("gracias", None, None),
+]
+ACTIONS = {text: (tool, args) for text, tool, args in SCRIPT}
+
+CHARS_PER_TOKEN = 4
+BLOCK_TOKENS = 128
+MIN_CACHED_TOKENS = 1024
+
+
+def prompt_text(body) -> str:
+    parts = [json.dumps(body.get("tools", []), ensure_ascii=False)]
+    for m in body.get("messages", []):
+        parts.append(f"{m.get('role')}\n{m.get('content') or ''}")
+        for tc in m.get("tool_calls") or []:
+            parts.append(tc["function"]["name"] + tc["function"]["arguments"])
+    return "\n".join(parts)
+
+
+def make_handler():
+    class FakeOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        prefixes = set()  # hashes de prefijos vistos, por bloque
+        lock = threading.Lock()
+        calls = 0
+
+        def log_message(self, *args):
+            pass
+
+        def _cached_tokens(self, text: str) -> int:
+            block = BLOCK_TOKENS * CHARS_PER_TOKEN
+            cached = 0
+            with self.lock:
+                for end in range(block, len(text) + 1, block):
+                    h = hashlib.blake2b(text[:end].encode(), digest_size=16).digest()
+                    if h in self.prefixes and cached == end - block:
+                        cached = end
+                    self.prefixes.add(h)
+            tokens = cached // CHARS_PER_TOKEN
+            return tokens if tokens >= MIN_CACHED_TOKENS else 0
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            text = prompt_text(body)
+            prompt_tokens = len(text) // CHARS_PER_TOKEN
+            cached = self._cached_tokens(text)
+            with self.lock:
+                type(self).calls += 1
+                n = type(self).calls
+
+            message = {"role": "assistant", "content": "Listo. ¿Algo más?"}
+            last = (body.get("messages") or [{}])[-1]
+            call = None
+            if last.get("role") == "user":
+                call = ACTIONS.get(last.get("content"), (None, None))
+            elif last.get("role") == "tool":
+                payload = json.loads(last.get("content") or "{}")
+                if payload.get("ok") and payload.get("dispatch_id") and "message" not in payload and "duplicate" not in payload:
+                    call = ("send_order_to_driver", {
+                        "driver_chat_id": payload["driver_chat_id"], "dispatch_id": payload["dispatch_id"],
+                        "order_json": json.dumps(ORDER),
+                    })
+            if call and call[0]:
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": f"call_{n}", "type": "function",
+                    "function": {"name": call[0], "arguments": json.dumps(call[1])},
+                }]}
+            out = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10,
+                    "prompt_tokens_details": {"cached_tokens": cached},
+                },
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+    return FakeOpenAI
+
+
+class LegacyRouter(TelegramRouter):
+    """Como antes: system message con el customer_chat_id en cada turno (se guarda en el thread)."""
+
+    async def _prepare_turn(self, user_text, chat_id):
+        turn = await super()._prepare_turn(user_text, chat_id)
+        if turn is None:
+            return None
+        agent, inputs, config = turn
+        inputs["messages"].insert(
+            0, ("system", f"customer_chat_id={chat_id} (usa este valor exacto cuando llames herramientas).")
+        )
+        return agent, inputs, config
+
+
+class FakeBot:
+    async def send_message(self, chat_id, text, parse_mode=None):
+        return SimpleNamespace(message_id=1)
+
+
+async def run(router_cls, chats: int, handler) -> dict:
+    handler.prefixes.clear()
+    menu_repo = MenuRepository()
+    drivers = DriverRepository([Driver(f"d{i}", f"Driver {i}", 90_000 + i) for i in range(chats)])
+    dispatches = DispatchRepository()
+    dispatch_service = DispatchService(drivers, dispatches)
+    tools = build_tools(menu_repo, PricingService(menu_repo), dispatch_service)
+    saver = BoundedMemorySaver()
+    agent = build_agent(tools=tools, model="fake-model", temperature=0, checkpointer=saver)
+    tg = TelegramClient()
+    tg.set_bot(FakeBot())
+    router = router_cls(
+        tg_client=tg, drivers=drivers, dispatches=dispatches, dispatch_service=dispatch_service, agent=agent,
+    )
+
+    prompt = cached = 0
+    history_msgs = history_chars = 0
+    ok_dispatches = 0
+    for c in range(chats):
+        chat_id = 5_550_000 + c
+        config = {"configurable": {"thread_id": str(chat_id)}}
+        seen = 0
+        for text, _, _ in SCRIPT:
+            await router.run_agent(text, chat_id)
+            messages = (await agent.aget_state(config)).values["messages"]
+            for m in messages[seen:]:
+                usage = getattr(m, "usage_metadata", None) or {}
+                prompt += usage.get("input_tokens", 0)
+                cached += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+            seen = len(messages)
+        history_msgs += len(messages)
+        history_chars += sum(len(m.content if isinstance(m.content, str) else json.dumps(m.content)) for m in messages)
+        ok_dispatches += sum(
+            1 for d in dispatches._dispatches.values() if d.customer_chat_id == chat_id and d.status == "sent"
+        )
+    return {
+        "msgs_per_thread": history_msgs / chats,
+        "chars_per_thread": history_chars / chats,
+        "prompt": prompt,
+        "cached": cached,
+        "dispatches_ok": ok_dispatches,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=5)
+    args = parser.parse_args()
+
+    handler = make_handler()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    async def both():
+        return [await run(cls, args.chats, handler) for cls in (LegacyRouter, TelegramRouter)]
+
+    for label, r in zip(("system message", "config del run"), asyncio.run(both())):
+        print(
+            f"{label:<15}: historial {r['msgs_per_thread']:.0f} mensajes / {r['chars_per_thread']:,.0f} caracteres por thread | "
+            f"prompt {r['prompt']:,} tokens, cacheados {r['cached']:,} ({r['cached'] / max(1, r['prompt']):.0%}) | "
+            f"despachos con customer_chat_id correcto {r['dispatches_ok']}/{args.chats}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de carga de secretos en startup con Secret Manager simulado.
+
+fetch_secret se reemplaza por una llamada bloqueante de ~latency ms (como el gRPC real):
+- secuencial: tres load_secret_as_env seguidos en el loop (como antes)
+- concurrente: SecretLoader.load_as_env (threads en paralelo, cliente compartido)
+- caché: segunda instancia con la caché TTL escrita por la primera
+- local: SECRETS_LOCAL_DIR con un archivo por secreto (sin servicio remoto)
+
+Uso:
+    python -m benchmarks.bench_secrets --latency 150
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import app.adapters.secrets as secrets_mod
+from app.adapters.secrets import SecretLoader
+
+SECRETS = {
+    "TELEGRAM_BOT_TOKEN": "telegram_bot_mvp",
+    "OPENAI_API_KEY": "openai_key",
+    "TELEGRAM_WEBHOOK_URL": "url_domiflash",
+}
+
+
+def clear_env() -> None:
+    for env_var in SECRETS:
+        os.environ.pop(env_var, None)
+
+
+async def run(args) -> None:
+    calls = []
+
+    def fake_fetch(secret_name: str, project_id: str) -> str:
+        calls.append(secret_name)
+        time.sleep(args.latency / 1000)
+        return f"value-of-{secret_name}"
+
+    secrets_mod.fetch_secret = fake_fetch
+    tmp = tempfile.mkdtemp()
+
+    clear_env()
+    t0 = time.perf_counter()
+    for env_var, name in SECRETS.items():
+        os.environ[env_var] = fake_fetch(name, "p")
+    sequential_ms = (time.perf_counter() - t0) * 1000
+
+    clear_env()
+    cache_path = os.path.join(tmp, "secrets.json")
+    loader = SecretLoader("p", cache_path=cache_path, cache_ttl_s=300)
+    t0 = time.perf_counter()
+    await loader.load_as_env(SECRETS)
+    concurrent_ms = (time.perf_counter() - t0) * 1000
+
+    clear_env()
+    calls.clear()
+    t0 = time.perf_counter()
+    sources = await SecretLoader("p", cache_path=cache_path, cache_ttl_s=300).load_as_env(SECRETS)
+    cached_ms = (time.perf_counter() - t0) * 1000
+    assert not calls and set(sources.values()) == {"cache"}, sources
+
+    local_dir = os.path.join(tmp, "local")
+    os.makedirs(local_dir)
+    for name in SECRETS.values():
+        with open(os.path.join(local_dir, name), "w", encoding="utf-8") as f:
+            f.write(f"local-{name}\n")
+    clear_env()
+    t0 = time.perf_counter()
+    sources = await SecretLoader("p", local_dir=local_dir).load_as_env(SECRETS)
+    local_ms = (time.perf_counter() - t0) * 1000
+    assert not calls and set(sources.values()) == {"file"}, sources
+
+    print(f"latencia simulada por secreto={args.latency:.0f}ms, {len(SECRETS)} secretos")
+    print(f"secuencial (antes): {sequential_ms:.0f}ms")
+    print(f"concurrente:        {concurrent_ms:.0f}ms")
+    print(f"caché TTL:          {cached_ms:.1f}ms")
+    print(f"archivo local:      {local_ms:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=150.0, help="latencia simulada de Secret Manager (ms)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark de la cola de salida a Telegram (SendQueue) contra un bot simulado.
+
+El bot falso tarda ~latency ms por envío, responde RetryAfter si se superan los límites
+reales de Telegram (global por segundo y por chat), a veces no logra conectar (el request no
+sale: se puede reintentar) y a veces responde TimedOut después de entregar el mensaje (no se
+debe reintentar). Se encola una ráfaga mezclada (ofertas, avisos a domiciliarios, respuestas
+a clientes) y se mide:
+- sin cola: cuántos envíos directos se pierden por RetryAfter / errores de red
+- con cola: envíos OK / fallidos, reintentos y RetryAfter recibidos (deberían ser ~0)
+- mensajes entregados dos veces (debe ser 0)
+- latencia encolado -> enviado por prioridad (las ofertas deben salir primero)
+- ritmo global efectivo vs el configurado
+
+Uso:
+    python -m benchmarks.bench_send_queue --messages 600 --chats 120 --rate 25
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+
+import httpx
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from app.adapters.send_queue import (
+    PRIORITY_CUSTOMER,
+    PRIORITY_DRIVER,
+    PRIORITY_NAMES,
+    PRIORITY_OFFER,
+    SendQueue,
+    TokenBucket,
+)
+
+
+class FakeBot:
+    """Simula los límites de Telegram (~30 msg/s global, ~1 msg/s por chat con ráfaga corta)."""
+
+    def __init__(self, rnd: random.Random, latency_ms: float, timeout_p: float, connect_p: float):
+        self.rnd = rnd
+        self.latency_s = latency_ms / 1000
+        self.timeout_p = timeout_p
+        self.connect_p = connect_p
+        self.global_bucket = TokenBucket(30, 30)
+        self.chat_buckets = defaultdict(lambda: TokenBucket(1, 5))
+        self.retry_after = 0
+        self.delivered = Counter()
+
+    async def send_message(self, chat_id: int, text: str, parse_mode=None):
+        if self.rnd.random() < self.connect_p:
+            # no hubo conexión: el request nunca salió
+            raise NetworkError("httpx.ConnectError") from httpx.ConnectError("connection refused")
+        await asyncio.sleep(self.latency_s * self.rnd.uniform(0.5, 1.5))
+        now = time.monotonic()
+        g, c = self.global_bucket, self.chat_buckets[chat_id]
+        if g.wait_time(now) > 0 or c.wait_time(now) > 0:
+            self.retry_after += 1
+            raise RetryAfter(1)
+        g.take(now)
+        c.take(now)
+        self.delivered[text] += 1
+        if self.rnd.random() < self.timeout_p:
+            # Telegram lo entregó pero la respuesta no llegó a tiempo
+            raise TimedOut() from httpx.ReadTimeout("read timeout")
+        return {"chat_id": chat_id, "text": text}
+
+
+async def run_direct(args, jobs) -> None:
+    """Sin cola: envíos directos concurrentes, como antes (sin reintentos)."""
+    bot = FakeBot(random.Random(args.seed), args.latency, args.timeout_p, args.connect_p)
+    sem = asyncio.Semaphore(args.concurrency)
+    failures = 0
+
+    async def send(chat_id: int, text: str) -> None:
+        nonlocal failures
+        async with sem:
+            try:
+                await bot.send_message(chat_id=chat_id, text=text)
+            except Exception:
+                failures += 1
+
+    t0 = time.monotonic()
+    await asyncio.gather(*[send(chat_id, text) for chat_id, _, text in jobs])
+    elapsed = time.monotonic() - t0
+    print(f"sin cola: perdidos={failures}/{len(jobs)} (RetryAfter={bot.retry_after}) en {elapsed:.1f}s")
+
+
+async def run(args) -> None:
+    rnd = random.Random(args.seed)
+    # ráfaga: 10% ofertas, 20% avisos a domiciliarios, 70% clientes
+    jobs = []
+    for i in range(args.messages):
+        p = rnd.random()
+        priority = PRIORITY_OFFER if p < 0.1 else PRIORITY_DRIVER if p < 0.3 else PRIORITY_CUSTOMER
+        jobs.append((rnd.randrange(args.chats), priority, f"msg {i}"))
+
+    print(f"mensajes={args.messages} chats={args.chats} rate={args.rate}/s concurrency={args.concurrency}")
+    await run_direct(args, jobs)
+
+    bot = FakeBot(rnd, args.latency, args.timeout_p, args.connect_p)
+    queue = SendQueue(
+        global_rate=args.rate, global_burst=30, chat_rate=args.chat_rate, chat_burst=3,
+        backoff_base_s=0.1, concurrency=args.concurrency,
+    )
+    await queue.start()
+
+    latencies = defaultdict(list)
+    failures = 0
+
+    async def send(chat_id: int, priority: int, text: str) -> None:
+        nonlocal failures
+        t0 = time.monotonic()
+        try:
+            await queue.submit(chat_id, lambda: bot.send_message(chat_id=chat_id, text=text), priority=priority)
+            latencies[priority].append(time.monotonic() - t0)
+        except Exception:
+            failures += 1
+
+    t0 = time.monotonic()
+    await asyncio.gather(*[send(chat_id, priority, text) for chat_id, priority, text in jobs])
+    elapsed = time.monotonic() - t0
+    stats = queue.stats()
+    await queue.stop()
+
+    sent = sum(len(v) for v in latencies.values())
+    print(f"con cola: enviados={sent} fallidos={failures} en {elapsed:.1f}s -> {sent / elapsed:.1f} msg/s")
+    print(f"reintentos={stats['retries']} RetryAfter del bot={bot.retry_after}")
+    timed_out = failures - sum(1 for _, _, text in jobs if not bot.delivered[text])
+    print(
+        f"entregados dos veces={sum(1 for n in bot.delivered.values() if n > 1)} "
+        f"(fallidos por TimedOut pero entregados={timed_out})"
+    )
+    for priority in (PRIORITY_OFFER, PRIORITY_DRIVER, PRIORITY_CUSTOMER):
+        lat = sorted(latencies[priority])
+        if not lat:
+            continue
+        print(
+            f"{PRIORITY_NAMES[priority]:>8}: n={len(lat)} p50={statistics.median(lat) * 1000:,.0f}ms "
+            f"p95={lat[int(len(lat) * 0.95) - 1] * 1000:,.0f}ms max={lat[-1] * 1000:,.0f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=600)
+    parser.add_argument("--chats", type=int, default=120)
+    parser.add_argument("--rate", type=float, default=25.0, help="token bucket global (msg/s)")
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="token bucket por chat (msg/s)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=80.0, help="latencia simulada del bot (ms)")
+    parser.add_argument("--timeout-p", type=float, default=0.02, help="probabilidad de TimedOut tras entregar")
+    parser.add_argument("--connect-p", type=float, default=0.02, help="probabilidad de error de conexión (no sale)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
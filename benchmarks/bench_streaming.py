@@ -0,0 +1,157 @@
+"""
+Benchmark de latencia percibida: respuesta completa vs streaming con ediciones progresivas.
+
+Un servidor falso de OpenAI responde chat/completions token a token (SSE) con --token-ms
+entre tokens (y --ttft-ms antes del primero). El agente real (build_agent + TelegramRouter)
+corre contra ese servidor y un bot falso que registra sendMessage / editMessageText /
+sendChatAction con su instante. Se mide, desde que llega el mensaje del cliente:
+- primer texto visible (sendMessage)
+- respuesta completa visible (último send/edit)
+- ediciones y "typing" enviados
+
+Uso:
+    python -m benchmarks.bench_streaming --tokens 120 --token-ms 25 --ttft-ms 600
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from app.adapters.telegram_client import TelegramClient
+from app.application.telegram_router import TelegramRouter
+from app.llm.agent_factory import build_agent
+from app.repositories.dispatch_repo import DispatchRepository
+from app.repositories.driver_repo import DriverRepository
+from app.services.dispatch_service import DispatchService
+
+CHAT_ID = 5550001
+
+
+def make_handler(tokens: int, token_ms: float, ttft_ms: float):
+    words = [f"palabra{i} " for i in range(tokens)]
+
+    class FakeOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _chunk(self, data: str) -> None:
+            raw = data.encode()
+            self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model", "fake")}
+            time.sleep(ttft_ms / 1000)
+            if not body.get("stream"):
+                out = json.dumps({
+                    **base, "object": "chat.completion",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(words)}}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": tokens, "total_tokens": tokens + 1},
+                }).encode()
+                # sin streaming el servidor igual genera token a token antes de responder
+                time.sleep(tokens * token_ms / 1000)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, w in enumerate(words):
+                delta = {"role": "assistant", "content": w} if i == 0 else {"content": w}
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n")
+                time.sleep(token_ms / 1000)
+            end = {**base, "object": "chat.completion.chunk",
+                   "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self._chunk(f"data: {json.dumps(end)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return FakeOpenAI
+
+
+class FakeBot:
+    def __init__(self):
+        self.t0 = 0.0
+        self.events = []  # (ms, kind, len)
+
+    def _log(self, kind: str, text: str = "") -> None:
+        self.events.append(((time.monotonic() - self.t0) * 1000, kind, len(text)))
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self._log("send", text)
+        return SimpleNamespace(message_id=len(self.events))
+
+    async def edit_message_text(self, chat_id, message_id, text, parse_mode=None):
+        self._log("edit", text)
+
+    async def send_chat_action(self, chat_id, action):
+        self._log("typing")
+
+
+async def run_mode(stream: bool, args) -> dict:
+    agent = build_agent(tools=[], model="fake-model", temperature=0)
+    agent.get_graph()  # compila antes de medir
+    bot = FakeBot()
+    tg = TelegramClient()
+    tg.set_bot(bot)
+    drivers = DriverRepository([])
+    dispatches = DispatchRepository()
+    router = TelegramRouter(
+        tg_client=tg, drivers=drivers, dispatches=dispatches,
+        dispatch_service=DispatchService(drivers, dispatches), agent=agent,
+        stream_replies=stream, stream_edit_interval_s=args.edit_interval,
+    )
+    update = SimpleNamespace(
+        effective_chat=SimpleNamespace(id=CHAT_ID), message=SimpleNamespace(text="hola, quiero pedir")
+    )
+    bot.t0 = time.monotonic()
+    await router._handle_text(update, None)
+    sends = [e for e in bot.events if e[1] == "send"]
+    visible = [e for e in bot.events if e[1] in ("send", "edit")]
+    return {
+        "first_text_ms": sends[0][0],
+        "complete_ms": visible[-1][0],
+        "edits": sum(1 for e in bot.events if e[1] == "edit"),
+        "typing": sum(1 for e in bot.events if e[1] == "typing"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--token-ms", type=float, default=25.0)
+    parser.add_argument("--ttft-ms", type=float, default=600.0, help="tiempo hasta el primer token")
+    parser.add_argument("--edit-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.tokens, args.token_ms, args.ttft_ms))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    for stream in (False, True):
+        r = asyncio.run(run_mode(stream, args))
+        label = "streaming" if stream else "completa "
+        print(
+            f"{label}: primer texto={r['first_text_ms']:,.0f}ms respuesta completa={r['complete_ms']:,.0f}ms "
+            f"ediciones={r['edits']} typing={r['typing']}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
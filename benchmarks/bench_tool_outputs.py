@@ -0,0 +1,201 @@
+"""
+Benchmark de salidas de tools: JSON verboso vs formato compacto (TOOL_OUTPUT_COMPACT).
+
+Corre una conversación de pedido completa (get_menu / price_order en varios turnos) con el
+agente real (build_agent + build_tools + TelegramRouter.run_agent) y reporta, por variante:
+- tokens de prompt por llamada al LLM y total de la conversación (usage de la respuesta)
+- latencia end-to-end por turno y de la conversación
+
+Por defecto usa un OpenAI falso que sigue un guion (qué tool llamar en cada turno), cuenta
+los tokens del prompt (~4 caracteres por token) y tarda --base-ms + tokens * --prefill-us.
+Con --real usa la API real (OPENAI_API_KEY; LLM_MODEL) y el usage que reporta el proveedor.
+
+Uso:
+    python -m benchmarks.bench_tool_outputs
+    python -m benchmarks.bench_tool_outputs --real --model gpt-4.1-mini
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.adapters.telegram_client import TelegramClient
+from app.application.telegram_router import TelegramRouter
+from app.llm.agent_factory import build_agent
+from app.llm.tools import build_tools
+from app.repositories.dispatch_repo import DispatchRepository
+from app.repositories.driver_repo import DriverRepository
+from app.repositories.menu_repo import MenuRepository
+from app.services.dispatch_service import DispatchService
+from app.services.pricing_service import PricingService
+
+CHAT_ID = 5550001
+RESTAURANT = "Pizzeria Orientini - Marinilla"
+
+
+def order(items):
+    return {
+        "restaurante": RESTAURANT, "cliente": "Ana Gómez", "direccion": "Calle 30 # 31-12, Marinilla",
+        "telefono": "3001234567", "medio_pago": "efectivo", "items": items,
+    }
+
+
+PIZZAS = {"nombre": "pizza mediana", "cantidad": 2, "opciones": {"bordes": "queso", "adiciones": ["pepperoni"]}}
+SODA = {"nombre": "gaseosa 1.5l", "cantidad": 1}
+PERSONAL = {"nombre": "pizza personal", "cantidad": 1, "opciones": {"adiciones": ["extra queso"]}}
+
+# (mensaje del cliente, tool que "decide" el modelo falso, args)
+SCRIPT = [
+    ("hola, ¿qué tienen en la Pizzeria Orientini de Marinilla?", "get_menu", {"restaurant": RESTAURANT}),
+    ("quiero 2 pizzas medianas con borde de queso y pepperoni", "price_order", {"order_json": order([PIZZAS])}),
+    ("agrégale una gaseosa de 1.5", "price_order", {"order_json": order([PIZZAS, SODA])}),
+    ("mi nombre es Ana Gómez", None, None),
+    ("la dirección es Calle 30 # 31-12, Marinilla, tel 3001234567", None, None),
+    ("¿me muestras otra vez las pizzas y sus adiciones?", "get_menu", {"restaurant": RESTAURANT}),
+    ("suma también una personal con extra queso", "price_order", {"order_json": order([PIZZAS, SODA, PERSONAL])}),
+    ("pago en efectivo, ¿cuánto queda en total?", "price_order", {"order_json": order([PIZZAS, SODA, PERSONAL])}),
+    ("perfecto, gracias", None, None),
+]
+ACTIONS = {text: (tool, args) for text, tool, args in SCRIPT}
+
+
+def prompt_tokens_estimate(messages, tools) -> int:
+    """~4 caracteres por token sobre el texto que ve el modelo (contenido + tool calls) + overhead."""
+    chars = len(json.dumps(tools, ensure_ascii=False))
+    for m in messages:
+        chars += len(m.get("content") or "")
+        for tc in m.get("tool_calls") or []:
+            chars += len(tc["function"]["name"]) + len(tc["function"]["arguments"])
+    return chars // 4 + 4 * len(messages)
+
+
+def make_handler(base_ms: float, prefill_us: float):
+    class FakeOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        calls = 0
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            messages = body.get("messages", [])
+            prompt_tokens = prompt_tokens_estimate(messages, body.get("tools", []))
+            time.sleep((base_ms + prompt_tokens * prefill_us / 1000) / 1000)
+
+            message = {"role": "assistant", "content": "Listo. ¿Algo más para tu pedido?"}
+            last = messages[-1] if messages else {}
+            if last.get("role") == "user":
+                tool, args = ACTIONS.get(last.get("content"), (None, None))
+                if tool:
+                    type(self).calls += 1
+                    message = {"role": "assistant", "content": None, "tool_calls": [{
+                        "id": f"call_{type(self).calls}", "type": "function",
+                        "function": {"name": tool, "arguments": json.dumps(
+                            {k: json.dumps(v, ensure_ascii=False) if k == "order_json" else v for k, v in args.items()},
+                            ensure_ascii=False,
+                        )},
+                    }]}
+            out = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20, "total_tokens": prompt_tokens + 20},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+    return FakeOpenAI
+
+
+async def run_conversation(compact_outputs, model: str) -> dict:
+    menu_repo = MenuRepository()
+    pricing = PricingService(menu_repo)
+    drivers = DriverRepository([])
+    dispatches = DispatchRepository()
+    dispatch_service = DispatchService(drivers, dispatches)
+    tools = build_tools(menu_repo, pricing, dispatch_service, compact_outputs=compact_outputs)
+    agent = build_agent(tools=tools, model=model, temperature=0)
+    router = TelegramRouter(
+        tg_client=TelegramClient(), drivers=drivers, dispatches=dispatches,
+        dispatch_service=dispatch_service, agent=agent,
+    )
+    config = {"configurable": {"thread_id": str(CHAT_ID)}}
+
+    turns = []
+    seen = 0
+    for text, _, _ in SCRIPT:
+        t0 = time.perf_counter()
+        await router.run_agent(text, CHAT_ID)
+        elapsed = time.perf_counter() - t0
+        messages = (await agent.aget_state(config)).values["messages"]
+        new_ai = [m for m in messages[seen:] if m.type == "ai"]
+        seen = len(messages)
+        turns.append({
+            "ms": elapsed * 1000,
+            "prompt_tokens": [(m.usage_metadata or {}).get("input_tokens", 0) for m in new_ai],
+        })
+    return {
+        "turns": turns,
+        "prompt_tokens": sum(sum(t["prompt_tokens"]) for t in turns),
+        "llm_calls": sum(len(t["prompt_tokens"]) for t in turns),
+        "ms": sum(t["ms"] for t in turns),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--real", action="store_true", help="usar la API real de OpenAI")
+    parser.add_argument("--model", default=os.getenv("LLM_MODEL", "gpt-4.1-mini"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--base-ms", type=float, default=250.0, help="(fake) latencia fija por llamada")
+    parser.add_argument("--prefill-us", type=float, default=150.0, help="(fake) microsegundos por token de prompt")
+    args = parser.parse_args()
+
+    server = None
+    if not args.real:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.base_ms, args.prefill_us))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+        os.environ["OPENAI_API_KEY"] = "sk-fake"
+
+    menu_repo = MenuRepository()
+    pricing = PricingService(menu_repo)
+    full = order([PIZZAS, SODA, PERSONAL])
+    print(
+        "salida por llamada (~tokens): "
+        f"get_menu {len(menu_repo.get_menu_json(RESTAURANT)) // 4} -> {len(menu_repo.get_menu_compact(RESTAURANT)) // 4}, "
+        f"price_order {len(pricing.price_json(full)) // 4} -> {len(pricing.price_compact(full)) // 4}"
+    )
+
+    variants = [("verboso", ()), ("compacto", ("get_menu", "price_order"))]
+    results = {}
+    for label, compact in variants:
+        runs = [asyncio.run(run_conversation(compact, args.model)) for _ in range(args.runs)]
+        results[label] = runs
+        r = runs[-1]
+        per_turn = " ".join(str(sum(t["prompt_tokens"])) for t in r["turns"])
+        print(f"{label:<9} tokens de prompt por turno: {per_turn}")
+        print(
+            f"{label:<9} conversación: {r['llm_calls']} llamadas LLM, {r['prompt_tokens']:,} tokens de prompt, "
+            f"latencia mediana={statistics.median(x['ms'] for x in runs):,.0f}ms "
+            f"(turno p50={statistics.median(t['ms'] for x in runs for t in x['turns']):,.0f}ms)"
+        )
+    if server is not None:
+        server.shutdown()
+
+    before = results["verboso"][-1]["prompt_tokens"]
+    after = results["compacto"][-1]["prompt_tokens"]
+    if before:
+        print(f"ahorro de tokens de prompt: {before - after:,} ({(before - after) / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark del procesamiento de resultados de tools después de cada turno del agente.
+
+Antes, después de cada ainvoke el router recorría TODO result["messages"] (el historial
+completo del thread) y hacía json.loads de cada ToolMessage: el costo por turno crecía con la
+conversación y la oferta de un despacho de un turno anterior se volvía a enviar en cada turno
+siguiente. Ahora hay un cursor por thread (solo mensajes nuevos) y un ledger por dispatch_id.
+
+Simula threads con un despacho temprano y luego turnos con get_menu / price_order, y mide el
+costo de post-procesar un turno (µs) a distintas longitudes y las ofertas enviadas en total.
+
+Uso:
+    python -m benchmarks.bench_tool_results --turns 200
+"""
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.adapters.telegram_client import TelegramClient
+from app.application.telegram_router import TelegramRouter
+from app.repositories.dispatch_repo import DispatchRepository
+from app.repositories.driver_repo import DriverRepository
+from app.repositories.menu_repo import MenuRepository
+from app.services.dispatch_service import DispatchService
+from app.services.pricing_service import PricingService
+
+CHAT_ID = 5550001
+RESTAURANT = "Pizzeria Orientini - Marinilla"
+
+
+def turn_messages(turn: int, menu_repo: MenuRepository, pricing: PricingService):
+    order = {"restaurante": RESTAURANT, "items": [{"nombre": "pizza mediana", "cantidad": 1 + turn % 3}]}
+    if turn == 1:
+        name, content = "send_order_to_driver", json.dumps({
+            "ok": True, "dispatch_id": "disp_1", "driver_chat_id": 90001, "message": "Nuevo pedido ...",
+        })
+    elif turn % 2:
+        name, content = "price_order", pricing.price_json(order)
+    else:
+        name, content = "get_menu", menu_repo.get_menu_json(RESTAURANT)
+    return [
+        HumanMessage(content=f"mensaje {turn}", id=f"h{turn}"),
+        AIMessage(content="", tool_calls=[{"name": name, "args": {}, "id": f"c{turn}"}], id=f"a{turn}"),
+        ToolMessage(content=content, tool_call_id=f"c{turn}", name=name, id=f"t{turn}"),
+        AIMessage(content=f"respuesta {turn}", id=f"r{turn}"),
+    ]
+
+
+class LegacyRouter(TelegramRouter):
+    """Post-proceso anterior: recorre todo el historial y no deduplica ofertas."""
+
+    async def _finish_turn(self, result, chat_id, cache_key=None):
+        for m in result.get("messages", []):
+            if getattr(m, "type", None) == "tool":
+                content = getattr(m, "content", None)
+                if not isinstance(content, str) or not content:
+                    continue
+                try:
+                    payload = json.loads(content)
+                except Exception:
+                    continue
+                if (
+                    isinstance(payload, dict) and payload.get("ok") is True
+                    and payload.get("driver_chat_id") is not None and payload.get("message")
+                ):
+                    await self.tg_client.send_text(chat_id=int(payload["driver_chat_id"]), text=str(payload["message"]))
+        for m in reversed(result.get("messages", [])):
+            if getattr(m, "type", None) == "ai":
+                return (m.content or "").strip()
+        return ""
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent += 1
+        return SimpleNamespace(message_id=self.sent)
+
+
+async def run(router_cls, turns: int, checkpoints):
+    menu_repo = MenuRepository()
+    pricing = PricingService(menu_repo)
+    drivers = DriverRepository([])
+    dispatches = DispatchRepository()
+    bot = FakeBot()
+    tg = TelegramClient()
+    tg.set_bot(bot)
+    router = router_cls(
+        tg_client=tg, drivers=drivers, dispatches=dispatches,
+        dispatch_service=DispatchService(drivers, dispatches), agent=None,
+    )
+    messages = []
+    costs = {}
+    for turn in range(1, turns + 1):
+        messages = messages + turn_messages(turn, menu_repo, pricing)
+        t0 = time.perf_counter()
+        await router._finish_turn({"messages": messages}, CHAT_ID)
+        if turn in checkpoints:
+            costs[turn] = (time.perf_counter() - t0) * 1e6
+    return costs, bot.sent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    checkpoints = sorted({t for t in (10, 50, 100, args.turns) if t <= args.turns})
+
+    for label, cls in (("historial completo", LegacyRouter), ("cursor + ledger", TelegramRouter)):
+        costs, sent = asyncio.run(run(cls, args.turns, checkpoints))
+        per_turn = " ".join(f"turno {t}={costs[t]:,.0f}µs" for t in checkpoints)
+        print(f"{label:<19}: {per_turn} | ofertas enviadas={sent} (esperado 1)")
+
+
+if __name__ == "__main__":
+    main()
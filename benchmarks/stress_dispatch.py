@@ -0,0 +1,208 @@
+"""
+Stress de concurrencia del ciclo de despacho (DispatchService + DispatchRepository).
+
+Muchos threads (como las tools sync del agente en el executor) ejecutan el ciclo completo:
+assign_driver (reserva con lease) -> send_order_to_driver (reserved -> sent) -> oferta a
+varios domiciliarios -> varios ACEPTO en paralelo (claim) -> COMPLETADO. Cada pedido se
+dispara dos veces en paralelo con la misma idempotency key (el LLM repitiendo la tool) y una
+parte de las reservas se abandona (o se envía tarde) para que venzan por lease. Una parte de
+los pedidos repite dispatch_order después del ACEPTO (y después de COMPLETADO).
+
+Invariantes verificadas (falla con AssertionError):
+- ningún domiciliario aparece en dos despachos vivos (reserved/sent/accepted) a la vez
+- ningún domiciliario de un despacho vivo figura como disponible
+- cada oferta tiene exactamente un ganador del claim
+- la misma idempotency key entrega el mismo dispatch_id (también después del ACEPTO) y send crea una sola vez
+- dispatch_order repetido tras ACEPTO / COMPLETADO: mismo despacho, duplicate=true, sin mensaje
+- los dispatch_id nunca se repiten
+- al final todos los domiciliarios vuelven al pool y no quedan despachos vivos
+
+Uso:
+    python -m benchmarks.stress_dispatch --orders 4000 --drivers 60 --threads 16
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from app.domain.models import Driver
+from app.repositories.dispatch_repo import IDEMPOTENT_STATES, DispatchRepository, DispatchStateError
+from app.repositories.driver_repo import DriverRepository
+from app.services.dispatch_service import DispatchService
+
+LIVE = {"reserved", "sent", "accepted"}
+
+
+def check_invariants(drivers: DriverRepository, dispatches: DispatchRepository) -> int:
+    """Snapshot consistente (lock del repo de despachos y luego el de domiciliarios)."""
+    with dispatches._lock, drivers._lock:
+        holders = Counter()
+        for disp in dispatches._dispatches.values():
+            if disp.status == "sent":
+                held = list(disp.offered_to)
+            elif disp.status in LIVE:
+                held = [disp.driver_chat_id]
+            else:
+                continue
+            for cid in held:
+                holders[cid] += 1
+                assert not drivers.get_by_chat(cid).is_available, f"{cid} disponible en {disp.dispatch_id}"
+        double = [cid for cid, n in holders.items() if n > 1]
+        assert not double, f"doble asignación: {double}"
+        return len(holders)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=4000)
+    parser.add_argument("--drivers", type=int, default=60)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--broadcast-k", type=int, default=3)
+    parser.add_argument("--lease", type=float, default=0.2, help="lease de reserva (s)")
+    parser.add_argument("--abandon", type=float, default=0.2, help="fracción de reservas sin send")
+    parser.add_argument("--late", type=float, default=0.05, help="fracción con send después del lease")
+    parser.add_argument("--redispatch", type=float, default=0.2, help="fracción que repite dispatch_order tras ACEPTO")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    drivers = DriverRepository([Driver(f"d{i}", f"Driver {i}", 10_000 + i) for i in range(args.drivers)])
+    dispatches = DispatchRepository()
+    svc = DispatchService(drivers, dispatches, offer_broadcast_k=args.broadcast_k, reservation_lease_s=args.lease)
+    claim_pool = ThreadPoolExecutor(max_workers=args.broadcast_k)
+
+    lock = threading.Lock()
+    stats = Counter()
+    ids_by_key = {}
+    created_ids = []
+
+    def redispatch(order, pair: int, dispatch_id: str, when: str) -> None:
+        # el LLM repite dispatch_order con la misma orden y cliente: no debe reservar ni ofertar de nuevo
+        res = asyncio.run(svc.dispatch_order_async(order, customer_chat_id=pair))
+        assert res.get("dispatch_id") == dispatch_id, f"redespacho {when}: {res}"
+        assert res.get("duplicate") and "message" not in res, f"redespacho {when} ofertó de nuevo: {res}"
+        with lock:
+            stats[f"redespacho_{when}"] += 1
+
+    def flow(i: int) -> None:
+        # los pedidos 2k y 2k+1 son la misma llamada repetida (misma orden, mismo cliente)
+        pair = i // 2
+        rnd = random.Random(args.seed * 1_000_003 + pair)
+        order = {"restaurante": "R", "cliente": f"c{pair}", "items": [{"nombre": "pizza", "cantidad": 1 + pair % 3}]}
+        key = svc.idempotency_key(order, customer_chat_id=pair)
+
+        # sin domiciliarios libres el cliente espera: reintenta mientras vencen leases / terminan pedidos
+        for _ in range(200):
+            res = svc.assign_driver(order, idempotency_key=key)
+            if res.get("ok"):
+                break
+            time.sleep(0.005)
+        if not res.get("ok"):
+            with lock:
+                stats["sin_domiciliario"] += 1
+            return
+        dispatch_id = res["dispatch_id"]
+        with lock:
+            stats["duplicados" if res.get("duplicate") else "reservas"] += 1
+            if not res.get("duplicate"):
+                created_ids.append(dispatch_id)
+                prev = ids_by_key.get(key)
+                disp_prev = dispatches.get(prev) if prev else None
+                assert disp_prev is None or disp_prev.status not in IDEMPOTENT_STATES, "key con dos despachos"
+            ids_by_key[key] = dispatch_id
+
+        p = rnd.random()
+        if p < args.abandon:
+            return  # el LLM nunca llamó send_order_to_driver: vence por lease
+        if p < args.abandon + args.late:
+            time.sleep(args.lease * 1.5)  # send tardío: la reserva ya venció (o está por vencer)
+
+        try:
+            disp, created = svc.register_dispatch(dispatch_id, res["driver_chat_id"], pair, order)
+        except DispatchStateError:
+            with lock:
+                stats["reserva_vencida"] += 1
+            return
+        if not created:
+            with lock:
+                stats["send_repetido"] += 1
+            return
+
+        # oferta a K domiciliarios + ACEPTO simultáneos
+        for d in svc.reserve_extra_drivers(order, {disp.driver_chat_id}, args.broadcast_k - 1):
+            if not dispatches.add_offer(dispatch_id, int(d.chat_id)):
+                drivers.set_available(int(d.chat_id), True)
+        offered = list(disp.offered_to)
+
+        if rnd.random() < 0.1:
+            for cid in offered:
+                if dispatches.decline(dispatch_id, cid) is not None:
+                    drivers.set_available(cid, True)
+            with lock:
+                stats["rechazados"] += 1
+            return
+
+        wins = list(claim_pool.map(lambda cid: (cid, dispatches.claim(dispatch_id, cid)), offered))
+        winners = [cid for cid, ok in wins if ok]
+        assert len(winners) == 1, f"{dispatch_id}: ganadores={winners}"
+        for cid in offered:
+            if cid != winners[0] and dispatches.clear_active_for_driver(cid, dispatch_id):
+                drivers.set_available(cid, True)
+        repeat = rnd.random() < args.redispatch
+        if repeat:
+            redispatch(order, pair, dispatch_id, "tras_acepto")
+
+        time.sleep(rnd.random() * 0.002)
+        assert dispatches.transition(dispatch_id, "completed", completed_ts=int(time.time()))
+        dispatches.clear_active_for_driver(winners[0], dispatch_id)
+        drivers.set_available(winners[0], True)
+        if repeat:
+            redispatch(order, pair, dispatch_id, "tras_completado")
+        with lock:
+            stats["completados"] += 1
+
+    stop = threading.Event()
+    checks = Counter()
+
+    def checker() -> None:
+        while not stop.is_set():
+            checks["snapshots"] += 1
+            checks["max_ocupados"] = max(checks["max_ocupados"], check_invariants(drivers, dispatches))
+            time.sleep(0.001)
+
+    t_check = threading.Thread(target=checker)
+    t_check.start()
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for f in [pool.submit(flow, i) for i in range(args.orders)]:
+                f.result()
+    finally:
+        # si un flujo falla, detener el checker para que el AssertionError salga (y no se cuelgue)
+        stop.set()
+        t_check.join()
+        claim_pool.shutdown()
+    elapsed = time.perf_counter() - t0
+
+    # las reservas abandonadas vencen por lease
+    time.sleep(args.lease + 0.05)
+    svc.release_expired_reservations()
+    check_invariants(drivers, dispatches)
+
+    assert len(created_ids) == len(set(created_ids)), "dispatch_id repetido"
+    live = [d.dispatch_id for d in dispatches._dispatches.values() if d.status in LIVE]
+    assert not live, f"despachos vivos al final: {live[:5]}"
+    assert drivers.available_count() == args.drivers, f"disponibles={drivers.available_count()}/{args.drivers}"
+
+    statuses = Counter(d.status for d in dispatches._dispatches.values())
+    print(f"pedidos={args.orders} threads={args.threads} domiciliarios={args.drivers} k={args.broadcast_k} ({elapsed:.1f}s)")
+    print("flujo:", dict(stats))
+    print("estados finales:", dict(statuses))
+    print(f"snapshots verificados={checks['snapshots']} max domiciliarios ocupados={checks['max_ocupados']}")
+    print("OK: sin dobles asignaciones, un ganador por oferta, ids únicos, todos liberados")
+
+
+if __name__ == "__main__":
+    main()